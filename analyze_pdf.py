@@ -1,14 +1,17 @@
-import pdfplumber
-import re
+import sys
+sys.path.insert(0, "src")
+
+from cache_paginas import ler_paginas
 
 # Analisar Volume 2 - extrair nome e classe corretamente
-pdf = pdfplumber.open('data/raw/volume2.pdf')
+# Textos lidos do cache de paginas (pdfplumber so roda na primeira vez)
+paginas = range(16, 25)  # Paginas 16-24
+textos = ler_paginas('data/raw/volume2.pdf', paginas)
 
 print("=== Analisando estrutura das monografias ===")
 
 # Vamos analisar paginas individuais para entender o padrao
-for i in range(16, 25):  # Paginas 16-24
-    text = pdf.pages[i].extract_text()
+for i, text in zip(paginas, textos):
     if text:
         print(f"\n{'='*60}")
         print(f"PAGINA {i+1}")
@@ -26,5 +29,3 @@ for i in range(16, 25):  # Paginas 16-24
                 for k in range(j, min(j+3, len(lines))):
                     print(f"   {lines[k]}")
                 break
-
-pdf.close()
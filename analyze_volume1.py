@@ -1,18 +1,21 @@
 """Analisar conteúdo do Volume 1 da Farmacopeia"""
-from pypdf import PdfReader
+import sys
+sys.path.insert(0, "src")
+
+from cache_paginas import ler_paginas
 
 pdf_path = "data/raw/volume1.pdf"
-reader = PdfReader(pdf_path)
+# Todas as páginas, lidas do cache de páginas (extraídas só na primeira execução)
+paginas = ler_paginas(pdf_path)
 
-print(f"📖 Volume 1 - Total de páginas: {len(reader.pages)}")
+print(f"📖 Volume 1 - Total de páginas: {len(paginas)}")
 print("=" * 60)
 
 # Analisar sumário (primeiras páginas)
 print("\n📋 PRIMEIRAS 10 PÁGINAS (Sumário/Índice):")
 print("-" * 40)
-for i in range(min(10, len(reader.pages))):
-    page = reader.pages[i]
-    text = page.extract_text()
+for i in range(min(10, len(paginas))):
+    text = paginas[i]
     if text and text.strip():
         print(f"\n--- Página {i+1} ---")
         print(text[:400])
@@ -20,10 +23,9 @@ for i in range(min(10, len(reader.pages))):
 # Pular para o meio e ver conteúdo
 print("\n\n📋 PÁGINAS DO MEIO (Conteúdo):")
 print("-" * 40)
-middle = len(reader.pages) // 2
-for i in range(middle, min(middle + 3, len(reader.pages))):
-    page = reader.pages[i]
-    text = page.extract_text()
+middle = len(paginas) // 2
+for i in range(middle, min(middle + 3, len(paginas))):
+    text = paginas[i]
     if text and text.strip():
         print(f"\n--- Página {i+1} ---")
         print(text[:600])
@@ -35,8 +37,7 @@ print("-" * 40)
 termos = ["classe terapêutica", "indicação", "indicações", "tratamento", "sintoma", "monografia"]
 encontrados = {termo: 0 for termo in termos}
 
-for i, page in enumerate(reader.pages):
-    text = page.extract_text()
+for text in paginas:
     if text:
         text_lower = text.lower()
         for termo in termos:
@@ -0,0 +1,58 @@
+"""Latência dos backends de embeddings (torch, int8, onnx) por número de threads: consulta única e lote de chunks"""
+import os
+import sys
+import time
+import argparse
+sys.path.insert(0, "src")
+
+import numpy as np
+
+from codificador import BACKENDS, MODELO_EMBEDDINGS, ONNX_PATH_PADRAO, criar_codificador
+
+consultas = [
+    "dor de cabeça forte e febre",
+    "tosse seca há 3 dias",
+    "coceira entre os dedos do pé",
+    "azia e queimação no estomago depois de comer",
+    "to com uma pontada no peito",
+    "ansiedade, insônia e dor nas costas",
+]
+# Chunk típico da ingestão (CHUNK_SIZE=1000)
+chunk = (
+    "CETOCONAZOL Antifúngico imidazólico. Caracteres físicos: pó cristalino branco, inodoro, "
+    "solúvel em água e pouco solúvel em etanol. Conservar em recipientes bem fechados. "
+) * 5
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--backends", default=",".join(BACKENDS))
+parser.add_argument("--threads", default=f"1,{os.cpu_count() or 1}",
+                    help="Lista de threads intra-op a medir (padrão: 1 e todos os núcleos)")
+parser.add_argument("--repeticoes", type=int, default=50)
+parser.add_argument("--lote", type=int, default=64, help="Chunks no teste de ingestão")
+parser.add_argument("--modelo", default=MODELO_EMBEDDINGS)
+parser.add_argument("--onnx-path", default=os.getenv("ENCODER_ONNX_PATH", ONNX_PATH_PADRAO))
+args = parser.parse_args()
+
+print(f"\n{'backend':<8} {'threads':>7} {'carga s':>8} {'p50 ms':>8} {'p95 ms':>8} {'chunks/s':>9}")
+for backend in args.backends.split(","):
+    if backend == "onnx" and not os.path.exists(os.path.join(args.onnx_path, "model.onnx")):
+        print(f"{backend:<8} sem modelo em {args.onnx_path} (python src/codificador.py --exportar-onnx)")
+        continue
+    for threads in sorted({int(t) for t in args.threads.split(",")}):
+        inicio = time.perf_counter()
+        codificador = criar_codificador(backend, threads=threads, modelo=args.modelo, onnx_path=args.onnx_path)
+        carga_s = time.perf_counter() - inicio
+
+        codificador.embed_query("aquecimento")
+        tempos = []
+        for i in range(args.repeticoes):
+            inicio = time.perf_counter()
+            codificador.embed_query(consultas[i % len(consultas)])
+            tempos.append((time.perf_counter() - inicio) * 1000)
+
+        inicio = time.perf_counter()
+        codificador.embed_documents([chunk] * args.lote)
+        chunks_s = args.lote / (time.perf_counter() - inicio)
+
+        p50, p95 = np.percentile(tempos, [50, 95])
+        print(f"{backend:<8} {threads:>7} {carga_s:>8.2f} {p50:>8.2f} {p95:>8.2f} {chunks_s:>9.1f}")
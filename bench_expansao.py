@@ -0,0 +1,69 @@
+"""Micro-benchmark: mapa de sintomas com loop de substrings vs IndiceTermos (Aho-Corasick)"""
+import sys
+import time
+import random
+import string
+sys.path.insert(0, "src")
+
+from core_ai import AssistenteFarmaceutico
+from ingestor import FarmacopeiaIngestor
+from indice_termos import IndiceTermos
+
+consultas = [
+    "dor de cabeça forte e febre",
+    "dor de cabeca e enjoo",
+    "tosse seca há 3 dias",
+    "coceira entre os dedos do pé",
+    "azia e queimação no estomago depois de comer",
+    "to com uma pontada no peito",
+    "ansiedade, insônia e dor nas costas",
+]
+
+REPETICOES = 2000
+
+
+def loop_substrings(mapa, texto):
+    """Implementação anterior: um teste 'termo in texto' por chave."""
+    texto = texto.lower()
+    return [valor for termo, valor in mapa.items() if termo in texto]
+
+
+def medir(funcao):
+    inicio = time.perf_counter()
+    for _ in range(REPETICOES):
+        for consulta in consultas:
+            funcao(consulta)
+    return (time.perf_counter() - inicio) / (REPETICOES * len(consultas)) * 1e6
+
+
+def mapa_sintetico(base, tamanho):
+    """Completa o mapa real com termos aleatórios até o tamanho pedido."""
+    rng = random.Random(42)
+    mapa = dict(base)
+    while len(mapa) < tamanho:
+        termo = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 14)))
+        mapa[termo] = 'classe sintetica'
+    return mapa
+
+
+print("=" * 60)
+print("⏱️  BENCHMARK DE EXPANSÃO (µs por consulta)")
+print("=" * 60)
+
+for nome, base in [("Sintomas -> classes", AssistenteFarmaceutico.SINTOMAS_PARA_CLASSES),
+                   ("Classes -> indicações", FarmacopeiaIngestor.CLASSE_PARA_INDICACOES)]:
+    print(f"\n📚 {nome} ({len(base)} termos reais)")
+    print(f"   {'termos':>8} {'loop':>10} {'índice':>10} {'compilar':>10}")
+    for tamanho in [len(base), 1000, 5000, 20000]:
+        mapa = mapa_sintetico(base, tamanho)
+        inicio = time.perf_counter()
+        indice = IndiceTermos(mapa)
+        compilar_ms = (time.perf_counter() - inicio) * 1000
+        t_loop = medir(lambda texto: loop_substrings(mapa, texto))
+        t_indice = medir(indice.buscar)
+        print(f"   {tamanho:>8} {t_loop:>10.1f} {t_indice:>10.1f} {compilar_ms:>8.1f}ms")
+
+print("\n🔍 Exemplos (sem acento também casa):")
+indice = IndiceTermos(AssistenteFarmaceutico.SINTOMAS_PARA_CLASSES)
+for consulta in ["dor de cabeca", "dor de cabeça", "dores nas costas"]:
+    print(f"   '{consulta}' -> {indice.buscar(consulta)[:3]}")
@@ -0,0 +1,69 @@
+"""Tempo até a primeira recomendação: import, carga de cada componente, busca e LLM (frio x aquecido)"""
+import os
+import sys
+import time
+import argparse
+
+inicio_processo = time.perf_counter()
+sys.path.insert(0, "src")
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--aquecer", action="store_true",
+                    help="Inicia o aquecimento em segundo plano e espera is_ready() antes da primeira consulta")
+parser.add_argument("--sem-llm", action="store_true",
+                    help="Mede só a busca (sem chamadas ao LLM nem chave de API)")
+parser.add_argument("--sintomas", default="dor de cabeça e febre")
+args = parser.parse_args()
+
+from core_ai import AssistenteFarmaceutico
+
+import_s = time.perf_counter() - inicio_processo
+vectorstore_path = os.getenv("VECTORSTORE_PATH", "data/vectorstore")
+
+inicio = time.perf_counter()
+assistente = AssistenteFarmaceutico(vectorstore_path, aquecer=False)
+construtor_s = time.perf_counter() - inicio
+if args.sem_llm:
+    assistente.prazo_expansao_llm = 0
+
+aquecimento_s = None
+if args.aquecer:
+    inicio = time.perf_counter()
+    assistente.iniciar_aquecimento().join()
+    aquecimento_s = time.perf_counter() - inicio
+    if assistente.erro_aquecimento:
+        sys.exit(f"❌ Aquecimento falhou: {assistente.erro_aquecimento}")
+carregados_antes = {**assistente.tempos_inicializacao, **assistente.tempos_aquecimento}
+
+
+def consultar(sintomas: str) -> float:
+    inicio = time.perf_counter()
+    if args.sem_llm:
+        assistente.buscar_insumos_relevantes(sintomas)
+    else:
+        assistente.gerar_recomendacao(sintomas)
+    return time.perf_counter() - inicio
+
+
+primeira_s = consultar(args.sintomas)
+na_consulta = {
+    nome: t for nome, t in assistente.tempos_inicializacao.items() if nome not in carregados_antes
+}
+segunda_s = consultar(args.sintomas + " há dois dias")
+
+print(f"\n{'=' * 60}")
+print(f"⏱️ Até a primeira {'busca' if args.sem_llm else 'recomendação'} "
+      f"({'aquecido' if args.aquecer else 'frio'}, {os.getenv('BUSCA_VETORIAL', 'chroma')})")
+print('=' * 60)
+print(f"{'import dos módulos':<36} {import_s:>8.2f}s")
+print(f"{'construtor':<36} {construtor_s:>8.2f}s")
+if aquecimento_s is not None:
+    print(f"{'aquecimento (até is_ready)':<36} {aquecimento_s:>8.2f}s")
+    for nome, t in carregados_antes.items():
+        print(f"  {nome:<34} {t:>8.2f}s")
+print(f"{'primeira consulta':<36} {primeira_s:>8.2f}s")
+for nome, t in na_consulta.items():
+    print(f"  carga: {nome:<27} {t:>8.2f}s")
+print(f"  {'busca + LLM':<34} {primeira_s - sum(na_consulta.values()):>8.2f}s")
+print(f"{'segunda consulta (tudo carregado)':<36} {segunda_s:>8.2f}s")
+print(f"{'total até a primeira resposta':<36} {import_s + construtor_s + (aquecimento_s or 0) + primeira_s:>8.2f}s")
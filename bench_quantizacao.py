@@ -0,0 +1,92 @@
+"""Comparar recall, latência e carga dos índices NumPy (float32, int8/float16, PCA) com o Chroma atual"""
+import sys
+import time
+import tempfile
+sys.path.insert(0, "src")
+
+import numpy as np
+import chromadb
+
+from indice_quantizado import IndiceQuantizado
+
+VECTORSTORE = sys.argv[1] if len(sys.argv) > 1 else "data/vectorstore"
+K = 10
+
+variantes = [
+    ("float32", None),
+    ("float16", None),
+    ("int8", None),
+    ("float16", 128),
+    ("int8", 192),
+    ("int8", 128),
+    ("int8", 64),
+]
+
+sintomas = [
+    "dor de cabeça e febre", "tosse com catarro", "alergia na pele", "azia e queimação",
+    "pressão alta", "insônia e ansiedade", "diarreia", "micose entre os dedos do pé",
+    "dor muscular nas costas", "nariz entupido", "herpes labial", "prisão de ventre",
+]
+
+colecao = chromadb.PersistentClient(VECTORSTORE).list_collections()[0]
+dados = colecao.get(include=["embeddings", "documents", "metadatas"])
+if not dados["ids"]:
+    sys.exit(f"❌ Nenhum vetor em {VECTORSTORE}. Rode python src/ingestor.py antes.")
+corpus = np.asarray(dados["embeddings"], dtype=np.float32)
+print(f"📚 {len(corpus)} vetores de {corpus.shape[1]} dimensões ({corpus.nbytes / 1024 / 1024:.2f} MB em float32)")
+
+# Consultas reais (modelo MiniLM) ou, sem o modelo, vetores do corpus com ruído
+try:
+    from langchain_huggingface import HuggingFaceEmbeddings
+    modelo = HuggingFaceEmbeddings(
+        model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+        model_kwargs={'device': 'cpu'}
+    )
+    consultas = np.asarray(modelo.embed_documents(sintomas), dtype=np.float32)
+    print(f"🔎 {len(consultas)} consultas de sintomas")
+except Exception as e:
+    rng = np.random.default_rng(42)
+    amostra = corpus[rng.choice(len(corpus), 200, replace=False)]
+    consultas = amostra + rng.normal(0, amostra.std(), amostra.shape).astype(np.float32)
+    print(f"⚠️ Modelo indisponível ({str(e)[:60]}...): 200 vetores do corpus com ruído como consultas")
+
+# Referência: cosseno exato em float32
+normalizado = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+referencia = []
+for q in consultas:
+    sims = normalizado @ (q / np.linalg.norm(q))
+    referencia.append(set(np.argsort(-sims)[:K].tolist()))
+ids = dados["ids"]
+
+
+def recall(encontrados):
+    return np.mean([len(set(e) & r) / K for e, r in zip(encontrados, referencia)])
+
+
+print(f"\n{'índice':<22} {'MB vetores':>10} {'recall@' + str(K):>10} {'ms/consulta':>12} {'ms carga':>9}")
+
+# Índice atual (HNSW do Chroma)
+posicao = {id_: i for i, id_ in enumerate(ids)}
+inicio = time.perf_counter()
+encontrados = []
+for q in consultas:
+    r = colecao.query(query_embeddings=[q.tolist()], n_results=K, include=[])
+    encontrados.append([posicao[i] for i in r["ids"][0]])
+ms = (time.perf_counter() - inicio) * 1000 / len(consultas)
+print(f"{'chroma (float32 hnsw)':<22} {corpus.nbytes / 1024 / 1024:>10.2f} {recall(encontrados):>10.3f} {ms:>12.2f} {'-':>9}")
+
+with tempfile.TemporaryDirectory() as tmp:
+    for tipo, pca in variantes:
+        nome = f"{tipo}" + (f" + pca{pca}" if pca else "")
+        destino = f"{tmp}/{tipo}_{pca}"
+        config = IndiceQuantizado.construir(
+            destino, ids, corpus, dados["documents"], dados["metadatas"], tipo=tipo, dimensoes_pca=pca
+        )
+        inicio = time.perf_counter()
+        indice = IndiceQuantizado(destino)
+        indice.buscar_por_vetor(consultas[0], K)
+        carga_ms = (time.perf_counter() - inicio) * 1000
+        inicio = time.perf_counter()
+        encontrados = [[p for p, _ in indice.buscar_por_vetor(q, K)] for q in consultas]
+        ms = (time.perf_counter() - inicio) * 1000 / len(consultas)
+        print(f"{nome:<22} {config['bytes_vetores'] / 1024 / 1024:>10.2f} {recall(encontrados):>10.3f} {ms:>12.2f} {carga_ms:>9.1f}")
@@ -0,0 +1,36 @@
+"""Tempo até o primeiro conteúdo útil (nome da fórmula ou primeiro insumo) no streaming x resposta completa"""
+import os
+import sys
+import time
+sys.path.insert(0, "src")
+
+from core_ai import AssistenteFarmaceutico
+
+sintomas = sys.argv[1:] or [
+    "dor de cabeça e febre",
+    "tosse seca há 3 dias",
+    "azia e queimação no estomago depois de comer",
+]
+
+assistente = AssistenteFarmaceutico(os.getenv("VECTORSTORE_PATH", "data/vectorstore"))
+assistente.iniciar_aquecimento().join()
+
+print(f"\n{'sintomas':<46} {'1º conteúdo':>11} {'stream total':>12} {'sem stream':>10}")
+for sintoma in sintomas:
+    # Sem cache, para medir a geração de verdade nas duas versões
+    assistente.cache_recomendacoes.limpar()
+    assistente.cache_semantico.limpar()
+    primeiro = None
+    for evento in assistente.gerar_recomendacao_stream(sintoma):
+        if primeiro is None and evento["tipo"] in ("nome_formula", "insumo"):
+            primeiro = evento["tempo_s"]
+    total_stream = evento["tempo_s"]
+
+    assistente.cache_recomendacoes.limpar()
+    assistente.cache_semantico.limpar()
+    inicio = time.perf_counter()
+    assistente.gerar_recomendacao(sintoma)
+    sem_stream = time.perf_counter() - inicio
+
+    print(f"{sintoma[:45]:<46} {(f'{primeiro:.2f}s' if primeiro is not None else '-'):>11} "
+          f"{total_stream:>11.2f}s {sem_stream:>9.2f}s")
@@ -1,7 +1,11 @@
 """Verificar indicacoes no JSON"""
-import json
+import sys
+sys.path.insert(0, "src")
 
-data = json.load(open('data/monografias_backup.json', encoding='utf-8'))
+from base_monografias import carregar_monografias
+
+# Apenas metadados: o conteudo das monografias nao e carregado
+data = carregar_monografias()
 
 # Buscar medicamentos que deveriam aparecer
 print("=== MEDICAMENTOS PARA TOSSE ===")
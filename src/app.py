@@ -93,6 +93,13 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+@st.cache_resource(show_spinner=False)
+def carregar_assistente(vectorstore_path: str):
+    """Uma instância por processo, compartilhada pelas sessões e aquecida em segundo plano."""
+    from core_ai import AssistenteFarmaceutico
+    return AssistenteFarmaceutico(vectorstore_path, aquecer=True)
+
+
 def inicializar_sessao():
     """Inicializa variáveis de sessão."""
     if "assistente" not in st.session_state:
@@ -103,9 +110,7 @@ def inicializar_sessao():
             st.error("❌ Base de dados não encontrada! Execute primeiro: `python src/ingestor.py`")
             st.stop()
         
-        with st.spinner("🔄 Iniciando motor de IA... Por favor, aguarde alguns segundos..."):
-            from core_ai import AssistenteFarmaceutico
-            st.session_state.assistente = AssistenteFarmaceutico(vectorstore_path)
+        st.session_state.assistente = carregar_assistente(vectorstore_path)
     
     if "historico" not in st.session_state:
         st.session_state.historico = []
@@ -144,6 +149,10 @@ def exibir_sidebar():
         else:
             st.error("❌ Base não indexada")
         
+        assistente = st.session_state.get("assistente")
+        if assistente is not None and not assistente.is_ready():
+            st.info("🔄 Motor de IA carregando em segundo plano...")
+        
         st.markdown("---")
         
         st.subheader("📖 Guia Rápido")
@@ -166,6 +175,18 @@ def exibir_sidebar():
 def exibir_resultado(resultado: dict):
     """Exibe resultado da recomendação de forma estruturada."""
     
+    # Resposta reaproveitada do cache de recomendações
+    if resultado.get("do_cache"):
+        idade = resultado.get("idade_cache_s", 0)
+        quando = f"há {idade // 60} min" if idade >= 60 else f"há {idade}s"
+        if resultado.get("tipo_cache") == "semantico":
+            st.caption(
+                f"⚡ Resposta reaproveitada de sintomas parecidos: \"{resultado.get('sintomas_cache', '')}\" "
+                f"(similaridade {resultado.get('similaridade_cache', 0):.2f}, gerada {quando})"
+            )
+        else:
+            st.caption(f"⚡ Resposta recuperada do cache (gerada {quando})")
+    
     # Verificar se há erro
     if "erro" in resultado:
         tipo_erro = resultado.get("tipo_erro", "ERRO_GENERICO")
@@ -336,6 +357,71 @@ que é a referência oficial para padrões de qualidade de medicamentos no Brasi
         st.error(f"Erro ao calcular preço: {str(e)}")
 
 
+def exibir_previa(parcial: dict):
+    """Fórmula parcial enquanto o modelo ainda escreve (eventos de gerar_recomendacao_stream)."""
+    if parcial.get("insumos_consultados") and len(parcial) == 1:
+        st.caption("📚 Insumos consultados: " + ", ".join(parcial["insumos_consultados"]))
+        st.info("🤖 Gerando a fórmula...")
+        return
+    
+    col1, col2 = st.columns([2, 1])
+    
+    with col1:
+        st.markdown("### 💊 Fórmula Recomendada ⏳")
+        if "nome_formula" in parcial:
+            st.markdown(f"**Nome Sugerido:** {parcial['nome_formula']}")
+        
+        if parcial.get("insumos"):
+            st.markdown("#### 🧪 Composição:")
+            for i, insumo in enumerate(parcial["insumos"], 1):
+                st.markdown(f"{i}. **{insumo.get('nome', 'N/A')}** - {insumo.get('dose', 'N/A')}")
+        
+        if "forma_farmaceutica" in parcial:
+            st.markdown(f"**Forma Farmacêutica:** {parcial['forma_farmaceutica'].capitalize()}")
+        if "quantidade_total" in parcial:
+            st.markdown(f"**Quantidade Total:** {parcial['quantidade_total']}")
+        
+        if "posologia" in parcial:
+            st.markdown("#### 📋 Posologia:")
+            st.info(parcial["posologia"])
+    
+    with col2:
+        if parcial.get("alertas"):
+            st.markdown("### ⚠️ Alertas de Segurança")
+            for alerta in parcial["alertas"]:
+                st.warning(alerta)
+    
+    st.caption("⏳ Gerando... a fórmula final ainda passa pela validação de nomes e de segurança")
+
+
+def gerar_com_streaming(sintomas: str) -> dict:
+    """Mostra a fórmula à medida que o modelo a escreve; retorna o resultado final validado."""
+    previa = st.empty()
+    parcial = {}
+    with previa.container():
+        st.info("🔄 Processando... Buscando insumos na Farmacopeia...")
+    
+    for evento in st.session_state.assistente.gerar_recomendacao_stream(sintomas):
+        tipo = evento["tipo"]
+        if tipo == "resultado":
+            previa.empty()
+            return evento["resultado"]
+        if tipo == "insumos_consultados":
+            parcial["insumos_consultados"] = evento["nomes"]
+        elif tipo == "insumo":
+            parcial.setdefault("insumos", []).append(evento["insumo"])
+        elif tipo == "alerta":
+            parcial.setdefault("alertas", []).append(evento["valor"])
+        else:
+            parcial[tipo] = evento["valor"]
+        
+        with previa.container():
+            exibir_previa(parcial)
+    
+    previa.empty()
+    return {"erro": "Erro ao gerar recomendação", "detalhes": "Resposta interrompida"}
+
+
 def exibir_historico():
     """Exibe histórico de recomendações."""
     if not st.session_state.historico:
@@ -391,10 +477,9 @@ def main():
             if not sintomas.strip():
                 st.warning("⚠️ Por favor, insira os sintomas do paciente.")
             else:
-                with st.spinner("🔄 Processando... Buscando insumos na Farmacopeia..."):
-                    resultado = st.session_state.assistente.gerar_recomendacao(sintomas)
-                
                 st.markdown("---")
+                # Fórmula aparece aos poucos; no fim, o resultado validado substitui a prévia
+                resultado = gerar_com_streaming(sintomas)
                 exibir_resultado(resultado)
     
     with tab2:
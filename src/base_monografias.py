@@ -0,0 +1,184 @@
+"""
+Base compacta de monografias em SQLite.
+Substitui a leitura do data/monografias_backup.json inteiro: os metadados
+(codigo, nome, classe, indicacoes...) sao carregados de uma vez, com busca O(1)
+por codigo ou nome, e o conteudo (a maior parte do arquivo) so e lido quando pedido.
+"""
+
+import os
+import json
+import sqlite3
+import argparse
+import tempfile
+import threading
+import zlib
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from indice_termos import normalizar_texto
+
+CAMINHO_PADRAO = "data/monografias.sqlite"
+JSON_PADRAO = "data/monografias_backup.json"
+
+
+class Monografia(Mapping):
+    """Monografia com metadados em memoria e 'conteudo' lido da base sob demanda."""
+
+    __slots__ = ('_base', '_posicao', '_dados')
+
+    def __init__(self, base: "BaseMonografias", posicao: int, dados: Dict):
+        self._base = base
+        self._posicao = posicao
+        self._dados = dados
+
+    def __getitem__(self, chave):
+        if chave == 'conteudo':
+            return self._base.conteudo(self._posicao)
+        return self._dados[chave]
+
+    def __iter__(self):
+        yield from self._dados
+        yield 'conteudo'
+
+    def __len__(self):
+        return len(self._dados) + 1
+
+    def __repr__(self):
+        return f"Monografia({self._dados.get('codigo')!r}, {self._dados.get('nome')!r})"
+
+
+class BaseMonografias:
+    """Leitura da base de monografias, na mesma ordem do backup JSON."""
+
+    def __init__(self, caminho: Optional[str] = None):
+        self.caminho = caminho or os.getenv("MONOGRAFIAS_DB_PATH", CAMINHO_PADRAO)
+        self._conn = sqlite3.connect(self.caminho, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        # Apenas metadados: o conteudo fica no disco
+        with self._lock:
+            linhas = self._conn.execute(
+                "SELECT posicao, metadados FROM monografias ORDER BY posicao"
+            ).fetchall()
+        self._monografias: List[Monografia] = []
+        self._por_codigo: Dict[str, List[Monografia]] = {}
+        self._por_nome: Dict[str, Monografia] = {}
+        for posicao, metadados in linhas:
+            mono = Monografia(self, posicao, json.loads(metadados))
+            self._monografias.append(mono)
+            self._por_codigo.setdefault(mono.get('codigo', ''), []).append(mono)
+            self._por_nome.setdefault(normalizar_texto(mono.get('nome', '')), mono)
+
+    def __len__(self) -> int:
+        return len(self._monografias)
+
+    def __iter__(self) -> Iterator[Monografia]:
+        return iter(self._monografias)
+
+    def __getitem__(self, indice):
+        return self._monografias[indice]
+
+    def por_codigo(self, codigo: str) -> Optional[Monografia]:
+        """Primeira monografia com o codigo (alguns codigos se repetem no volume)."""
+        encontradas = self._por_codigo.get(codigo)
+        return encontradas[0] if encontradas else None
+
+    def todas_por_codigo(self, codigo: str) -> List[Monografia]:
+        return list(self._por_codigo.get(codigo, []))
+
+    def por_nome(self, nome: str) -> Optional[Monografia]:
+        """Busca pelo nome, sem diferenciar maiusculas e acentos."""
+        return self._por_nome.get(normalizar_texto(nome))
+
+    def conteudo(self, posicao: int) -> str:
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT conteudo FROM monografias WHERE posicao = ?", (posicao,)
+            ).fetchone()
+        return zlib.decompress(linha[0]).decode('utf-8') if linha else ''
+
+    def fechar(self) -> None:
+        self._conn.close()
+
+
+def gravar_monografias(monografias: Iterable[Dict], caminho: str = CAMINHO_PADRAO) -> Iterator[Dict]:
+    """
+    Grava a base em fluxo e repassa cada monografia adiante (como o backup JSON).
+    A base so substitui a anterior ao final. Cada gravacao usa o seu proprio arquivo
+    temporario, entao gravacoes simultaneas nao se atropelam: a ultima troca vence.
+    """
+    destino = Path(caminho)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=destino.parent, prefix=destino.name + '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        total = yield from _gravar_em(tmp_path, monografias)
+        os.replace(tmp_path, caminho)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    print(f"Base de monografias salva: {caminho} ({total} monografias)")
+
+
+def _gravar_em(tmp_path: str, monografias: Iterable[Dict]) -> Iterator[Dict]:
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript(
+        "CREATE TABLE monografias ("
+        " posicao INTEGER PRIMARY KEY, codigo TEXT, nome TEXT,"
+        " metadados TEXT NOT NULL, conteudo BLOB NOT NULL);"
+        "CREATE INDEX idx_codigo ON monografias (codigo);"
+        "CREATE INDEX idx_nome ON monografias (nome);"
+    )
+    total = 0
+    for mono in monografias:
+        metadados = {k: v for k, v in mono.items() if k != 'conteudo'}
+        conn.execute(
+            "INSERT INTO monografias (posicao, codigo, nome, metadados, conteudo) VALUES (?, ?, ?, ?, ?)",
+            (total, mono.get('codigo'), mono.get('nome'),
+             json.dumps(metadados, ensure_ascii=False),
+             zlib.compress(mono.get('conteudo', '').encode('utf-8'), 6))
+        )
+        total += 1
+        yield mono
+    conn.commit()
+    conn.close()
+    return total
+
+
+def converter_json(json_path: str = JSON_PADRAO, caminho: str = CAMINHO_PADRAO) -> None:
+    """Gera a base a partir do backup JSON existente."""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        monografias = json.load(f)
+    for _ in gravar_monografias(monografias, caminho):
+        pass
+
+
+def carregar_monografias(caminho: Optional[str] = None, json_path: str = JSON_PADRAO,
+                         converter: bool = True) -> BaseMonografias:
+    """
+    Abre a base. Com converter=True (scripts de analise), antes converte o backup JSON se a
+    base nao existir ou estiver desatualizada; o servidor usa converter=False e so abre a
+    base gerada pelo ingestor ou por este modulo.
+    """
+    caminho = caminho or os.getenv("MONOGRAFIAS_DB_PATH", CAMINHO_PADRAO)
+    if converter and os.path.exists(json_path) and (
+        not os.path.exists(caminho) or os.path.getmtime(caminho) < os.path.getmtime(json_path)
+    ):
+        converter_json(json_path, caminho)
+    return BaseMonografias(caminho)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converte o backup JSON de monografias para a base SQLite")
+    parser.add_argument("--json", default=JSON_PADRAO, help="Backup JSON de origem")
+    parser.add_argument("--saida", default=os.getenv("MONOGRAFIAS_DB_PATH", CAMINHO_PADRAO),
+                        help="Arquivo SQLite de destino")
+    args = parser.parse_args()
+
+    converter_json(args.json, args.saida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Caches de embeddings.
+CacheEmbeddings: cache persistente dos vetores de chunks, para nao recalcular os
+vetores MiniLM de textos que nao mudaram entre reindexacoes. Os vetores ficam em um
+SQLite, como float32 binario, chaveados por (modelo, hash do texto).
+CacheConsultas: LRU em memoria para os vetores das consultas feitas na busca.
+"""
+
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from indice_termos import normalizar_consulta
+from hashes import hash_texto
+
+# Limite de parametros por consulta no SQLite (SQLITE_MAX_VARIABLE_NUMBER antigo = 999)
+_MAX_PARAMETROS = 900
+
+
+class CacheEmbeddings(Embeddings):
+    """Envolve um modelo de embeddings consultando o cache em disco antes de calcular."""
+
+    def __init__(self, embeddings: Embeddings, modelo: str, caminho: str, batch_size: int = 64):
+        self.embeddings = embeddings
+        self.modelo = modelo
+        self.batch_size = max(1, batch_size)
+        self.acertos = 0
+        self.falhas = 0
+
+        Path(caminho).parent.mkdir(parents=True, exist_ok=True)
+        # Usado pela thread de embeddings do pipeline: acesso serializado pelo lock
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS vetores ("
+                " modelo TEXT NOT NULL, hash TEXT NOT NULL, vetor BLOB NOT NULL,"
+                " PRIMARY KEY (modelo, hash)) WITHOUT ROWID"
+            )
+            self._conn.commit()
+
+    def _buscar(self, hashes: List[str]) -> Dict[str, List[float]]:
+        encontrados = {}
+        with self._lock:
+            for ini in range(0, len(hashes), _MAX_PARAMETROS):
+                parte = hashes[ini:ini + _MAX_PARAMETROS]
+                marcadores = ','.join('?' * len(parte))
+                linhas = self._conn.execute(
+                    f"SELECT hash, vetor FROM vetores WHERE modelo = ? AND hash IN ({marcadores})",
+                    [self.modelo, *parte]
+                )
+                for h, blob in linhas:
+                    encontrados[h] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return encontrados
+
+    def _gravar(self, itens: Dict[str, List[float]]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vetores (modelo, hash, vetor) VALUES (?, ?, ?)",
+                [(self.modelo, h, np.asarray(v, dtype=np.float32).tobytes()) for h, v in itens.items()]
+            )
+            self._conn.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Retorna os vetores do cache e calcula apenas os ausentes, em lotes de batch_size."""
+        hashes = [hash_texto(t) for t in texts]
+        vetores = self._buscar(list(dict.fromkeys(hashes)))
+
+        # Textos repetidos no mesmo lote sao calculados uma unica vez
+        faltando = {}
+        for h, texto in zip(hashes, texts):
+            if h not in vetores:
+                faltando.setdefault(h, texto)
+
+        self.acertos += len(texts) - sum(1 for h in hashes if h in faltando)
+        self.falhas += sum(1 for h in hashes if h in faltando)
+
+        itens = list(faltando.items())
+        for ini in range(0, len(itens), self.batch_size):
+            lote = itens[ini:ini + self.batch_size]
+            calculados = self.embeddings.embed_documents([texto for _, texto in lote])
+            novos = {h: v for (h, _), v in zip(lote, calculados)}
+            self._gravar(novos)
+            vetores.update(novos)
+
+        return [vetores[h] for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def resumo(self) -> str:
+        total = self.acertos + self.falhas
+        taxa = (self.acertos * 100 // total) if total else 0
+        return f"Cache de embeddings: {self.acertos} acertos, {self.falhas} calculados ({taxa}% do cache)"
+
+
+class CacheConsultas(Embeddings):
+    """
+    LRU limitado na frente do embed_query, chaveado pelo texto normalizado
+    (minusculas, sem acentos, espacos colapsados). embed_documents nao passa pelo cache.
+    """
+
+    def __init__(self, embeddings: Embeddings, tamanho: int = 256):
+        self.embeddings = embeddings
+        self.tamanho = max(0, tamanho)
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+        self._vetores: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        chave = normalizar_consulta(text)
+        with self._lock:
+            vetor = self._vetores.get(chave)
+            if vetor is not None:
+                self._vetores.move_to_end(chave)
+                self.acertos += 1
+                return list(vetor)
+            self.falhas += 1
+
+        # Calculado fora do lock: consultas diferentes nao esperam umas pelas outras
+        vetor = self.embeddings.embed_query(text)
+
+        with self._lock:
+            if self.tamanho:
+                self._vetores[chave] = vetor
+                self._vetores.move_to_end(chave)
+                while len(self._vetores) > self.tamanho:
+                    self._vetores.popitem(last=False)
+                    self.remocoes += 1
+        return list(vetor)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Varias consultas de uma vez: as ausentes do LRU vao ao modelo em uma unica chamada."""
+        chaves = [normalizar_consulta(t) for t in texts]
+        vetores: Dict[str, List[float]] = {}
+        with self._lock:
+            for chave in chaves:
+                vetor = self._vetores.get(chave)
+                if vetor is not None:
+                    self._vetores.move_to_end(chave)
+                    vetores[chave] = vetor
+        ausentes = {}
+        for chave, texto in zip(chaves, texts):
+            if chave not in vetores:
+                ausentes.setdefault(chave, texto)
+
+        with self._lock:
+            self.acertos += len(chaves) - len(ausentes)
+            self.falhas += len(ausentes)
+        if ausentes:
+            # Modelos de consulta simetricos (MiniLM): embed_documents == embed_query
+            calculados = self.embeddings.embed_documents(list(ausentes.values()))
+            with self._lock:
+                for chave, vetor in zip(ausentes, calculados):
+                    vetores[chave] = vetor
+                    if self.tamanho:
+                        self._vetores[chave] = vetor
+                        self._vetores.move_to_end(chave)
+                while len(self._vetores) > self.tamanho:
+                    self._vetores.popitem(last=False)
+                    self.remocoes += 1
+        return [list(vetores[chave]) for chave in chaves]
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._vetores.clear()
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'tamanho': len(self._vetores),
+                'capacidade': self.tamanho,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'remocoes': self.remocoes,
+            }
@@ -0,0 +1,132 @@
+"""
+Cache persistente dos textos extraidos das paginas dos PDFs.
+Guarda o resultado do extract_text() do pdfplumber, comprimido (zlib), por
+(hash do PDF, numero da pagina), para que ajustes no parser e scripts de
+analise nao precisem reprocessar o PDF inteiro.
+"""
+
+import os
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Tuple
+
+import pdfplumber
+
+from hashes import hash_arquivo
+
+CAMINHO_PADRAO = "data/page_cache.sqlite"
+
+
+class CachePaginas:
+    """Armazena textos de paginas comprimidos em um SQLite."""
+
+    def __init__(self, caminho: Optional[str] = None):
+        caminho = caminho or os.getenv("PAGE_CACHE_PATH", CAMINHO_PADRAO)
+        Path(caminho).parent.mkdir(parents=True, exist_ok=True)
+        # Pode ser usado pela thread de parsing do pipeline: acesso serializado pelo lock
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS paginas ("
+                " pdf_hash TEXT NOT NULL, pagina INTEGER NOT NULL,"
+                " hash_pagina TEXT, texto BLOB,"
+                " PRIMARY KEY (pdf_hash, pagina)) WITHOUT ROWID;"
+                "CREATE INDEX IF NOT EXISTS idx_hash_pagina ON paginas (hash_pagina);"
+                "CREATE TABLE IF NOT EXISTS pdfs (pdf_hash TEXT PRIMARY KEY, total_paginas INTEGER NOT NULL);"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def _comprimir(texto: Optional[str]) -> Optional[bytes]:
+        return None if texto is None else zlib.compress(texto.encode('utf-8'), 6)
+
+    @staticmethod
+    def _descomprimir(blob: Optional[bytes]) -> Optional[str]:
+        return None if blob is None else zlib.decompress(blob).decode('utf-8')
+
+    def total_paginas(self, pdf_hash: str) -> Optional[int]:
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT total_paginas FROM pdfs WHERE pdf_hash = ?", (pdf_hash,)
+            ).fetchone()
+        return linha[0] if linha else None
+
+    def registrar_total_paginas(self, pdf_hash: str, total: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pdfs (pdf_hash, total_paginas) VALUES (?, ?)", (pdf_hash, total)
+            )
+
+    def paginas_presentes(self, pdf_hash: str) -> Set[int]:
+        with self._lock:
+            linhas = self._conn.execute("SELECT pagina FROM paginas WHERE pdf_hash = ?", (pdf_hash,))
+            return {pagina for (pagina,) in linhas}
+
+    def texto(self, pdf_hash: str, pagina: int) -> Tuple[bool, Optional[str]]:
+        """Retorna (encontrado, texto). Paginas sem texto sao guardadas como None."""
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT texto FROM paginas WHERE pdf_hash = ? AND pagina = ?", (pdf_hash, pagina)
+            ).fetchone()
+        return (False, None) if linha is None else (True, self._descomprimir(linha[0]))
+
+    def texto_por_hash_pagina(self, hash_pagina: str) -> Tuple[bool, Optional[str]]:
+        """Busca uma pagina de conteudo identico em qualquer versao de PDF ja extraida."""
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT texto FROM paginas WHERE hash_pagina = ? LIMIT 1", (hash_pagina,)
+            ).fetchone()
+        return (False, None) if linha is None else (True, self._descomprimir(linha[0]))
+
+    def gravar(self, pdf_hash: str, pagina: int, texto: Optional[str],
+               hash_pagina: Optional[str] = None) -> None:
+        """Grava o texto da pagina (sem commit; ver salvar())."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO paginas (pdf_hash, pagina, hash_pagina, texto) VALUES (?, ?, ?, ?)",
+                (pdf_hash, pagina, hash_pagina, self._comprimir(texto))
+            )
+
+    def salvar(self) -> None:
+        with self._lock:
+            self._conn.commit()
+
+
+def ler_paginas(pdf_path: str, paginas: Optional[Iterable[int]] = None,
+                cache: Optional[CachePaginas] = None, pdf_hash: Optional[str] = None) -> List[Optional[str]]:
+    """
+    Retorna o texto das paginas pedidas (todas por padrao), lendo do cache
+    e extraindo com o pdfplumber apenas as que ainda nao foram extraidas.
+    pdf_hash evita reler o arquivo inteiro quando o hash ja foi calculado.
+    """
+    cache = cache or CachePaginas()
+    pdf_hash = pdf_hash or hash_arquivo(pdf_path)
+    presentes = cache.paginas_presentes(pdf_hash)
+
+    total = cache.total_paginas(pdf_hash)
+    indices = None if paginas is None else list(paginas)
+    if indices is None and total is not None:
+        indices = list(range(total))
+
+    # Tudo em cache: o PDF nem precisa ser aberto
+    if indices is not None and all(i in presentes for i in indices):
+        return [cache.texto(pdf_hash, i)[1] for i in indices]
+
+    with pdfplumber.open(pdf_path) as pdf:
+        cache.registrar_total_paginas(pdf_hash, len(pdf.pages))
+        if indices is None:
+            indices = list(range(len(pdf.pages)))
+        textos = []
+        for i in indices:
+            if i in presentes:
+                textos.append(cache.texto(pdf_hash, i)[1])
+            else:
+                texto = pdf.pages[i].extract_text()
+                cache.gravar(pdf_hash, i, texto)
+                textos.append(texto)
+
+    cache.salvar()
+    return textos
@@ -0,0 +1,184 @@
+"""
+Caches de recomendações prontas.
+Evitam repetir a busca vetorial e as chamadas ao LLM para sintomas respondidos há pouco:
+CacheRecomendacoes pelo texto normalizado e CacheSemantico por sintomas parecidos.
+As entradas expiram por TTL e são descartadas quando a versão do banco vetorial
+muda (reindexação).
+"""
+
+import copy
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from indice_termos import normalizar_consulta
+
+
+class CacheRecomendacoes:
+    """LRU em memória com TTL, chaveado por sintomas normalizados + provider + modelo + top_k."""
+
+    def __init__(self, ttl: float = 3600, ttl_erro: float = 60, tamanho: int = 512):
+        self.ttl = ttl
+        self.ttl_erro = ttl_erro
+        self.tamanho = max(0, tamanho)
+        self.acertos = 0
+        self.falhas = 0
+        self.expiradas = 0
+        self.invalidacoes = 0
+        # chave -> (resultado, criado_em, expira_em)
+        self._entradas: "OrderedDict[Tuple, Tuple[Dict, float, float]]" = OrderedDict()
+        self._versao = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def chave(sintomas: str, provider: str, modelo: str, top_k: int) -> Tuple:
+        return (normalizar_consulta(sintomas), provider, modelo, top_k)
+
+    def _verificar_versao(self, versao) -> None:
+        # Banco vetorial mudou: nenhuma recomendação antiga vale mais
+        if versao != self._versao:
+            if self._entradas:
+                self.invalidacoes += 1
+            self._entradas.clear()
+            self._versao = versao
+
+    def obter(self, chave: Tuple, versao=None) -> Optional[Tuple[Dict, float]]:
+        """Retorna (cópia do resultado, idade em segundos) ou None."""
+        agora = time.monotonic()
+        with self._lock:
+            self._verificar_versao(versao)
+            entrada = self._entradas.get(chave)
+            if entrada is not None and entrada[2] <= agora:
+                del self._entradas[chave]
+                self.expiradas += 1
+                entrada = None
+            if entrada is None:
+                self.falhas += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            resultado, criado_em, _ = entrada
+        return copy.deepcopy(resultado), agora - criado_em
+
+    def guardar(self, chave: Tuple, resultado: Dict, versao=None) -> None:
+        ttl = self.ttl_erro if "erro" in resultado else self.ttl
+        if not self.tamanho or ttl <= 0:
+            return
+        agora = time.monotonic()
+        with self._lock:
+            self._verificar_versao(versao)
+            self._entradas[chave] = (copy.deepcopy(resultado), agora, agora + ttl)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.tamanho:
+                self._entradas.popitem(last=False)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'tamanho': len(self._entradas),
+                'capacidade': self.tamanho,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'expiradas': self.expiradas,
+                'invalidacoes': self.invalidacoes,
+            }
+
+
+class CacheSemantico:
+    """
+    Índice pequeno em memória com os vetores dos sintomas respondidos recentemente.
+    Reaproveita a recomendação de sintomas parecidos ("dor de cabeca forte" e
+    "muita dor de cabeça") quando a similaridade de cosseno passa do limiar.
+    Capacidade fixa: ao encher, a entrada mais antiga é substituída.
+    """
+
+    def __init__(self, limiar: float = 0.92, ttl: float = 3600, tamanho: int = 256):
+        self.limiar = limiar
+        self.ttl = ttl
+        self.tamanho = max(0, tamanho)
+        self.acertos = 0
+        self.falhas = 0
+        self.invalidacoes = 0
+        self._vetores: Optional[np.ndarray] = None   # (tamanho, dimensoes), normalizados
+        self._entradas: List[Optional[Tuple]] = [None] * self.tamanho
+        self._proxima = 0
+        self._versao = None
+        self._lock = threading.Lock()
+
+    @property
+    def ativo(self) -> bool:
+        return bool(self.tamanho) and 0 < self.limiar <= 1 and self.ttl > 0
+
+    def _verificar_versao(self, versao) -> None:
+        if versao != self._versao:
+            if any(self._entradas):
+                self.invalidacoes += 1
+            self._entradas = [None] * self.tamanho
+            self._versao = versao
+
+    @staticmethod
+    def _normalizar(vetor) -> np.ndarray:
+        v = np.asarray(vetor, dtype=np.float32)
+        return v / max(float(np.linalg.norm(v)), 1e-12)
+
+    def buscar(self, vetor, contexto: Tuple, versao=None) -> Optional[Tuple[Dict, float, float, str]]:
+        """Retorna (cópia do resultado, idade em s, similaridade, sintomas originais) ou None."""
+        if not self.ativo:
+            return None
+        q = self._normalizar(vetor)
+        agora = time.monotonic()
+        with self._lock:
+            self._verificar_versao(versao)
+            validos = [
+                i for i, e in enumerate(self._entradas)
+                if e is not None and e[0] == contexto and e[4] > agora
+            ]
+            if not validos or self._vetores is None:
+                self.falhas += 1
+                return None
+            similaridades = self._vetores[validos] @ q
+            melhor = int(np.argmax(similaridades))
+            similaridade = float(similaridades[melhor])
+            if similaridade < self.limiar:
+                self.falhas += 1
+                return None
+            self.acertos += 1
+            _, resultado, sintomas, criado_em, _ = self._entradas[validos[melhor]]
+        return copy.deepcopy(resultado), agora - criado_em, similaridade, sintomas
+
+    def guardar(self, vetor, contexto: Tuple, sintomas: str, resultado: Dict, versao=None) -> None:
+        if not self.ativo:
+            return
+        v = self._normalizar(vetor)
+        agora = time.monotonic()
+        with self._lock:
+            self._verificar_versao(versao)
+            if self._vetores is None or self._vetores.shape[1] != len(v):
+                self._vetores = np.zeros((self.tamanho, len(v)), dtype=np.float32)
+                self._entradas = [None] * self.tamanho
+            i = self._proxima
+            self._vetores[i] = v
+            self._entradas[i] = (contexto, copy.deepcopy(resultado), sintomas, agora, agora + self.ttl)
+            self._proxima = (i + 1) % self.tamanho
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._entradas = [None] * self.tamanho
+
+    def estatisticas(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'tamanho': sum(1 for e in self._entradas if e is not None),
+                'capacidade': self.tamanho,
+                'limiar': self.limiar,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'invalidacoes': self.invalidacoes,
+            }
@@ -0,0 +1,162 @@
+"""
+Cache persistente das respostas do LLM, compartilhado entre processos.
+Workers do gunicorn e sessões do Streamlit têm memória própria; com as respostas em
+um SQLite (modo WAL: leitores não bloqueiam o escritor), um prompt respondido em um
+processo sai de graça nos outros. A chave é (provider, modelo, temperatura, hash das
+mensagens). Respostas mais antigas que o TTL são ignoradas (e regravadas na próxima
+chamada); passando do tamanho máximo, saem as respostas usadas há mais tempo.
+"""
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+from hashes import hash_objeto
+
+CAMINHO_PADRAO = "data/llm_cache.sqlite"
+
+# Uso de uma resposta só é regravado depois desse intervalo (menos escritas concorrentes)
+_INTERVALO_USO = 60.0
+
+
+class CacheRespostasLLM:
+    """Respostas (AIMessage) comprimidas em SQLite, com remoção LRU por tamanho em bytes."""
+
+    def __init__(self, caminho: Optional[str] = None, tamanho_max_mb: float = 64, ttl: float = 0,
+                 timeout: float = 5.0):
+        self.caminho = caminho or os.getenv("LLM_CACHE_PATH", CAMINHO_PADRAO)
+        self.tamanho_max = int(tamanho_max_mb * 1024 * 1024)
+        # Validade (s) de uma resposta; 0 = sem validade
+        self.ttl = ttl
+        self.timeout = timeout
+        self.acertos = 0
+        self.falhas = 0
+        self.expiradas = 0
+        self.gravacoes = 0
+        self.removidas = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _conexao(self) -> sqlite3.Connection:
+        """Conexão do processo atual (reaberta após um fork, ex.: workers do gunicorn)."""
+        if self._conn is None or self._pid != os.getpid():
+            Path(self.caminho).parent.mkdir(parents=True, exist_ok=True)
+            # Autocommit: as escritas abrem a transação explicitamente (BEGIN IMMEDIATE)
+            conn = sqlite3.connect(self.caminho, timeout=self.timeout, check_same_thread=False,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS respostas ("
+                " chave TEXT PRIMARY KEY, provider TEXT NOT NULL, modelo TEXT NOT NULL,"
+                " resposta BLOB NOT NULL, tamanho INTEGER NOT NULL,"
+                " criado_em REAL NOT NULL, usado_em REAL NOT NULL) WITHOUT ROWID;"
+                "CREATE INDEX IF NOT EXISTS idx_usado_em ON respostas (usado_em);"
+            )
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    @staticmethod
+    def chave(provider: str, modelo: str, temperatura: float, mensagens: Any) -> str:
+        if isinstance(mensagens, str):
+            conteudo = [['human', mensagens]]
+        else:
+            conteudo = [
+                [m.type, m.content] if isinstance(m, BaseMessage) else ['human', str(m)] for m in mensagens
+            ]
+        return hash_objeto([provider, modelo, temperatura, conteudo])
+
+    def obter(self, chave: str) -> Optional[BaseMessage]:
+        agora = time.time()
+        try:
+            with self._lock:
+                conn = self._conexao()
+                linha = conn.execute(
+                    "SELECT resposta, criado_em, usado_em FROM respostas WHERE chave = ?", (chave,)
+                ).fetchone()
+                expirada = linha is not None and self.ttl > 0 and agora - linha[1] > self.ttl
+                if linha is not None and not expirada and agora - linha[2] > _INTERVALO_USO:
+                    conn.execute("UPDATE respostas SET usado_em = ? WHERE chave = ?", (agora, chave))
+        except sqlite3.Error as e:
+            # Banco ocupado ou corrompido: segue sem o cache
+            print(f"⚠️ Cache de respostas do LLM indisponível: {e}")
+            return None
+        if linha is None or expirada:
+            self.falhas += 1
+            self.expiradas += expirada
+            return None
+        self.acertos += 1
+        resposta = messages_from_dict([json.loads(zlib.decompress(linha[0]))])[0]
+        resposta.response_metadata['do_cache'] = True
+        return resposta
+
+    def guardar(self, chave: str, provider: str, modelo: str, resposta: BaseMessage) -> None:
+        blob = zlib.compress(json.dumps(message_to_dict(resposta), ensure_ascii=False).encode('utf-8'), 6)
+        agora = time.time()
+        try:
+            with self._lock:
+                conn = self._conexao()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO respostas"
+                        " (chave, provider, modelo, resposta, tamanho, criado_em, usado_em)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (chave, provider, modelo, blob, len(blob), agora, agora)
+                    )
+                    removidas = self._remover_excedente(conn)
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            print(f"⚠️ Resposta do LLM não gravada no cache: {e}")
+            return
+        self.gravacoes += 1
+        self.removidas += removidas
+
+    def _remover_excedente(self, conn: sqlite3.Connection) -> int:
+        """Acima do tamanho máximo, remove as menos usadas até 90% dele (dentro da transação)."""
+        total = conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+        if total <= self.tamanho_max:
+            return 0
+        liberar = total - int(self.tamanho_max * 0.9)
+        chaves: List[str] = []
+        for chave, tamanho in conn.execute("SELECT chave, tamanho FROM respostas ORDER BY usado_em"):
+            chaves.append(chave)
+            liberar -= tamanho
+            if liberar <= 0:
+                break
+        conn.executemany("DELETE FROM respostas WHERE chave = ?", [(c,) for c in chaves])
+        return len(chaves)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._conexao().execute("DELETE FROM respostas")
+
+    def estatisticas(self) -> Dict[str, int]:
+        try:
+            with self._lock:
+                entradas, total = self._conexao().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM respostas"
+                ).fetchone()
+        except sqlite3.Error:
+            entradas = total = None
+        return {
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'gravacoes': self.gravacoes,
+            'removidas': self.removidas,
+            'expiradas': self.expiradas,
+            'entradas': entradas,
+            'bytes': total,
+            'bytes_max': self.tamanho_max,
+        }
@@ -0,0 +1,127 @@
+"""
+Coalescência de chamadas idênticas em andamento ("single-flight").
+Quando várias threads pedem a mesma coisa ao mesmo tempo (uma mensagem em massa no
+WhatsApp e dezenas de pacientes respondendo igual), só a primeira executa; as outras
+esperam e recebem uma cópia do mesmo resultado (ou a mesma exceção).
+Chamadas síncronas e assíncronas dividem o mesmo mapa: uma corrotina pode pegar
+carona na execução de uma thread e vice-versa.
+Não é cache: terminada a chamada, a próxima com a mesma chave executa de novo.
+"""
+
+import copy
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class _Voo:
+    __slots__ = ('pronto', 'resultado', 'erro', 'esperando', 'aguardando')
+
+    def __init__(self):
+        self.pronto = threading.Event()
+        self.resultado = None
+        self.erro = None
+        self.esperando = 0
+        # (loop, future) das corrotinas esperando, avisadas pelo loop de cada uma
+        self.aguardando: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+
+def _avisar(futuro: asyncio.Future) -> None:
+    # A corrotina pode ter sido cancelada enquanto esperava
+    if not futuro.done():
+        futuro.set_result(None)
+
+
+class ChamadasCompartilhadas:
+    """Uma execução por chave ao mesmo tempo; quem chega depois pega carona."""
+
+    def __init__(self):
+        self._voos: Dict[Hashable, _Voo] = {}
+        self._lock = threading.Lock()
+        self.execucoes = 0
+        self.compartilhadas = 0
+
+    def iniciar(self, chave: Hashable, futuro: Optional[asyncio.Future] = None) -> Tuple[_Voo, bool]:
+        """
+        Entra no voo da chave. Retorna (voo, dono): o dono executa e chama concluir();
+        os outros esperam com aguardar() (ou pelo `futuro`, de uma corrotina).
+        """
+        with self._lock:
+            voo = self._voos.get(chave)
+            if voo is None:
+                voo = self._voos[chave] = _Voo()
+                self.execucoes += 1
+                return voo, True
+            voo.esperando += 1
+            self.compartilhadas += 1
+            if futuro is not None:
+                voo.aguardando.append((futuro.get_loop(), futuro))
+            return voo, False
+
+    def concluir(self, chave: Hashable, voo: _Voo, resultado: Any = None,
+                 erro: Optional[BaseException] = None) -> None:
+        """Encerra o voo do dono com o resultado (ou o erro) e libera quem espera."""
+        # Depois de sair do mapa ninguém mais entra no voo: a contagem é definitiva
+        with self._lock:
+            del self._voos[chave]
+            esperando = voo.esperando
+        voo.erro = erro
+        if erro is None and esperando:
+            voo.resultado = copy.deepcopy(resultado)
+        voo.pronto.set()
+        for loop, futuro in voo.aguardando:
+            try:
+                loop.call_soon_threadsafe(_avisar, futuro)
+            except RuntimeError:
+                # Loop já fechado: não há mais quem avisar
+                pass
+
+    @staticmethod
+    def aguardar(voo: _Voo) -> Any:
+        """Espera o voo de outro dono e devolve a cópia do resultado (ou levanta o erro)."""
+        voo.pronto.wait()
+        return ChamadasCompartilhadas._resultado(voo)
+
+    @staticmethod
+    def _resultado(voo: _Voo) -> Any:
+        if voo.erro is not None:
+            raise voo.erro
+        # Cada chamador recebe a sua cópia (o resultado ainda é ajustado por quem o usa)
+        return copy.deepcopy(voo.resultado)
+
+    def executar(self, chave: Hashable, funcao: Callable[[], Any]) -> Any:
+        voo, dono = self.iniciar(chave)
+        if not dono:
+            return self.aguardar(voo)
+
+        try:
+            resultado = funcao()
+        except BaseException as e:
+            self.concluir(chave, voo, erro=e)
+            raise
+        self.concluir(chave, voo, resultado)
+        return resultado
+
+    async def aexecutar(self, chave: Hashable, funcao: Callable[[], Awaitable[Any]]) -> Any:
+        """Versão assíncrona de executar: quem pega carona espera sem bloquear o loop."""
+        futuro = asyncio.get_running_loop().create_future()
+        voo, dono = self.iniciar(chave, futuro)
+        if not dono:
+            await futuro
+            return self._resultado(voo)
+
+        try:
+            resultado = await funcao()
+        except BaseException as e:
+            self.concluir(chave, voo, erro=e)
+            raise
+        self.concluir(chave, voo, resultado)
+        return resultado
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'execucoes': self.execucoes,
+                'compartilhadas': self.compartilhadas,
+                'em_andamento': len(self._voos),
+            }
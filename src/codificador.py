@@ -0,0 +1,202 @@
+"""
+Codificadores do MiniLM (embeddings das consultas e dos chunks) otimizados para CPU.
+Backends (ENCODER_BACKEND):
+  torch  - modelo original do sentence-transformers (referencia)
+  int8   - mesmo modelo com as camadas Linear quantizadas dinamicamente para int8
+  onnx   - exportacao ONNX carregada de um diretorio local e executada no ONNX Runtime
+Com varios workers do gunicorn, cada processo usa so a sua parte dos nucleos
+(ENCODER_THREADS ou nucleos / WEB_CONCURRENCY), em vez de todos disputarem todos.
+"""
+
+import os
+import json
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+MODELO_EMBEDDINGS = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+BACKENDS = ('torch', 'int8', 'onnx')
+
+# Diretorio gerado por `python src/codificador.py --exportar-onnx`
+ONNX_PATH_PADRAO = "data/modelo_onnx"
+ARQUIVO_ONNX = "model.onnx"
+ARQUIVO_META = "codificador.json"
+
+
+def threads_padrao() -> int:
+    """ENCODER_THREADS ou os nucleos divididos entre os workers do gunicorn."""
+    if os.getenv("ENCODER_THREADS"):
+        return max(1, int(os.getenv("ENCODER_THREADS")))
+    workers = max(1, int(os.getenv("WEB_CONCURRENCY", 1)))
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def configurar_threads_torch(threads: int) -> None:
+    """Threads intra-op do PyTorch; inter-op fica em 1 (uma consulta por vez por worker)."""
+    import torch
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # So pode ser definido antes do primeiro trabalho paralelo do processo
+        pass
+
+
+def identificador_modelo(backend: str, modelo: str = MODELO_EMBEDDINGS) -> str:
+    """
+    Chave do modelo no cache de embeddings. O ONNX em float32 reproduz o torch e
+    compartilha os vetores; o int8 difere um pouco e fica separado.
+    """
+    return f"{modelo}#int8" if backend == 'int8' else modelo
+
+
+class CodificadorOnnx(Embeddings):
+    """MiniLM exportado para ONNX: tokenizer rapido + ONNX Runtime + mean pooling."""
+
+    def __init__(self, diretorio: str = ONNX_PATH_PADRAO, threads: Optional[int] = None, batch_size: int = 32):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        diretorio = Path(diretorio)
+        if not (diretorio / ARQUIVO_ONNX).exists():
+            raise FileNotFoundError(
+                f"Modelo ONNX nao encontrado em {diretorio}. "
+                "Gere com: python src/codificador.py --exportar-onnx"
+            )
+        self.meta = json.loads((diretorio / ARQUIVO_META).read_text(encoding="utf-8"))
+        self.batch_size = max(1, batch_size)
+        self.threads = threads or threads_padrao()
+
+        self.tokenizer = Tokenizer.from_file(str(diretorio / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.meta['max_seq_length'])
+        self.tokenizer.enable_padding(pad_id=self.meta['pad_id'], pad_token=self.meta['pad_token'])
+
+        opcoes = ort.SessionOptions()
+        opcoes.intra_op_num_threads = self.threads
+        opcoes.inter_op_num_threads = 1
+        opcoes.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opcoes.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.sessao = ort.InferenceSession(
+            str(diretorio / ARQUIVO_ONNX), opcoes, providers=["CPUExecutionProvider"]
+        )
+        self._entradas = {e.name for e in self.sessao.get_inputs()}
+
+    def _codificar(self, textos: List[str]) -> np.ndarray:
+        # Mesmo pre-processamento do HuggingFaceEmbeddings
+        codificados = self.tokenizer.encode_batch([t.replace("\n", " ") for t in textos])
+        ids = np.array([c.ids for c in codificados], dtype=np.int64)
+        mascara = np.array([c.attention_mask for c in codificados], dtype=np.int64)
+        entradas = {'input_ids': ids, 'attention_mask': mascara}
+        if 'token_type_ids' in self._entradas:
+            entradas['token_type_ids'] = np.zeros_like(ids)
+        estados = self.sessao.run(None, entradas)[0]
+        # Mean pooling sobre os tokens reais (como o modulo Pooling do sentence-transformers)
+        peso = mascara[..., None].astype(np.float32)
+        vetores = (estados * peso).sum(axis=1) / np.clip(peso.sum(axis=1), 1e-9, None)
+        if self.meta.get('normalizar'):
+            vetores /= np.clip(np.linalg.norm(vetores, axis=1, keepdims=True), 1e-12, None)
+        return vetores
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vetores = []
+        # Textos de tamanho parecido no mesmo lote: menos padding
+        ordem = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for ini in range(0, len(ordem), self.batch_size):
+            indices = ordem[ini:ini + self.batch_size]
+            vetores.extend(zip(indices, self._codificar([texts[i] for i in indices])))
+        vetores.sort(key=lambda item: item[0])
+        return [v.tolist() for _, v in vetores]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._codificar([text])[0].tolist()
+
+
+def criar_codificador(backend: Optional[str] = None, threads: Optional[int] = None,
+                      modelo: str = MODELO_EMBEDDINGS, onnx_path: Optional[str] = None) -> Embeddings:
+    """Codificador do backend pedido (padrao: ENCODER_BACKEND ou torch), sempre em CPU."""
+    backend = (backend or os.getenv("ENCODER_BACKEND", "torch")).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de embeddings invalido: {backend} (use {', '.join(BACKENDS)})")
+    threads = threads or threads_padrao()
+
+    if backend == 'onnx':
+        return CodificadorOnnx(onnx_path or os.getenv("ENCODER_ONNX_PATH", ONNX_PATH_PADRAO), threads=threads)
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    configurar_threads_torch(threads)
+    # Forcar CPU para funcionar no Streamlit Cloud (sem GPU)
+    embeddings = HuggingFaceEmbeddings(model_name=modelo, model_kwargs={'device': 'cpu'})
+    if backend == 'int8':
+        import torch
+        # Pesos das camadas Linear em int8; ativacoes quantizadas em tempo de execucao
+        torch.ao.quantization.quantize_dynamic(
+            embeddings._client, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+    return embeddings
+
+
+def exportar_onnx(destino: str = ONNX_PATH_PADRAO, modelo: str = MODELO_EMBEDDINGS) -> Path:
+    """Exporta o transformer do sentence-transformers para ONNX, com o tokenizer e o pooling."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    st = SentenceTransformer(modelo, device='cpu')
+    config_pooling = next(m for m in st if isinstance(m, Pooling)).get_config_dict()
+    # 'pooling_mode' nas versoes novas do sentence-transformers, flags nas antigas
+    if config_pooling.get('pooling_mode', 'mean' if config_pooling.get('pooling_mode_mean_tokens') else None) != 'mean':
+        raise ValueError(f"{modelo} nao usa mean pooling; exportacao nao suportada")
+    transformer = st[0].auto_model.eval()
+    tokenizer = st.tokenizer
+
+    destino = Path(destino)
+    destino.mkdir(parents=True, exist_ok=True)
+    exemplo = tokenizer(["exemplo de consulta"], return_tensors="pt")
+    nomes = [n for n in ('input_ids', 'attention_mask', 'token_type_ids') if n in exemplo]
+    eixos = {n: {0: 'lote', 1: 'tokens'} for n in nomes}
+    eixos['last_hidden_state'] = {0: 'lote', 1: 'tokens'}
+    class _Saida(torch.nn.Module):
+        # Entradas por nome (a ordem posicional do forward muda entre versoes do transformers)
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, *entradas):
+            return self.transformer(**dict(zip(nomes, entradas))).last_hidden_state
+
+    with torch.no_grad():
+        torch.onnx.export(
+            _Saida(), tuple(exemplo[n] for n in nomes), str(destino / ARQUIVO_ONNX),
+            input_names=nomes, output_names=['last_hidden_state'],
+            dynamic_axes=eixos, opset_version=17, dynamo=False,
+        )
+    tokenizer.save_pretrained(str(destino))
+    meta = {
+        'modelo': modelo,
+        'max_seq_length': st.max_seq_length,
+        'dimensoes': st.get_sentence_embedding_dimension(),
+        'pad_id': tokenizer.pad_token_id,
+        'pad_token': tokenizer.pad_token,
+        'normalizar': any(isinstance(m, Normalize) for m in st),
+    }
+    (destino / ARQUIVO_META).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    return destino
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta o modelo de embeddings para ONNX (ENCODER_BACKEND=onnx)")
+    parser.add_argument("--exportar-onnx", nargs="?", const=ONNX_PATH_PADRAO, metavar="DIRETORIO",
+                        default=ONNX_PATH_PADRAO, help=f"Diretorio de destino (padrao: {ONNX_PATH_PADRAO})")
+    parser.add_argument("--modelo", default=MODELO_EMBEDDINGS)
+    args = parser.parse_args()
+    destino = exportar_onnx(args.exportar_onnx, args.modelo)
+    print(f"✅ Modelo ONNX salvo em {destino}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Contexto dos insumos no prompt de recomendação, com orçamento de tokens.
+Os chunks recuperados trazem procedimentos de doseamento, tabelas de reagentes e
+ensaios que não ajudam a recomendar e só aumentam a entrada (e a latência) do LLM.
+Cada insumo começa por nome, classe terapêutica e indicações; o restante do conteúdo
+entra linha a linha, das mais relevantes para os sintomas às menos, até o orçamento
+acabar. Empates são resolvidos pela ordem original, então o corte é determinístico.
+"""
+
+import os
+import re
+import math
+from typing import Callable, Dict, List, Optional, Tuple
+
+from indice_bm25 import tokenizar
+
+# Peso de cada seção da monografia (tags do ingestor em metadata['secao'])
+PESO_SECOES = {
+    'resumo': 1.0,
+    'classe_terapeutica': 1.0,
+    'categoria': 1.0,
+    'caracteristicas': 0.5,
+    'descricao': 0.3,
+    'armazenamento': 0.0,
+    'rotulagem': -0.5,
+    'identificacao': -1.0,
+    'ensaios_pureza': -1.5,
+    'seguranca_biologica': -1.5,
+    'doseamento': -2.0,
+}
+
+# Radicais (sem acento) de linhas que ajudam a recomendar ou a alertar
+RADICAIS_UTEIS = (
+    'indica', 'uso', 'posolog', 'dose', 'contraindic', 'precauc', 'cuidado', 'advers',
+    'efeito', 'interac', 'gravidez', 'gestant', 'lactant', 'crianc', 'tratamento', 'alivio',
+)
+
+# Radicais de procedimentos analíticos (titulação, reagentes, cromatografia...)
+RADICAIS_ENSAIO = (
+    'titul', 'reagente', 'volumetric', 'cromatograf', 'absorvanc', 'espectr', 'pesar',
+    'pese', 'dissolv', 'transfir', 'balao', 'filtr', 'agit', 'aliquota',
+)
+UNIDADES_ENSAIO = frozenset({'ml', 'nm', 'mol', 'ul'})
+
+# Linhas do cabeçalho gravado pelo ingestor: substituídas pelo bloco essencial
+_CABECALHO = re.compile(r"^(MEDICAMENTO|CODIGO|TIPO|CLASSE TERAPEUTICA|INDICACOES):", re.IGNORECASE)
+# Rodapés das páginas da Farmacopeia
+_RODAPE = re.compile(r"Farmacopeia Brasileira, \d+ª edição|^pagina \d+$", re.IGNORECASE)
+
+
+class ContadorTokens:
+    """
+    Conta tokens com um tokenizer local (nunca baixa nada): PROMPT_TOKENIZER_PATH, o
+    tokenizer.json do modelo ONNX ou o do MiniLM no cache do Hugging Face. O MiniLM usa
+    o SentencePiece multilíngue do XLM-R, próximo dos LLMs em texto em português.
+    Sem nenhum deles, estima um token a cada 4 letras (ou sinais seguidos) de cada palavra.
+    """
+
+    def __init__(self, caminho: Optional[str] = None):
+        self.tokenizer = None
+        self.origem = "estimativa"
+        for candidato in [caminho or os.getenv("PROMPT_TOKENIZER_PATH"), *self._caminhos_locais()]:
+            if candidato and os.path.exists(candidato):
+                try:
+                    from tokenizers import Tokenizer
+                    self.tokenizer = Tokenizer.from_file(candidato)
+                    self.origem = candidato
+                    break
+                except Exception as e:
+                    print(f"⚠️ Tokenizer {candidato} inválido: {str(e)[:80]}")
+
+    @staticmethod
+    def _caminhos_locais() -> List[str]:
+        from codificador import MODELO_EMBEDDINGS, ONNX_PATH_PADRAO
+        caminhos = [os.path.join(os.getenv("ENCODER_ONNX_PATH", ONNX_PATH_PADRAO), "tokenizer.json")]
+        try:
+            from huggingface_hub import try_to_load_from_cache
+            em_cache = try_to_load_from_cache(MODELO_EMBEDDINGS, "tokenizer.json")
+            if isinstance(em_cache, str):
+                caminhos.append(em_cache)
+        except ImportError:
+            pass
+        return caminhos
+
+    def __call__(self, texto: str) -> int:
+        if not texto:
+            return 0
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(texto, add_special_tokens=False).ids)
+        return sum(math.ceil(len(p) / 4) for p in re.findall(r"\w+|[^\w\s]+", texto))
+
+
+class MontadorContexto:
+    """
+    Monta o bloco de insumos do prompt dentro de um orçamento de tokens (0 = sem limite).
+    Se o conteúdo integral dos chunks já cabe no orçamento, ele vai sem cortes.
+    """
+
+    def __init__(self, orcamento: int, contar: Optional[Callable[[str], int]] = None):
+        self.orcamento = max(0, orcamento)
+        self.contar = contar or ContadorTokens()
+
+    @staticmethod
+    def _pontuar(linha: str, secao: str, termos_consulta: set) -> float:
+        termos = tokenizar(linha)
+        if not termos:
+            return -math.inf
+        pontos = PESO_SECOES.get(secao, 0.0)
+        pontos += 3.0 * len(termos_consulta.intersection(termos))
+        if any(t.startswith(RADICAIS_UTEIS) for t in termos):
+            pontos += 1.0
+        if any(t.startswith(RADICAIS_ENSAIO) or t in UNIDADES_ENSAIO for t in termos):
+            pontos -= 1.5
+        # Tabelas e procedimentos: linhas dominadas por números e unidades
+        if sum(c.isdigit() for c in linha) > 0.2 * len(linha):
+            pontos -= 1.0
+        return pontos
+
+    @staticmethod
+    def _essencial(i: int, insumo: Dict) -> str:
+        meta = insumo['metadata']
+        indicacoes = meta.get('indicacoes', '')
+        if isinstance(indicacoes, list):
+            indicacoes = ', '.join(indicacoes)
+        return (
+            f"===== INSUMO {i+1} =====\n"
+            f"🔬 NOME QUÍMICO OBRIGATÓRIO: {meta.get('nome', 'NÃO ESPECIFICADO').upper()}\n"
+            f"CLASSE TERAPÊUTICA: {meta.get('classe_terapeutica') or 'Não especificada'}\n"
+            f"INDICAÇÕES: {indicacoes or 'Não especificadas'}\n"
+            f"(Relevância: {insumo['relevancia_score']})"
+        )
+
+    @staticmethod
+    def _linhas(insumo: Dict) -> List[str]:
+        nome = insumo['metadata'].get('nome', '').strip().lower()
+        linhas = []
+        for linha in insumo['conteudo'].splitlines():
+            linha = linha.strip()
+            if not linha or _CABECALHO.match(linha) or _RODAPE.search(linha):
+                continue
+            # Nome solto ou "NOME - SEÇÃO": já está no bloco essencial
+            if nome and (linha.lower() == nome or linha.lower().startswith(f"{nome} - ")):
+                continue
+            linhas.append(linha)
+        return linhas
+
+    @staticmethod
+    def formato_completo(insumos: List[Dict]) -> str:
+        """Conteúdo integral de cada chunk (formato sem orçamento)."""
+        return "\n\n".join([
+            f"""===== INSUMO {i+1} =====
+🔬 NOME QUÍMICO OBRIGATÓRIO: {insumo['metadata'].get('nome', 'NÃO ESPECIFICADO').upper()}
+
+CONTEÚDO DA MONOGRAFIA:
+{insumo['conteudo']}
+
+(Relevância: {insumo['relevancia_score']})
+{'='*50}"""
+            for i, insumo in enumerate(insumos)
+        ])
+
+    @staticmethod
+    def _estatisticas(originais: int, usados: int) -> Dict[str, int]:
+        return {'tokens_originais': originais, 'tokens_usados': usados, 'tokens_economizados': originais - usados}
+
+    def montar(self, consulta: str, insumos: List[Dict]) -> Tuple[str, Dict[str, int]]:
+        """
+        Retorna (contexto, estatísticas). consulta são os sintomas (com a expansão) usados
+        para ordenar as linhas; as estatísticas comparam os tokens com o conteúdo integral.
+        """
+        completo = self.formato_completo(insumos)
+        originais = self.contar(completo)
+        # Sem orçamento, ou o conteúdo integral já cabe nele
+        if not self.orcamento or originais <= self.orcamento:
+            return completo, self._estatisticas(originais, originais)
+
+        essenciais = [self._essencial(i, insumo) for i, insumo in enumerate(insumos)]
+        linhas = [self._linhas(insumo) for insumo in insumos]
+        contagens = [[self.contar(l) for l in ls] for ls in linhas]
+        termos_consulta = set(tokenizar(consulta))
+
+        # Bloco essencial (e a moldura do insumo) sempre entra; as linhas disputam o que sobrar
+        restante = self.orcamento - sum(
+            self.contar(f"{e}\n\nCONTEÚDO DA MONOGRAFIA:\n[demais trechos omitidos]\n{'='*50}") for e in essenciais
+        )
+        candidatas = sorted(
+            (-self._pontuar(linha, insumo['metadata'].get('secao', ''), termos_consulta), i, j)
+            for i, (insumo, ls) in enumerate(zip(insumos, linhas))
+            for j, linha in enumerate(ls)
+        )
+        escolhidas = [set() for _ in linhas]
+        for _, i, j in candidatas:
+            if contagens[i][j] <= restante:
+                escolhidas[i].add(j)
+                restante -= contagens[i][j]
+
+        blocos = []
+        for essencial, ls, usadas in zip(essenciais, linhas, escolhidas):
+            # Linhas escolhidas na ordem original do chunk
+            trechos = [ls[j] for j in sorted(usadas)]
+            if len(usadas) < len(ls):
+                trechos.append("[demais trechos omitidos]")
+            blocos.append(f"{essencial}\n\nCONTEÚDO DA MONOGRAFIA:\n" + "\n".join(trechos) + f"\n{'='*50}")
+        contexto = "\n\n".join(blocos)
+
+        usados = self.contar(contexto)
+        if usados >= originais:
+            # Chunks curtos: o bloco essencial sairia maior que o próprio conteúdo
+            return completo, self._estatisticas(originais, originais)
+        return contexto, self._estatisticas(originais, usados)
@@ -5,74 +5,464 @@ VERSÃO CORRIGIDA - Validação rigorosa de nomes químicos
 """
 
 import os
+import copy
 import json
-from typing import Dict, List
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
 
 from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.documents import Document
 from langchain_core.messages import HumanMessage, SystemMessage
 
+from cache_embeddings import CacheConsultas
+from cache_recomendacoes import CacheRecomendacoes, CacheSemantico
+from cache_respostas_llm import CacheRespostasLLM
+from chamadas_compartilhadas import ChamadasCompartilhadas
+from codificador import criar_codificador
+from contexto_prompt import MontadorContexto
+from base_monografias import JSON_PADRAO as MONOGRAFIAS_JSON, carregar_monografias
+from indice_bm25 import IndiceBM25, tokenizar
+from indice_quantizado import (
+    CAMINHO_NUMPY_PADRAO as INDICE_NUMPY_PADRAO, CAMINHO_PADRAO as INDICE_QUANTIZADO_PADRAO, IndiceQuantizado
+)
+from indice_termos import IndiceTermos, normalizar_consulta
+from inicializacao import ComponentePreguicoso
+from json_incremental import ParserJSONIncremental
+from limitador_llm import limitador_do_provider
+from pool_llm import PoolProvedores, ProvedorLLM
+
 load_dotenv()
 
 
 class AssistenteFarmaceutico:
     """Motor de IA para recomendação de fórmulas magistrais."""
     
-    def __init__(self, vectorstore_path: str):
+    # Provider -> (variável da chave de API, variável do modelo, modelo padrão); Groq com Llama 3.3 70B
+    PROVIDERS = {
+        "gemini": ("GOOGLE_API_KEY", "GEMINI_MODEL", "gemini-2.0-flash"),
+        "groq": ("GROQ_API_KEY", "GROQ_MODEL", "llama-3.3-70b-versatile"),
+    }
+    TEMPERATURA = 0.1
+    # Nome de monografia que cobre mais que essa fração do texto é uma busca pelo nome
+    COBERTURA_NOME_EXATO = 0.5
+    
+    def __init__(self, vectorstore_path: str, aquecer: Optional[bool] = None):
+        """
+        Só lê a configuração: modelo de embeddings, índice vetorial, cliente do LLM e
+        BM25 são criados no primeiro uso (ver ComponentePreguicoso). Com aquecer=True
+        (ou WARMUP_ON_START=1) uma thread em segundo plano já os carrega; is_ready()
+        informa quando terminou.
+        """
         self.vectorstore_path = vectorstore_path
+        self._lock_inicializacao = threading.RLock()
+        self.tempos_inicializacao: Dict[str, float] = {}
+        self.tempos_aquecimento: Dict[str, float] = {}
+        self._aquecimento: Optional[threading.Thread] = None
+        self.erro_aquecimento: Optional[str] = None
+        
+        # Configurar LLM (o cliente é criado no primeiro uso)
+        self.provider = os.getenv("LLM_PROVIDER", "gemini").lower()
+        
+        if self.provider not in self.PROVIDERS:
+            print(f"⚠️ Provider '{self.provider}' não suportado. Usando Groq como fallback.")
+            self.provider = "groq"
+        _, variavel_modelo, modelo_padrao = self.PROVIDERS[self.provider]
+        self.modelo = os.getenv(variavel_modelo, modelo_padrao)
         
-        # Carregar vectorstore
-        # Forçar CPU para funcionar no Streamlit Cloud (sem GPU)
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-            model_kwargs={'device': 'cpu'}
+        # Mapa de sintomas compilado uma única vez (Aho-Corasick)
+        self.indice_sintomas = IndiceTermos(self.SINTOMAS_PARA_CLASSES)
+        
+        # Recomendações prontas (TTL; erros expiram antes; reindexação invalida tudo)
+        self.cache_recomendacoes = CacheRecomendacoes(
+            ttl=float(os.getenv("RECOMMENDATION_CACHE_TTL", 3600)),
+            ttl_erro=float(os.getenv("RECOMMENDATION_CACHE_ERROR_TTL", 60)),
+            tamanho=int(os.getenv("RECOMMENDATION_CACHE_SIZE", 512)),
+        )
+        # Sintomas parecidos (mesmo sentido, outras palavras) reaproveitam a recomendação
+        self.cache_semantico = CacheSemantico(
+            limiar=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.92)),
+            ttl=float(os.getenv("RECOMMENDATION_CACHE_TTL", 3600)),
+            tamanho=int(os.getenv("SEMANTIC_CACHE_SIZE", 256)),
         )
         
-        self.vectorstore = Chroma(
-            persist_directory=vectorstore_path,
-            embedding_function=self.embeddings
+        # Expansão via LLM roda em paralelo com a primeira busca; sem resposta até o prazo, segue sem ela
+        self.prazo_expansao_llm = float(os.getenv("LLM_EXPANSION_DEADLINE", 8))
+        self.executor_expansao = ThreadPoolExecutor(
+            max_workers=int(os.getenv("LLM_EXPANSION_WORKERS", 4)),
+            thread_name_prefix="expansao_llm"
         )
         
-        # Configurar LLM
-        self.provider = os.getenv("LLM_PROVIDER", "gemini").lower()
+        # Respostas do LLM em disco, compartilhadas entre processos (LLM_CACHE=0 desativa)
+        self.cache_llm = None
+        if os.getenv("LLM_CACHE", "1").lower() not in ("0", "false", "nao", "não"):
+            self.cache_llm = CacheRespostasLLM(
+                tamanho_max_mb=float(os.getenv("LLM_CACHE_MAX_MB", 64)),
+                ttl=float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600)),
+            )
         
-        if self.provider == "groq":
-            # Usar Groq com Llama 3.3 70B
+        # Pedidos idênticos simultâneos (ex.: respostas a uma mensagem em massa) dividem uma execução
+        self.chamadas_compartilhadas = ChamadasCompartilhadas()
+        
+        # Peso da fusão BM25 + busca vetorial (RRF)
+        self.rrf_k = int(os.getenv("RRF_K", 60))
+        
+        # Tokens do contexto dos insumos enviados ao LLM (acumulado entre as chamadas)
+        self.tokens_contexto = {'prompts': 0, 'tokens_originais': 0, 'tokens_usados': 0}
+        self._lock_tokens = threading.Lock()
+        
+        print(f"✅ Assistente configurado com {self.provider.upper()}")
+        
+        if aquecer is None:
+            aquecer = os.getenv("WARMUP_ON_START", "0").lower() in ("1", "true", "sim")
+        if aquecer:
+            self.iniciar_aquecimento()
+    
+    # === Componentes pesados (criados no primeiro acesso) ===
+    
+    def _criar_embeddings(self) -> CacheConsultas:
+        # MiniLM em CPU no backend de ENCODER_BACKEND (torch, int8 ou onnx; ver codificador.py)
+        # LRU de vetores de consulta: frases repetidas não passam de novo pelo modelo
+        return CacheConsultas(
+            criar_codificador(),
+            tamanho=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 256)),
+        )
+    
+    def _criar_vectorstore(self) -> Chroma:
+        # Chroma só é aberto quando usado (os backends em NumPy não precisam dele)
+        return Chroma(
+            persist_directory=self.vectorstore_path,
+            embedding_function=self.embeddings
+        )
+    
+    @staticmethod
+    def _criar_cliente_llm(provider: str, modelo: str):
+        if provider == "groq":
             from langchain_groq import ChatGroq
-            self.llm = ChatGroq(
-                model=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"),
-                temperature=0.1,
+            return ChatGroq(
+                model=modelo,
+                temperature=AssistenteFarmaceutico.TEMPERATURA,
                 groq_api_key=os.getenv("GROQ_API_KEY"),
             )
-        elif self.provider == "gemini":
-            self.llm = ChatGoogleGenerativeAI(
-                model=os.getenv("GEMINI_MODEL", "gemini-2.0-flash"),
-                temperature=0.1,
-                google_api_key=os.getenv("GOOGLE_API_KEY"),
-                convert_system_message_to_human=True
+        return ChatGoogleGenerativeAI(
+            model=modelo,
+            temperature=AssistenteFarmaceutico.TEMPERATURA,
+            google_api_key=os.getenv("GOOGLE_API_KEY"),
+            convert_system_message_to_human=True
+        )
+    
+    def _criar_llm(self) -> PoolProvedores:
+        """
+        Pool com o provider configurado e, se a chave do outro existir, ele como reserva
+        (hedge após o p95 do principal e failover em 429/5xx; LLM_POOL=0 desativa).
+        Cada provider passa pelo limitador de taxa do processo (chamadas/s e tokens/min).
+        """
+        def provedor(provider: str, modelo: str) -> ProvedorLLM:
+            limitador = limitador_do_provider(
+                provider,
+                chamadas_por_s=float(os.getenv("LLM_MAX_CALLS_PER_SECOND", 5)),
+                tokens_por_min=float(os.getenv("LLM_MAX_TOKENS_PER_MINUTE", 0)),
             )
+            return ProvedorLLM(provider, modelo, self._criar_cliente_llm(provider, modelo), limitador)
+        
+        provedores = [provedor(self.provider, self.modelo)]
+        if os.getenv("LLM_POOL", "1").lower() not in ("0", "false", "nao", "não"):
+            for provider, (variavel_chave, variavel_modelo, modelo_padrao) in self.PROVIDERS.items():
+                if provider != self.provider and os.getenv(variavel_chave):
+                    provedores.append(provedor(provider, os.getenv(variavel_modelo, modelo_padrao)))
+        print(f"🔀 Providers de LLM: {', '.join(p.nome.upper() for p in provedores)}")
+        return PoolProvedores(
+            provedores,
+            hedge=os.getenv("LLM_HEDGE", "1").lower() not in ("0", "false", "nao", "não"),
+            atraso_hedge=float(os.getenv("LLM_HEDGE_DELAY", 4)),
+            tentativas=int(os.getenv("LLM_RETRIES", 3)),
+            backoff_base=float(os.getenv("LLM_BACKOFF_BASE", 0.5)),
+            backoff_max=float(os.getenv("LLM_BACKOFF_MAX", 8)),
+            contar_tokens=self.montador_contexto.contar,
+        )
+    
+    def _criar_busca_vetorial(self):
+        """
+        Escolhe o backend por BUSCA_VETORIAL: "chroma", "numpy" (matriz float32 em mmap,
+        busca exata) ou "quantizado" (int8/float16).
+        """
+        backend = os.getenv("BUSCA_VETORIAL", "chroma").lower()
+        if backend in ("numpy", "quantizado"):
+            if backend == "numpy":
+                caminho = os.getenv("NUMPY_INDEX_PATH", INDICE_NUMPY_PADRAO)
+            else:
+                caminho = os.getenv("QUANTIZED_INDEX_PATH", INDICE_QUANTIZADO_PADRAO)
+            if os.path.exists(os.path.join(caminho, "config.json")):
+                indice = IndiceQuantizado(caminho, self.embeddings)
+                print(f"📦 Busca no índice {backend} ({indice.tipo}, {indice.config['total']} vetores)")
+                return indice
+            print(f"⚠️ Índice {backend} não encontrado em {caminho}. Usando Chroma.")
+        elif backend != "chroma":
+            print(f"⚠️ Backend de busca '{backend}' não suportado. Usando Chroma.")
+        return self.vectorstore
+    
+    def _criar_indice_bm25(self) -> Optional[IndiceBM25]:
+        """Índice BM25 das monografias; BUSCA_HIBRIDA=0 desativa (só busca vetorial)."""
+        if os.getenv("BUSCA_HIBRIDA", "1").lower() in ("0", "false", "nao", "não"):
+            return None
+        caminho = os.getenv("MONOGRAFIAS_DB_PATH", "data/monografias.sqlite")
+        # A base é gerada pela ingestão (ou por src/base_monografias.py); vários workers
+        # iniciando juntos não devem convertê-la ao mesmo tempo
+        if not os.path.exists(caminho):
+            if os.path.exists(MONOGRAFIAS_JSON):
+                print("⚠️ Base de monografias não gerada (python src/base_monografias.py): busca só vetorial")
+            else:
+                print("⚠️ Backup de monografias não encontrado: busca só vetorial")
+            return None
+        base = carregar_monografias(caminho, converter=False)
+        indice = IndiceBM25.de_monografias(base)
+        base.fechar()
+        print(f"🔤 Índice BM25 com {len(indice)} monografias")
+        return indice
+    
+    def _criar_montador_contexto(self) -> MontadorContexto:
+        # Orçamento de tokens do contexto dos insumos (0 = conteúdo integral dos chunks)
+        return MontadorContexto(int(os.getenv("PROMPT_CONTEXT_TOKENS", 900)))
+    
+    embeddings = ComponentePreguicoso(_criar_embeddings)
+    vectorstore = ComponentePreguicoso(_criar_vectorstore)
+    llm = ComponentePreguicoso(_criar_llm)
+    # Backend da busca vetorial: Chroma ou índice em NumPy (float32 ou quantizado) gerado na ingestão
+    busca_vetorial = ComponentePreguicoso(_criar_busca_vetorial)
+    # BM25 sobre nomes/classes/indicações das monografias, fundido com a busca vetorial (RRF)
+    indice_bm25 = ComponentePreguicoso(_criar_indice_bm25)
+    # Contexto dos insumos no prompt com orçamento de tokens (tokenizer local)
+    montador_contexto = ComponentePreguicoso(_criar_montador_contexto)
+    
+    # Ordem de carga no aquecimento (cada um só depende dos anteriores)
+    COMPONENTES = ('embeddings', 'busca_vetorial', 'filtro_secoes', 'indice_bm25', 'montador_contexto', 'llm')
+    
+    def iniciar_aquecimento(self) -> threading.Thread:
+        """Carrega os componentes em uma thread em segundo plano (idempotente)."""
+        with self._lock_inicializacao:
+            if self._aquecimento is None:
+                self._aquecimento = threading.Thread(
+                    target=self._aquecer, name="aquecimento_assistente", daemon=True
+                )
+                self._aquecimento.start()
+        return self._aquecimento
+    
+    def _carregar_componentes(self) -> None:
+        for nome in self.COMPONENTES:
+            getattr(self, nome)
+    
+    async def _apreparar(self) -> None:
+        """
+        Carrega no executor os componentes que ainda faltam: a primeira criação (modelo,
+        índice, cliente do LLM, BM25) leva segundos e travaria o loop. Falhas aparecem
+        depois, no uso do componente, como no caminho síncrono.
+        """
+        if self.is_ready():
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._carregar_componentes)
+        except Exception as e:
+            print(f"⚠️ Erro ao carregar os componentes: {e}")
+    
+    def _aquecer(self) -> None:
+        inicio = time.perf_counter()
+        try:
+            self._carregar_componentes()
+            # Primeira inferência do modelo e primeira leitura do índice
+            etapa = time.perf_counter()
+            self.embeddings.embeddings.embed_query("aquecimento")
+            self.tempos_aquecimento['embedding_teste'] = time.perf_counter() - etapa
+            etapa = time.perf_counter()
+            self.busca_vetorial.similarity_search_with_score("aquecimento", k=1, filter=self.filtro_secoes)
+            self.tempos_aquecimento['busca_teste'] = time.perf_counter() - etapa
+            print(f"🔥 Assistente aquecido em {time.perf_counter() - inicio:.1f}s")
+        except Exception as e:
+            self.erro_aquecimento = str(e)
+            print(f"⚠️ Erro no aquecimento: {e}")
+    
+    def is_ready(self) -> bool:
+        """True quando todos os componentes pesados já foram carregados."""
+        return all(getattr(type(self), nome).carregado(self) for nome in self.COMPONENTES)
+    
+    def status_inicializacao(self) -> Dict:
+        """Componentes carregados e tempos de carga (para o health check)."""
+        return {
+            "pronto": self.is_ready(),
+            "aquecendo": self._aquecimento is not None and self._aquecimento.is_alive(),
+            "erro_aquecimento": self.erro_aquecimento,
+            "componentes": {
+                nome: getattr(type(self), nome).carregado(self) for nome in self.COMPONENTES
+            },
+            "tempos_s": {
+                nome: round(t, 3)
+                for nome, t in {**self.tempos_inicializacao, **self.tempos_aquecimento}.items()
+            },
+        }
+    
+    def estatisticas_cache(self) -> Dict:
+        """Contadores dos caches do assistente (para monitoramento)."""
+        return {
+            "embeddings_consulta": (
+                self.embeddings.estatisticas() if type(self).embeddings.carregado(self) else None
+            ),
+            "recomendacoes": self.cache_recomendacoes.estatisticas(),
+            "recomendacoes_semantico": self.cache_semantico.estatisticas(),
+            "chamadas_compartilhadas": self.chamadas_compartilhadas.estatisticas(),
+            "respostas_llm": self.cache_llm.estatisticas() if self.cache_llm is not None else None,
+        }
+    
+    def estatisticas_llm(self) -> Optional[Dict]:
+        """Latência, erros, vitórias, hedges e fila do limite por provider (None antes do primeiro uso)."""
+        if not type(self).llm.carregado(self) or not isinstance(self.llm, PoolProvedores):
+            return None
+        return self.llm.estatisticas()
+    
+    def estatisticas_contexto(self) -> Dict:
+        """Tokens do contexto dos insumos: integral x enviado ao LLM, somados entre as chamadas."""
+        with self._lock_tokens:
+            return {
+                **self.tokens_contexto,
+                "tokens_economizados": self.tokens_contexto['tokens_originais'] - self.tokens_contexto['tokens_usados'],
+            }
+    
+    def versao_base(self) -> tuple:
+        """
+        Identifica a versão do banco vetorial em disco (tamanho e data dos arquivos,
+        inclusive os segmentos do Chroma em subdiretórios). Muda a cada reindexação,
+        invalidando o cache de recomendações.
+        """
+        versao = []
+        caminhos = [self.vectorstore_path]
+        if isinstance(self.busca_vetorial, IndiceQuantizado):
+            caminhos.append(str(self.busca_vetorial.diretorio))
+        for caminho in caminhos:
+            for diretorio, _, arquivos in os.walk(caminho):
+                for arquivo in arquivos:
+                    arquivo = os.path.join(diretorio, arquivo)
+                    try:
+                        info = os.stat(arquivo)
+                    except FileNotFoundError:
+                        # Removido durante a reindexação
+                        continue
+                    versao.append((arquivo, info.st_size, info.st_mtime_ns))
+        return tuple(sorted(versao))
+    
+    # Seções úteis para recomendação (tags gravadas pelo ingestor em metadata['secao'])
+    SECOES_RECOMENDACAO = ['resumo', 'descricao', 'caracteristicas', 'classe_terapeutica', 'categoria']
+    
+    def _criar_filtro_secoes(self) -> Optional[Dict]:
+        """
+        Filtro do Chroma por seção. Configurável por SECOES_BUSCA (lista separada por
+        vírgulas ou "todas"); desativado em bancos indexados antes da divisão por seções.
+        """
+        secoes = os.getenv("SECOES_BUSCA", ",".join(self.SECOES_RECOMENDACAO)).strip()
+        if not secoes or secoes.lower() == "todas":
+            return None
+        
+        if isinstance(self.busca_vetorial, IndiceQuantizado):
+            possui_secoes = self.busca_vetorial.possui_secoes
         else:
-            print(f"⚠️ Provider '{self.provider}' não suportado. Usando Groq como fallback.")
-            self.provider = "groq"
-            from langchain_groq import ChatGroq
-            self.llm = ChatGroq(
-                model=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"),
-                temperature=0.1,
-                groq_api_key=os.getenv("GROQ_API_KEY"),
-            )
+            amostra = self.vectorstore._collection.get(limit=1, include=["metadatas"])
+            possui_secoes = bool(amostra["metadatas"]) and "secao" in amostra["metadatas"][0]
+        if not possui_secoes:
+            print("⚠️ Banco vetorial sem seções: busca em todos os chunks (reindexe para filtrar)")
+            return None
         
-        print(f"✅ Assistente inicializado com {self.provider.upper()}")
+        return {"secao": {"$in": [s.strip() for s in secoes.split(",") if s.strip()]}}
+    
+    # Seções das monografias consultadas na busca (ensaios, doseamento etc. ficam de fora)
+    filtro_secoes = ComponentePreguicoso(_criar_filtro_secoes)
     
     def expandir_query_inteligente(self, sintomas: str) -> str:
         """
         Usa o LLM para analisar os sintomas e sugerir classes terapêuticas.
         Isso elimina a necessidade de mapeamento manual de termos.
         O LLM deve entender variações de linguagem, erros ortográficos e gírias.
+        Chamadas simultâneas com os mesmos sintomas (normalizados) dividem uma só ida ao LLM.
         """
-        prompt = f"""Você é um especialista em farmacologia brasileira. Sua tarefa é analisar sintomas 
+        return self.chamadas_compartilhadas.executar(
+            ('expansao', normalizar_consulta(sintomas), self.provider, self.modelo),
+            lambda: self._expandir_query_llm(sintomas)
+        )
+    
+    def _expandir_query_llm(self, sintomas: str) -> str:
+        try:
+            messages = [HumanMessage(content=self._prompt_expansao(sintomas))]
+            resposta = self._invocar_llm(messages)
+            termos = self._limpar_termos_llm(resposta.content)
+            # Só respostas aproveitáveis vão para o cache em disco
+            if termos:
+                self._guardar_resposta_llm(messages, resposta)
+            return termos
+        except Exception as e:
+            print(f"⚠️ Erro na expansão inteligente: {e}")
+            return ""
+    
+    async def aexpandir_query_inteligente(self, sintomas: str) -> str:
+        """Versão assíncrona de expandir_query_inteligente (ainvoke), com a mesma coalescência."""
+        return await self.chamadas_compartilhadas.aexecutar(
+            ('expansao', normalizar_consulta(sintomas), self.provider, self.modelo),
+            lambda: self._aexpandir_query_llm(sintomas)
+        )
+    
+    async def _aexpandir_query_llm(self, sintomas: str) -> str:
+        try:
+            messages = [HumanMessage(content=self._prompt_expansao(sintomas))]
+            resposta = await self._ainvocar_llm(messages)
+            termos = self._limpar_termos_llm(resposta.content)
+            if termos:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self._guardar_resposta_llm, messages, resposta
+                )
+            return termos
+        except Exception as e:
+            print(f"⚠️ Erro na expansão inteligente: {e}")
+            return ""
+    
+    def _invocar_llm(self, messages: List):
+        """
+        self.llm.invoke consultando antes o cache de respostas em disco. A chave usa o
+        provider e o modelo principais: uma resposta vinda da reserva do pool vale para o
+        mesmo prompt. Quem chama grava a resposta com _guardar_resposta_llm depois de
+        validá-la, para que respostas truncadas ou inválidas não voltem do disco.
+        """
+        resposta = self._obter_resposta_llm(messages)
+        if resposta is not None:
+            return resposta
+        return self.llm.invoke(messages)
+    
+    async def _ainvocar_llm(self, messages: List):
+        """Versão assíncrona de _invocar_llm (o SQLite roda no executor do loop)."""
+        if self.cache_llm is not None:
+            resposta = await asyncio.get_running_loop().run_in_executor(
+                None, self.cache_llm.obter, self._chave_resposta_llm(messages)
+            )
+            if resposta is not None:
+                return resposta
+        return await self.llm.ainvoke(messages)
+    
+    def _obter_resposta_llm(self, messages: List):
+        """Resposta do cache em disco para essas mensagens (None sem cache ou sem resposta)."""
+        if self.cache_llm is None:
+            return None
+        return self.cache_llm.obter(self._chave_resposta_llm(messages))
+    
+    def _chave_resposta_llm(self, messages: List) -> str:
+        return CacheRespostasLLM.chave(self.provider, self.modelo, self.TEMPERATURA, messages)
+    
+    def _guardar_resposta_llm(self, messages: List, resposta) -> None:
+        """Grava no cache em disco uma resposta já validada (as que vieram dele não são regravadas)."""
+        if self.cache_llm is None or resposta.response_metadata.get('do_cache'):
+            return
+        self.cache_llm.guardar(self._chave_resposta_llm(messages), self.provider, self.modelo, resposta)
+    
+    def _prompt_expansao(self, sintomas: str) -> str:
+        return f"""Você é um especialista em farmacologia brasileira. Sua tarefa é analisar sintomas 
 descritos por pacientes (mesmo com erros ortográficos, gírias ou linguagem informal) e sugerir:
 
 1. Classes terapêuticas apropriadas (ex: analgésico, antipirético, antianginoso, mucolítico)
@@ -103,395 +493,549 @@ Responda APENAS com termos separados por espaço (classes + nomes de medicamento
 Não inclua explicações, apenas os termos.
 
 Sua resposta:"""
+    
+    def _limpar_termos_llm(self, termos_llm: str) -> str:
+        # Limpar resposta - remover caracteres especiais
+        termos_llm = termos_llm.strip()
+        termos_llm = termos_llm.replace('\n', ' ').replace(',', ' ').replace('.', ' ')
+        termos_llm = ' '.join(termos_llm.split())  # Normalizar espaços
+        
+        print(f"🤖 LLM sugeriu: {termos_llm[:80]}...")
+        return termos_llm
+    
+    # Mapeamento de sintomas para classes terapêuticas (compilado em IndiceTermos no __init__)
+    SINTOMAS_PARA_CLASSES = {
+        # === TOSSE E SISTEMA RESPIRATÓRIO ===
+        'tosse': 'mucolítico expectorante ACETILCISTEÍNA',
+        'catarro': 'mucolítico expectorante ACETILCISTEÍNA',
+        'secreção': 'mucolítico expectorante ACETILCISTEÍNA',
+        'tosse seca': 'antitussígeno',
+        'tosse produtiva': 'mucolítico expectorante ACETILCISTEÍNA',
+        'tossindo': 'mucolítico expectorante',
+        'pigarro': 'mucolítico expectorante',
+        'peito carregado': 'mucolítico expectorante',
+        'pulmão': 'broncodilatador',
+        'respirar': 'broncodilatador',
+        'respiração': 'broncodilatador',
+        'falta de ar': 'broncodilatador antiasmático AMINOFILINA SALBUTAMOL',
+        'dificuldade para respirar': 'broncodilatador antiasmático',
+        'chiado': 'broncodilatador antiasmático',
+        'asma': 'broncodilatador antiasmático AMINOFILINA SALBUTAMOL',
+        'bronquite': 'broncodilatador',
+        'nariz entupido': 'descongestionante',
+        'nariz': 'descongestionante anti-histamínico',
+        'coriza': 'anti-histamínico descongestionante',
+        'espirro': 'anti-histamínico',
+        'espirrando': 'anti-histamínico',
+        'sinusite': 'descongestionante antibiótico',
+        'rinite': 'anti-histamínico descongestionante',
+        
+        # === DOR E FEBRE ===
+        'dor de cabeça': 'analgésico antipirético PARACETAMOL DIPIRONA',
+        'cabeça': 'analgésico antipirético PARACETAMOL',
+        'cefaleia': 'analgésico antipirético',
+        'enxaqueca': 'analgésico',
+        'febre': 'antipirético analgésico PARACETAMOL DIPIRONA',
+        'febril': 'antipirético',
+        'temperatura': 'antipirético',
+        'corpo quente': 'antipirético',
+        'calafrio': 'antipirético analgésico',
+        'dor': 'analgésico anti-inflamatório',
+        'doendo': 'analgésico anti-inflamatório',
+        'doído': 'analgésico',
+        'dói': 'analgésico anti-inflamatório',
+        'latejando': 'analgésico',
+        'dor no corpo': 'analgésico anti-inflamatório',
+        'dor muscular': 'analgésico relaxante muscular anti-inflamatório',
+        'músculo': 'relaxante muscular anti-inflamatório',
+        'contratura': 'relaxante muscular',
+        'tensão muscular': 'relaxante muscular',
+        'costas': 'analgésico relaxante muscular anti-inflamatório',
+        'lombar': 'analgésico anti-inflamatório',
+        'coluna': 'analgésico anti-inflamatório',
+        
+        # === SISTEMA DIGESTIVO ===
+        'estômago': 'antiácido antissecretor',
+        'estomago': 'antiácido antissecretor',
+        'barriga': 'antiespasmódico antiácido',
+        'abdome': 'antiespasmódico',
+        'abdominal': 'antiespasmódico',
+        'azia': 'antiácido BICARBONATO DE SÓDIO CARBONATO DE CÁLCIO',
+        'queimação': 'antiácido BICARBONATO DE SÓDIO CARBONATO DE CÁLCIO',
+        'refluxo': 'antiácido BICARBONATO DE SÓDIO',
+        'gastrite': 'antiácido BICARBONATO DE SÓDIO',
+        'úlcera': 'antiácido antissecretor',
+        'indigestão': 'antiácido BICARBONATO DE SÓDIO',
+        'má digestão': 'antiácido BICARBONATO DE SÓDIO',
+        'empachado': 'antiácido BICARBONATO DE SÓDIO',
+        'náusea': 'antiemético',
+        'nausea': 'antiemético',
+        'enjoo': 'antiemético',
+        'enjoado': 'antiemético',
+        'vômito': 'antiemético',
+        'vomito': 'antiemético',
+        'vomitando': 'antiemético',
+        'diarreia': 'antiespasmódico BROMOPRIDA',
+        'diarréia': 'antiespasmódico BROMOPRIDA',
+        'intestino': 'antiespasmódico laxante SULFATO DE MAGNÉSIO',
+        'intestino preso': 'laxante SULFATO DE MAGNÉSIO SULFATO DE SÓDIO',
+        'constipação': 'laxante SULFATO DE MAGNÉSIO',
+        'prisão de ventre': 'laxante SULFATO DE MAGNÉSIO SULFATO DE SÓDIO',
+        'gases': 'antiespasmódico',
+        'cólica': 'antiespasmódico analgésico',
+        'colica': 'antiespasmódico analgésico',
+        
+        # === INFECÇÕES ===
+        'infecção': 'antibiótico antibacteriano',
+        'infeccao': 'antibiótico antibacteriano',
+        'infectado': 'antibiótico',
+        'bactéria': 'antibiótico antibacteriano',
+        'bacteria': 'antibiótico',
+        'pus': 'antibiótico',
+        'garganta': 'antibiótico anti-inflamatório analgésico',
+        'amigdalite': 'antibiótico anti-inflamatório',
+        'faringite': 'antibiótico anti-inflamatório',
+        'urinária': 'antibiótico',
+        'urina': 'antibiótico',
+        'ardência': 'antibiótico',
+        
+        # === PELE E ALERGIAS ===
+        'alergia': 'anti-histamínico antialérgico',
+        'alérgico': 'anti-histamínico',
+        'alergico': 'anti-histamínico',
+        'coceira': 'anti-histamínico antipruriginoso',
+        'coçando': 'anti-histamínico',
+        'urticária': 'anti-histamínico',
+        'vermelhidão': 'anti-histamínico anti-inflamatório',
+        'dermatite': 'corticosteroide anti-inflamatório',
+        'eczema': 'corticosteroide',
+        'pele': 'corticosteroide anti-inflamatório',
+        'fungo': 'antifúngico FLUCONAZOL NISTATINA GRISEOFULVINA',
+        'micose': 'antifúngico FLUCONAZOL NISTATINA CICLOPIROX',
+        'frieira': 'antifúngico NISTATINA CICLOPIROX FLUCONAZOL',
+        'herpes': 'antiviral ACICLOVIR',
+        'ferida': 'antisséptico cicatrizante',
+        
+        # === SISTEMA CARDIOVASCULAR ===
+        'pressão alta': 'anti-hipertensivo CAPTOPRIL ATENOLOL',
+        'pressão': 'anti-hipertensivo',
+        'hipertensão': 'anti-hipertensivo diurético',
+        'hipertensao': 'anti-hipertensivo',
+        'coração': 'anti-hipertensivo antiarrítmico antianginoso CLORIDRATO DE PROPRANOLOL CLORIDRATO DE DILTIAZEM',
+        'coracao': 'anti-hipertensivo antianginoso CLORIDRATO DE PROPRANOLOL',
+        'palpitação': 'antiarrítmico',
+        'taquicardia': 'antiarrítmico',
+        
+        # Dor no peito - variações
+        'dor no peito': 'antianginoso CLORIDRATO DE PROPRANOLOL CLORIDRATO DE DILTIAZEM',
+        'pontada no peito': 'antianginoso CLORIDRATO DE PROPRANOLOL CLORIDRATO DE DILTIAZEM',
+        'pontada': 'antianginoso analgésico CLORIDRATO DE PROPRANOLOL',
+        'lado esquerdo': 'antianginoso CLORIDRATO DE PROPRANOLOL CLORIDRATO DE DILTIAZEM',
+        'aperto no peito': 'antianginoso CLORIDRATO DE PROPRANOLOL CLORIDRATO DE DILTIAZEM',
+        'angina': 'antianginoso CLORIDRATO DE PROPRANOLOL CLORIDRATO DE DILTIAZEM',
+        'peito apertado': 'antianginoso CLORIDRATO DE PROPRANOLOL',
+        'peito doendo': 'antianginoso CLORIDRATO DE PROPRANOLOL CLORIDRATO DE DILTIAZEM',
+        'inchaço': 'diurético',
+        'inchaco': 'diurético',
+        'inchado': 'diurético',
+        'retenção': 'diurético',
+        
+        # === SISTEMA NERVOSO ===
+        'ansiedade': 'ansiolítico benzodiazepínico DIAZEPAM',
+        'ansioso': 'ansiolítico',
+        'nervoso': 'ansiolítico',
+        'nervosismo': 'ansiolítico',
+        'agitado': 'ansiolítico',
+        'inquieto': 'ansiolítico',
+        'insônia': 'sedativo hipnótico benzodiazepínico',
+        'insonia': 'sedativo hipnótico benzodiazepínico',
+        'dormir': 'sedativo hipnótico',
+        'sono': 'sedativo hipnótico',
+        'não consigo dormir': 'sedativo hipnótico',
+        'acordando': 'sedativo',
+        'depressão': 'antidepressivo',
+        'depressao': 'antidepressivo',
+        'triste': 'antidepressivo',
+        'desânimo': 'antidepressivo',
+        'convulsão': 'anticonvulsivante',
+        
+        # === DIABETES E METABOLISMO ===
+        'diabetes': 'hipoglicemiante antidiabético METFORMINA GLIBENCLAMIDA',
+        'diabético': 'hipoglicemiante',
+        'glicose': 'hipoglicemiante',
+        'açúcar': 'hipoglicemiante',
+        'colesterol': 'hipolipemiante antilipêmico',
+        'triglicérides': 'hipolipemiante',
+        
+        # === VÍRUS E GRIPE ===
+        'virus': 'antiviral',
+        'vírus': 'antiviral',
+        'gripe': 'antiviral antipirético analgésico',
+        'gripado': 'antipirético analgésico',
+        'resfriado': 'antipirético analgésico descongestionante',
+        'covid': 'antiviral antipirético',
+        
+        # === INFLAMAÇÃO ===
+        'inflamação': 'anti-inflamatório corticosteroide',
+        'inflamacao': 'anti-inflamatório',
+        'inflamado': 'anti-inflamatório',
+        'artrite': 'anti-inflamatório analgésico',
+        'reumatismo': 'anti-inflamatório analgésico',
+        'artrose': 'anti-inflamatório analgésico',
+        
+        # === OLHOS ===
+        'olho': 'colírio anti-inflamatório',
+        'olhos': 'colírio anti-inflamatório',
+        'conjuntivite': 'antibiótico anti-inflamatório',
+        'visão': 'antiglaucomatoso',
+        
+        # === OUVIDO ===
+        'ouvido': 'antibiótico analgésico',
+        'otite': 'antibiótico',
+        
+        # === VERMES ===
+        'verme': 'anti-helmíntico',
+        'parasita': 'antiparasitário',
+        'lombriga': 'anti-helmíntico',
+        
+        # === TERMOS INFORMAIS / GÍRIAS BRASILEIRAS ===
+        # Dor e mal-estar
+        'tô mal': 'analgésico antipirético',
+        'to mal': 'analgésico antipirético',
+        'mal estar': 'analgésico antipirético',
+        'passando mal': 'antiemético analgésico',
+        'me sentindo mal': 'analgésico',
+        'zoado': 'analgésico antipirético',
+        'acabado': 'analgésico antipirético',
+        'destruído': 'analgésico',
+        'morrendo': 'analgésico antipirético',
+        'ruim': 'analgésico',
+        'péssimo': 'analgésico antipirético',
+        'horrível': 'analgésico',
+        
+        # Cabeça
+        'cabecinha': 'analgésico PARACETAMOL',
+        'dor de cachola': 'analgésico PARACETAMOL',
+        'cabeça explodindo': 'analgésico PARACETAMOL DIPIRONA',
+        'martelando': 'analgésico',
+        
+        # Estômago/Barriga
+        'bucho': 'antiácido antiespasmódico',
+        'buchinho': 'antiácido',
+        'estomago embrulhado': 'antiemético antiácido',
+        'barriga revirada': 'antiemético',
+        'barriga doendo': 'antiespasmódico analgésico',
+        'tripas': 'antiespasmódico',
+        'pança': 'antiácido',
+        'caganeira': 'antidiarreico',
+        'soltura': 'antidiarreico',
+        'travado': 'laxante',
+        'entupido': 'laxante',
+        
+        # Febre/Gripe
+        'pegando fogo': 'antipirético',
+        'ardendo': 'antipirético',
+        'morrendo de febre': 'antipirético PARACETAMOL',
+        'queimando': 'antipirético',
+        'pegou gripe': 'antipirético analgésico',
+        'gripão': 'antipirético analgésico descongestionante',
+        'resfriado brabo': 'antipirético analgésico',
+        
+        # Tosse/Respiração
+        'catarro verde': 'mucolítico ACETILCISTEÍNA antibiótico',
+        'meleca': 'descongestionante',
+        'cuspindo catarro': 'mucolítico expectorante',
+        'escarro': 'mucolítico expectorante',
+        'garganta trancada': 'anti-inflamatório analgésico',
+        'garganta arranhando': 'anti-inflamatório',
+        'nariz escorrendo': 'anti-histamínico descongestionante',
+        'fungando': 'descongestionante',
+        
+        # Dor muscular/Corpo
+        'travei': 'relaxante muscular',
+        'travado': 'relaxante muscular',
+        'duro': 'relaxante muscular',
+        'moído': 'analgésico anti-inflamatório',
+        'corpo todo doendo': 'analgésico anti-inflamatório',
+        'não consigo me mexer': 'relaxante muscular analgésico',
+        'mau jeito': 'relaxante muscular analgésico',
+        
+        # Sono/Ansiedade
+        'pilhado': 'ansiolítico',
+        'elétrico': 'ansiolítico',
+        'ligado': 'ansiolítico sedativo',
+        'não paro quieto': 'ansiolítico',
+        'aperreado': 'ansiolítico',
+        'estressado': 'ansiolítico',
+        'tenso': 'ansiolítico relaxante muscular',
+        'não durmo': 'sedativo hipnótico',
+        'insone': 'sedativo hipnótico',
+        'virando a noite': 'sedativo hipnótico',
+        
+        # Pele
+        'ardendo a pele': 'anti-inflamatório corticosteroide',
+        'vermelho': 'anti-histamínico',
+        'pipocando': 'anti-histamínico',
+        'bolinhas': 'anti-histamínico antialérgico',
+        'manchas': 'anti-histamínico',
+        'ferida braba': 'antibiótico antisséptico',
+        'infeccionou': 'antibiótico',
+        
+        # Digestivo informal
+        'ânsia': 'antiemético',
+        'ancia': 'antiemético',
+        'queimando por dentro': 'antiácido',
+        'estômago pegando fogo': 'antiácido antissecretor',
+        'arrotando': 'antiácido',
+        'soluço': 'antiespasmódico',
+        
+        # Outros informais
+        'zureta': 'ansiolítico',
+        'pirado': 'ansiolítico antipsicótico',
+        'tremendo': 'ansiolítico',
+        'coisa ruim': 'analgésico',
+        'problema': 'analgésico',
+        'me ajuda': 'analgésico',
+        'preciso de remédio': 'analgésico',
+        
+        # === TERMOS FALTANTES (correção teste matador) ===
+        # Azia com variações - usando nomes específicos do banco
+        'terrível': 'antiácido BICARBONATO DE SÓDIO CARBONATO DE CÁLCIO',
+        'depois de comer': 'antiácido BICARBONATO DE SÓDIO CARBONATO DE CÁLCIO',
+        'comi': 'antiácido BICARBONATO DE SÓDIO',
+        'comida': 'antiácido BICARBONATO DE SÓDIO',
+        'alimentação': 'antiácido BICARBONATO DE SÓDIO',
+        
+        # Glicose/Diabetes variações - usando nomes específicos
+        'descontrolada': 'hipoglicemiante CLORIDRATO DE METFORMINA GLIBENCLAMIDA',
+        'descontrolado': 'hipoglicemiante CLORIDRATO DE METFORMINA GLIBENCLAMIDA',
+        'alto': 'hipoglicemiante CLORIDRATO DE METFORMINA anti-hipertensivo',
+        'alta': 'hipoglicemiante CLORIDRATO DE METFORMINA anti-hipertensivo',
+        'subiu': 'hipoglicemiante CLORIDRATO DE METFORMINA anti-hipertensivo',
+        'açúcar no sangue': 'hipoglicemiante CLORIDRATO DE METFORMINA',
+        
+        # Diarreia variações - NÃO HÁ ANTIDIARREICO no banco, usar antiespasmódico
+        'banheiro': 'antiespasmódico BROMOPRIDA',
+        'fezes': 'antiespasmódico laxante',
+        'líquido': 'antiespasmódico',
+        'solta': 'antiespasmódico BROMOPRIDA',
+        'solto': 'antiespasmódico',
+        
+        # Intestino/Constipação variações - usando SULFATO DE MAGNÉSIO
+        'preso': 'laxante SULFATO DE MAGNÉSIO',
+        'dias': 'analgésico',
+        'há dias': 'analgésico',
+        'evacuar': 'laxante SULFATO DE MAGNÉSIO',
+        'não consigo evacuar': 'laxante SULFATO DE MAGNÉSIO',
+        
+        # Asma/Respiração variações - usando nomes específicos
+        'chiado no peito': 'broncodilatador AMINOFILINA TEOFILINA SULFATO DE EFEDRINA',
+        'peito': 'broncodilatador AMINOFILINA analgésico',
+        'pulmões': 'broncodilatador AMINOFILINA TEOFILINA',
+        'respiratório': 'broncodilatador AMINOFILINA',
+        'cansaço': 'broncodilatador analgésico',
+        'cansado': 'analgésico',
+        'ofegante': 'broncodilatador AMINOFILINA TEOFILINA',
+        
+        # Frieira/Pé variações - usando nomes específicos de antifúngicos
+        'pé': 'antifúngico FLUCONAZOL NISTATINA GRISEOFULVINA',
+        'pés': 'antifúngico FLUCONAZOL NISTATINA',
+        'dedos': 'antifúngico FLUCONAZOL NISTATINA CICLOPIROX',
+        'entre os dedos': 'antifúngico FLUCONAZOL NISTATINA',
+        'unha': 'antifúngico GRISEOFULVINA FLUCONAZOL',
+        'unhas': 'antifúngico GRISEOFULVINA FLUCONAZOL',
+    }
 
-        try:
-            resposta = self.llm.invoke([HumanMessage(content=prompt)])
-            termos_llm = resposta.content.strip()
-            
-            # Limpar resposta - remover caracteres especiais
-            termos_llm = termos_llm.replace('\n', ' ').replace(',', ' ').replace('.', ' ')
-            termos_llm = ' '.join(termos_llm.split())  # Normalizar espaços
-            
-            print(f"🤖 LLM sugeriu: {termos_llm[:80]}...")
-            return termos_llm
-        except Exception as e:
-            print(f"⚠️ Erro na expansão inteligente: {e}")
-            return ""
     def expandir_query(self, sintomas: str) -> str:
         """Expande a query adicionando classes terapêuticas relacionadas."""
-        sintomas_para_classes = {
-            # === TOSSE E SISTEMA RESPIRATÓRIO ===
-            'tosse': 'mucolítico expectorante ACETILCISTEÍNA',
-            'catarro': 'mucolítico expectorante ACETILCISTEÍNA',
-            'secreção': 'mucolítico expectorante ACETILCISTEÍNA',
-            'tosse seca': 'antitussígeno',
-            'tosse produtiva': 'mucolítico expectorante ACETILCISTEÍNA',
-            'tossindo': 'mucolítico expectorante',
-            'pigarro': 'mucolítico expectorante',
-            'peito carregado': 'mucolítico expectorante',
-            'pulmão': 'broncodilatador',
-            'respirar': 'broncodilatador',
-            'respiração': 'broncodilatador',
-            'falta de ar': 'broncodilatador antiasmático AMINOFILINA SALBUTAMOL',
-            'dificuldade para respirar': 'broncodilatador antiasmático',
-            'chiado': 'broncodilatador antiasmático',
-            'asma': 'broncodilatador antiasmático AMINOFILINA SALBUTAMOL',
-            'bronquite': 'broncodilatador',
-            'nariz entupido': 'descongestionante',
-            'nariz': 'descongestionante anti-histamínico',
-            'coriza': 'anti-histamínico descongestionante',
-            'espirro': 'anti-histamínico',
-            'espirrando': 'anti-histamínico',
-            'sinusite': 'descongestionante antibiótico',
-            'rinite': 'anti-histamínico descongestionante',
-            
-            # === DOR E FEBRE ===
-            'dor de cabeça': 'analgésico antipirético PARACETAMOL DIPIRONA',
-            'cabeça': 'analgésico antipirético PARACETAMOL',
-            'cefaleia': 'analgésico antipirético',
-            'enxaqueca': 'analgésico',
-            'febre': 'antipirético analgésico PARACETAMOL DIPIRONA',
-            'febril': 'antipirético',
-            'temperatura': 'antipirético',
-            'corpo quente': 'antipirético',
-            'calafrio': 'antipirético analgésico',
-            'dor': 'analgésico anti-inflamatório',
-            'doendo': 'analgésico anti-inflamatório',
-            'doído': 'analgésico',
-            'dói': 'analgésico anti-inflamatório',
-            'latejando': 'analgésico',
-            'dor no corpo': 'analgésico anti-inflamatório',
-            'dor muscular': 'analgésico relaxante muscular anti-inflamatório',
-            'músculo': 'relaxante muscular anti-inflamatório',
-            'contratura': 'relaxante muscular',
-            'tensão muscular': 'relaxante muscular',
-            'costas': 'analgésico relaxante muscular anti-inflamatório',
-            'lombar': 'analgésico anti-inflamatório',
-            'coluna': 'analgésico anti-inflamatório',
-            
-            # === SISTEMA DIGESTIVO ===
-            'estômago': 'antiácido antissecretor',
-            'estomago': 'antiácido antissecretor',
-            'barriga': 'antiespasmódico antiácido',
-            'abdome': 'antiespasmódico',
-            'abdominal': 'antiespasmódico',
-            'azia': 'antiácido BICARBONATO DE SÓDIO CARBONATO DE CÁLCIO',
-            'queimação': 'antiácido BICARBONATO DE SÓDIO CARBONATO DE CÁLCIO',
-            'refluxo': 'antiácido BICARBONATO DE SÓDIO',
-            'gastrite': 'antiácido BICARBONATO DE SÓDIO',
-            'úlcera': 'antiácido antissecretor',
-            'indigestão': 'antiácido BICARBONATO DE SÓDIO',
-            'má digestão': 'antiácido BICARBONATO DE SÓDIO',
-            'empachado': 'antiácido BICARBONATO DE SÓDIO',
-            'náusea': 'antiemético',
-            'nausea': 'antiemético',
-            'enjoo': 'antiemético',
-            'enjoado': 'antiemético',
-            'vômito': 'antiemético',
-            'vomito': 'antiemético',
-            'vomitando': 'antiemético',
-            'diarreia': 'antiespasmódico BROMOPRIDA',
-            'diarréia': 'antiespasmódico BROMOPRIDA',
-            'intestino': 'antiespasmódico laxante SULFATO DE MAGNÉSIO',
-            'intestino preso': 'laxante SULFATO DE MAGNÉSIO SULFATO DE SÓDIO',
-            'constipação': 'laxante SULFATO DE MAGNÉSIO',
-            'prisão de ventre': 'laxante SULFATO DE MAGNÉSIO SULFATO DE SÓDIO',
-            'gases': 'antiespasmódico',
-            'cólica': 'antiespasmódico analgésico',
-            'colica': 'antiespasmódico analgésico',
-            
-            # === INFECÇÕES ===
-            'infecção': 'antibiótico antibacteriano',
-            'infeccao': 'antibiótico antibacteriano',
-            'infectado': 'antibiótico',
-            'bactéria': 'antibiótico antibacteriano',
-            'bacteria': 'antibiótico',
-            'pus': 'antibiótico',
-            'garganta': 'antibiótico anti-inflamatório analgésico',
-            'amigdalite': 'antibiótico anti-inflamatório',
-            'faringite': 'antibiótico anti-inflamatório',
-            'urinária': 'antibiótico',
-            'urina': 'antibiótico',
-            'ardência': 'antibiótico',
-            
-            # === PELE E ALERGIAS ===
-            'alergia': 'anti-histamínico antialérgico',
-            'alérgico': 'anti-histamínico',
-            'alergico': 'anti-histamínico',
-            'coceira': 'anti-histamínico antipruriginoso',
-            'coçando': 'anti-histamínico',
-            'urticária': 'anti-histamínico',
-            'vermelhidão': 'anti-histamínico anti-inflamatório',
-            'dermatite': 'corticosteroide anti-inflamatório',
-            'eczema': 'corticosteroide',
-            'pele': 'corticosteroide anti-inflamatório',
-            'fungo': 'antifúngico FLUCONAZOL NISTATINA GRISEOFULVINA',
-            'micose': 'antifúngico FLUCONAZOL NISTATINA CICLOPIROX',
-            'frieira': 'antifúngico NISTATINA CICLOPIROX FLUCONAZOL',
-            'herpes': 'antiviral ACICLOVIR',
-            'ferida': 'antisséptico cicatrizante',
-            
-            # === SISTEMA CARDIOVASCULAR ===
-            'pressão alta': 'anti-hipertensivo CAPTOPRIL ATENOLOL',
-            'pressão': 'anti-hipertensivo',
-            'hipertensão': 'anti-hipertensivo diurético',
-            'hipertensao': 'anti-hipertensivo',
-            'coração': 'anti-hipertensivo antiarrítmico antianginoso CLORIDRATO DE PROPRANOLOL CLORIDRATO DE DILTIAZEM',
-            'coracao': 'anti-hipertensivo antianginoso CLORIDRATO DE PROPRANOLOL',
-            'palpitação': 'antiarrítmico',
-            'taquicardia': 'antiarrítmico',
-            
-            # Dor no peito - variações
-            'dor no peito': 'antianginoso CLORIDRATO DE PROPRANOLOL CLORIDRATO DE DILTIAZEM',
-            'pontada no peito': 'antianginoso CLORIDRATO DE PROPRANOLOL CLORIDRATO DE DILTIAZEM',
-            'pontada': 'antianginoso analgésico CLORIDRATO DE PROPRANOLOL',
-            'lado esquerdo': 'antianginoso CLORIDRATO DE PROPRANOLOL CLORIDRATO DE DILTIAZEM',
-            'aperto no peito': 'antianginoso CLORIDRATO DE PROPRANOLOL CLORIDRATO DE DILTIAZEM',
-            'angina': 'antianginoso CLORIDRATO DE PROPRANOLOL CLORIDRATO DE DILTIAZEM',
-            'peito apertado': 'antianginoso CLORIDRATO DE PROPRANOLOL',
-            'peito doendo': 'antianginoso CLORIDRATO DE PROPRANOLOL CLORIDRATO DE DILTIAZEM',
-            'inchaço': 'diurético',
-            'inchaco': 'diurético',
-            'inchado': 'diurético',
-            'retenção': 'diurético',
-            
-            # === SISTEMA NERVOSO ===
-            'ansiedade': 'ansiolítico benzodiazepínico DIAZEPAM',
-            'ansioso': 'ansiolítico',
-            'nervoso': 'ansiolítico',
-            'nervosismo': 'ansiolítico',
-            'agitado': 'ansiolítico',
-            'inquieto': 'ansiolítico',
-            'insônia': 'sedativo hipnótico benzodiazepínico',
-            'insonia': 'sedativo hipnótico benzodiazepínico',
-            'dormir': 'sedativo hipnótico',
-            'sono': 'sedativo hipnótico',
-            'não consigo dormir': 'sedativo hipnótico',
-            'acordando': 'sedativo',
-            'depressão': 'antidepressivo',
-            'depressao': 'antidepressivo',
-            'triste': 'antidepressivo',
-            'desânimo': 'antidepressivo',
-            'convulsão': 'anticonvulsivante',
-            
-            # === DIABETES E METABOLISMO ===
-            'diabetes': 'hipoglicemiante antidiabético METFORMINA GLIBENCLAMIDA',
-            'diabético': 'hipoglicemiante',
-            'glicose': 'hipoglicemiante',
-            'açúcar': 'hipoglicemiante',
-            'colesterol': 'hipolipemiante antilipêmico',
-            'triglicérides': 'hipolipemiante',
-            
-            # === VÍRUS E GRIPE ===
-            'virus': 'antiviral',
-            'vírus': 'antiviral',
-            'gripe': 'antiviral antipirético analgésico',
-            'gripado': 'antipirético analgésico',
-            'resfriado': 'antipirético analgésico descongestionante',
-            'covid': 'antiviral antipirético',
-            
-            # === INFLAMAÇÃO ===
-            'inflamação': 'anti-inflamatório corticosteroide',
-            'inflamacao': 'anti-inflamatório',
-            'inflamado': 'anti-inflamatório',
-            'artrite': 'anti-inflamatório analgésico',
-            'reumatismo': 'anti-inflamatório analgésico',
-            'artrose': 'anti-inflamatório analgésico',
-            
-            # === OLHOS ===
-            'olho': 'colírio anti-inflamatório',
-            'olhos': 'colírio anti-inflamatório',
-            'conjuntivite': 'antibiótico anti-inflamatório',
-            'visão': 'antiglaucomatoso',
-            
-            # === OUVIDO ===
-            'ouvido': 'antibiótico analgésico',
-            'otite': 'antibiótico',
-            
-            # === VERMES ===
-            'verme': 'anti-helmíntico',
-            'parasita': 'antiparasitário',
-            'lombriga': 'anti-helmíntico',
-            
-            # === TERMOS INFORMAIS / GÍRIAS BRASILEIRAS ===
-            # Dor e mal-estar
-            'tô mal': 'analgésico antipirético',
-            'to mal': 'analgésico antipirético',
-            'mal estar': 'analgésico antipirético',
-            'passando mal': 'antiemético analgésico',
-            'me sentindo mal': 'analgésico',
-            'zoado': 'analgésico antipirético',
-            'acabado': 'analgésico antipirético',
-            'destruído': 'analgésico',
-            'morrendo': 'analgésico antipirético',
-            'ruim': 'analgésico',
-            'péssimo': 'analgésico antipirético',
-            'horrível': 'analgésico',
-            
-            # Cabeça
-            'cabecinha': 'analgésico PARACETAMOL',
-            'dor de cachola': 'analgésico PARACETAMOL',
-            'cabeça explodindo': 'analgésico PARACETAMOL DIPIRONA',
-            'martelando': 'analgésico',
-            
-            # Estômago/Barriga
-            'bucho': 'antiácido antiespasmódico',
-            'buchinho': 'antiácido',
-            'estomago embrulhado': 'antiemético antiácido',
-            'barriga revirada': 'antiemético',
-            'barriga doendo': 'antiespasmódico analgésico',
-            'tripas': 'antiespasmódico',
-            'pança': 'antiácido',
-            'caganeira': 'antidiarreico',
-            'soltura': 'antidiarreico',
-            'travado': 'laxante',
-            'entupido': 'laxante',
-            
-            # Febre/Gripe
-            'pegando fogo': 'antipirético',
-            'ardendo': 'antipirético',
-            'morrendo de febre': 'antipirético PARACETAMOL',
-            'queimando': 'antipirético',
-            'pegou gripe': 'antipirético analgésico',
-            'gripão': 'antipirético analgésico descongestionante',
-            'resfriado brabo': 'antipirético analgésico',
-            
-            # Tosse/Respiração
-            'catarro verde': 'mucolítico ACETILCISTEÍNA antibiótico',
-            'meleca': 'descongestionante',
-            'cuspindo catarro': 'mucolítico expectorante',
-            'escarro': 'mucolítico expectorante',
-            'garganta trancada': 'anti-inflamatório analgésico',
-            'garganta arranhando': 'anti-inflamatório',
-            'nariz escorrendo': 'anti-histamínico descongestionante',
-            'fungando': 'descongestionante',
-            
-            # Dor muscular/Corpo
-            'travei': 'relaxante muscular',
-            'travado': 'relaxante muscular',
-            'duro': 'relaxante muscular',
-            'moído': 'analgésico anti-inflamatório',
-            'corpo todo doendo': 'analgésico anti-inflamatório',
-            'não consigo me mexer': 'relaxante muscular analgésico',
-            'mau jeito': 'relaxante muscular analgésico',
-            
-            # Sono/Ansiedade
-            'pilhado': 'ansiolítico',
-            'elétrico': 'ansiolítico',
-            'ligado': 'ansiolítico sedativo',
-            'não paro quieto': 'ansiolítico',
-            'aperreado': 'ansiolítico',
-            'estressado': 'ansiolítico',
-            'tenso': 'ansiolítico relaxante muscular',
-            'não durmo': 'sedativo hipnótico',
-            'insone': 'sedativo hipnótico',
-            'virando a noite': 'sedativo hipnótico',
-            
-            # Pele
-            'ardendo a pele': 'anti-inflamatório corticosteroide',
-            'vermelho': 'anti-histamínico',
-            'pipocando': 'anti-histamínico',
-            'bolinhas': 'anti-histamínico antialérgico',
-            'manchas': 'anti-histamínico',
-            'ferida braba': 'antibiótico antisséptico',
-            'infeccionou': 'antibiótico',
-            
-            # Digestivo informal
-            'ânsia': 'antiemético',
-            'ancia': 'antiemético',
-            'queimando por dentro': 'antiácido',
-            'estômago pegando fogo': 'antiácido antissecretor',
-            'arrotando': 'antiácido',
-            'soluço': 'antiespasmódico',
-            
-            # Outros informais
-            'zureta': 'ansiolítico',
-            'pirado': 'ansiolítico antipsicótico',
-            'tremendo': 'ansiolítico',
-            'coisa ruim': 'analgésico',
-            'problema': 'analgésico',
-            'me ajuda': 'analgésico',
-            'preciso de remédio': 'analgésico',
-            
-            # === TERMOS FALTANTES (correção teste matador) ===
-            # Azia com variações - usando nomes específicos do banco
-            'terrível': 'antiácido BICARBONATO DE SÓDIO CARBONATO DE CÁLCIO',
-            'depois de comer': 'antiácido BICARBONATO DE SÓDIO CARBONATO DE CÁLCIO',
-            'comi': 'antiácido BICARBONATO DE SÓDIO',
-            'comida': 'antiácido BICARBONATO DE SÓDIO',
-            'alimentação': 'antiácido BICARBONATO DE SÓDIO',
-            
-            # Glicose/Diabetes variações - usando nomes específicos
-            'descontrolada': 'hipoglicemiante CLORIDRATO DE METFORMINA GLIBENCLAMIDA',
-            'descontrolado': 'hipoglicemiante CLORIDRATO DE METFORMINA GLIBENCLAMIDA',
-            'alto': 'hipoglicemiante CLORIDRATO DE METFORMINA anti-hipertensivo',
-            'alta': 'hipoglicemiante CLORIDRATO DE METFORMINA anti-hipertensivo',
-            'subiu': 'hipoglicemiante CLORIDRATO DE METFORMINA anti-hipertensivo',
-            'açúcar no sangue': 'hipoglicemiante CLORIDRATO DE METFORMINA',
-            
-            # Diarreia variações - NÃO HÁ ANTIDIARREICO no banco, usar antiespasmódico
-            'banheiro': 'antiespasmódico BROMOPRIDA',
-            'fezes': 'antiespasmódico laxante',
-            'líquido': 'antiespasmódico',
-            'solta': 'antiespasmódico BROMOPRIDA',
-            'solto': 'antiespasmódico',
-            
-            # Intestino/Constipação variações - usando SULFATO DE MAGNÉSIO
-            'preso': 'laxante SULFATO DE MAGNÉSIO',
-            'dias': 'analgésico',
-            'há dias': 'analgésico',
-            'evacuar': 'laxante SULFATO DE MAGNÉSIO',
-            'não consigo evacuar': 'laxante SULFATO DE MAGNÉSIO',
-            
-            # Asma/Respiração variações - usando nomes específicos
-            'chiado no peito': 'broncodilatador AMINOFILINA TEOFILINA SULFATO DE EFEDRINA',
-            'peito': 'broncodilatador AMINOFILINA analgésico',
-            'pulmões': 'broncodilatador AMINOFILINA TEOFILINA',
-            'respiratório': 'broncodilatador AMINOFILINA',
-            'cansaço': 'broncodilatador analgésico',
-            'cansado': 'analgésico',
-            'ofegante': 'broncodilatador AMINOFILINA TEOFILINA',
-            
-            # Frieira/Pé variações - usando nomes específicos de antifúngicos
-            'pé': 'antifúngico FLUCONAZOL NISTATINA GRISEOFULVINA',
-            'pés': 'antifúngico FLUCONAZOL NISTATINA',
-            'dedos': 'antifúngico FLUCONAZOL NISTATINA CICLOPIROX',
-            'entre os dedos': 'antifúngico FLUCONAZOL NISTATINA',
-            'unha': 'antifúngico GRISEOFULVINA FLUCONAZOL',
-            'unhas': 'antifúngico GRISEOFULVINA FLUCONAZOL',
-        }
-        
         query_expandida = sintomas
-        sintomas_lower = sintomas.lower()
         
-        for termo, expansao in sintomas_para_classes.items():
-            if termo in sintomas_lower:
-                query_expandida += f" {expansao}"
+        # Uma única passada pelo texto, sem acentos ("cabeca" casa com "cabeça")
+        for expansao in self.indice_sintomas.buscar(sintomas):
+            query_expandida += f" {expansao}"
         
         print(f"🔍 Query expandida: {query_expandida[:100]}...")
         return query_expandida
     
     def buscar_insumos_relevantes(self, sintomas: str, top_k: int = 5) -> List[Dict]:
-        """Busca semântica no vectorstore pelos insumos mais relevantes."""
+        """
+        Busca semântica no vectorstore pelos insumos mais relevantes.
+        A expansão via LLM roda em paralelo com a busca pelos sintomas + mapeamento manual;
+        quando chega dentro do prazo (LLM_EXPANSION_DEADLINE), uma segunda busca com os
+        termos do LLM é feita e as duas listas são combinadas.
+        """
+        return self._buscar_insumos(sintomas, top_k)[0]
+    
+    def _buscar_insumos(self, sintomas: str, top_k: int):
+        """Busca de buscar_insumos_relevantes. Retorna (insumos, query final da busca)."""
+        print(f"\n🔎 Buscando insumos para: {sintomas}")
+        inicio = time.perf_counter()
+        
+        # PASSO 1: Expansão INTELIGENTE via LLM (em segundo plano)
+        futuro_llm = None
+        if self.prazo_expansao_llm > 0:
+            futuro_llm = self.executor_expansao.submit(self.expandir_query_inteligente, sintomas)
+        
+        # PASSO 2: Expansão via mapeamento manual + busca imediata
+        termos_manual, resultados = self._busca_base(sintomas, top_k)
+        
+        # PASSO 3: Segunda busca com os termos do LLM, se chegarem a tempo
+        termos_llm = ""
+        if futuro_llm is not None:
+            restante = self.prazo_expansao_llm - (time.perf_counter() - inicio)
+            try:
+                termos_llm = futuro_llm.result(timeout=max(restante, 0))
+            except FuturesTimeoutError:
+                print(f"⏱️ Expansão via LLM passou do prazo ({self.prazo_expansao_llm:.1f}s): seguindo sem ela")
+        
+        if termos_llm:
+            resultados = self._combinar_resultados(
+                resultados, self._busca_expandida(sintomas, termos_llm, termos_manual, top_k)
+            )
+        
+        # PASSO 4: Fusão com o BM25 (nomes exatos de princípios ativos)
+        consulta = self._montar_query(sintomas, termos_manual, termos_llm)
+        resultados = self._fundir_bm25(sintomas, consulta, resultados, top_k)
         
-        # PASSO 1: Expansão INTELIGENTE via LLM
+        return self._selecionar_insumos(resultados, top_k), consulta
+    
+    async def abuscar_insumos_relevantes(self, sintomas: str, top_k: int = 5) -> List[Dict]:
+        """
+        Versão assíncrona de buscar_insumos_relevantes: a expansão usa ainvoke e as
+        buscas (embedding + vetores, CPU) rodam no executor padrão do loop.
+        """
+        await self._apreparar()
+        return (await self._abuscar_insumos(sintomas, top_k))[0]
+    
+    async def _abuscar_insumos(self, sintomas: str, top_k: int):
+        """Versão assíncrona de _buscar_insumos."""
+        loop = asyncio.get_running_loop()
         print(f"\n🔎 Buscando insumos para: {sintomas}")
-        termos_llm = self.expandir_query_inteligente(sintomas)
+        inicio = loop.time()
         
-        # PASSO 2: Expansão via mapeamento manual (fallback/complemento)
-        termos_manual = self.expandir_query(sintomas)
+        tarefa_llm = None
+        if self.prazo_expansao_llm > 0:
+            tarefa_llm = asyncio.ensure_future(self.aexpandir_query_inteligente(sintomas))
         
-        # Combinar ambas as expansões
-        query_final = f"{sintomas} {termos_llm} {termos_manual}"
-        print(f"🔍 Query combinada: {query_final[:120]}...")
+        termos_manual, resultados = await loop.run_in_executor(None, self._busca_base, sintomas, top_k)
+        
+        termos_llm = ""
+        if tarefa_llm is not None:
+            restante = self.prazo_expansao_llm - (loop.time() - inicio)
+            try:
+                termos_llm = await asyncio.wait_for(tarefa_llm, timeout=max(restante, 0))
+            except asyncio.TimeoutError:
+                print(f"⏱️ Expansão via LLM passou do prazo ({self.prazo_expansao_llm:.1f}s): seguindo sem ela")
+        
+        if termos_llm:
+            resultados = self._combinar_resultados(
+                resultados,
+                await loop.run_in_executor(
+                    None, self._busca_expandida, sintomas, termos_llm, termos_manual, top_k
+                )
+            )
         
-        busca_ampliada = top_k * 4  # Aumentar para ter mais candidatos
+        consulta = self._montar_query(sintomas, termos_manual, termos_llm)
+        resultados = await loop.run_in_executor(None, self._fundir_bm25, sintomas, consulta, resultados, top_k)
         
-        resultados = self.vectorstore.similarity_search_with_score(
+        return self._selecionar_insumos(resultados, top_k), consulta
+    
+    def _busca_base(self, sintomas: str, top_k: int):
+        """Busca pelos sintomas + expansão manual. Retorna (termos_manual, resultados)."""
+        termos_manual = self.expandir_query(sintomas)
+        resultados = self.busca_vetorial.similarity_search_with_score(
+            self._montar_query(sintomas, termos_manual),
+            k=top_k * 4,  # Aumentar para ter mais candidatos
+            filter=self.filtro_secoes
+        )
+        return termos_manual, resultados
+    
+    def _busca_expandida(self, sintomas: str, termos_llm: str, termos_manual: str, top_k: int) -> List:
+        """Busca com a query combinada (sintomas + termos do LLM + expansão manual)."""
+        query_final = self._montar_query(sintomas, termos_manual, termos_llm)
+        print(f"🔍 Query combinada: {query_final[:120]}...")
+        return self.busca_vetorial.similarity_search_with_score(
             query_final,
-            k=busca_ampliada
+            k=top_k * 4,
+            filter=self.filtro_secoes
         )
+    
+    @staticmethod
+    def _montar_query(sintomas: str, termos_manual: str, termos_llm: str = "") -> str:
+        if termos_llm:
+            return f"{sintomas} {termos_llm} {termos_manual}"
+        return f"{sintomas} {termos_manual}"
+    
+    def _fundir_bm25(self, sintomas: str, query: str, resultados: List, top_k: int) -> List:
+        """
+        Reciprocal rank fusion da busca vetorial com o BM25 das monografias.
+        O BM25 roda sobre o texto do usuário (as expansões trariam termos de classe que
+        diluem o nome digitado); os chunks das monografias achadas vêm de uma busca
+        vetorial restrita a elas com a query expandida. Cada monografia soma
+        1/(RRF_K + posição) em cada lista em que aparece. Nome que aparece inteiro no
+        texto do usuário entra em uma terceira lista, com peso igual à fração das
+        palavras do texto que ele cobre ("glicose" em "minha glicose está alta" só
+        soma um pouco); quando cobre mais que COBERTURA_NOME_EXATO (busca pelo nome do
+        fármaco) a monografia vem antes de todas as outras, o nome mais longo primeiro:
+        "CAPTOPRIL COMPRIMIDOS" antes de "CAPTOPRIL".
+        """
+        if self.indice_bm25 is None:
+            return resultados
+        encontrados = self.indice_bm25.buscar(sintomas, k=top_k, minimo_relativo=0.1)
+        if not encontrados:
+            return resultados
+        
+        # Nome inteiro no texto: mesmas palavras na mesma ordem (sem acento, sem stopwords)
+        palavras_texto = tokenizar(sintomas)
+        texto = f" {' '.join(palavras_texto)} "
         
+        def cobertura(nome: str) -> float:
+            """Fração das palavras do texto cobertas pelo nome, se ele aparece inteiro; senão 0."""
+            palavras = tokenizar(nome)
+            if not palavras or f" {' '.join(palavras)} " not in texto:
+                return 0.0
+            return len(palavras) / len(palavras_texto)
+        
+        codigos = list(dict.fromkeys(codigo for codigo, _, _ in encontrados))
+        lexicais = self._busca_restrita(query, codigos, len(codigos) * 4)
+        # Nome digitado sem nenhum chunk entre os da busca restrita: busca só nele
+        faltando = [codigo for codigo, nome, _ in encontrados if cobertura(nome)
+                    and all(doc.metadata.get("codigo") != codigo for doc, _ in lexicais)]
+        if faltando:
+            lexicais += self._busca_restrita(query, faltando, len(faltando) * 2)
+        
+        # Melhor chunk de cada monografia (a seleção final também fica com um por nome)
+        melhor_chunk = {}
+        for doc, score in list(resultados) + lexicais:
+            nome = doc.metadata.get("nome", "").lower()
+            if nome not in melhor_chunk or score < melhor_chunk[nome][1]:
+                melhor_chunk[nome] = (doc, score)
+        
+        coberturas = {nome: cobertura(nome) for nome in melhor_chunk}
+        ranking_vetorial = dict.fromkeys(doc.metadata.get("nome", "").lower() for doc, _ in resultados)
+        ranking_bm25 = dict.fromkeys(nome.lower() for _, nome, _ in encontrados)
+        ranking_exato = sorted((nome for nome in coberturas if coberturas[nome]), key=lambda n: -coberturas[n])
+        pontos = {}
+        for ranking, ponderado in ((ranking_vetorial, False), (ranking_bm25, False), (ranking_exato, True)):
+            for posicao, nome in enumerate(ranking, 1):
+                if nome in melhor_chunk:
+                    peso = coberturas[nome] if ponderado else 1.0
+                    pontos[nome] = pontos.get(nome, 0.0) + peso / (self.rrf_k + posicao)
+        
+        def ordem(nome: str) -> tuple:
+            precedencia = coberturas[nome] if coberturas[nome] > self.COBERTURA_NOME_EXATO else 0.0
+            return -precedencia, -pontos[nome]
+        
+        return [melhor_chunk[nome] for nome in sorted(pontos, key=ordem)]
+    
+    def _busca_restrita(self, query: str, codigos: List[str], k: int) -> List:
+        """Busca vetorial só nos chunks das monografias com esses códigos."""
+        condicao = {"codigo": {"$in": codigos}}
+        filtro = {"$and": [self.filtro_secoes, condicao]} if self.filtro_secoes else condicao
+        return self.busca_vetorial.similarity_search_with_score(query, k=k, filter=filtro)
+    
+    def _selecionar_insumos(self, resultados: List, top_k: int) -> List[Dict]:
+        """Filtra páginas irrelevantes e nomes repetidos, mantendo os top_k primeiros."""
         insumos_encontrados = []
         nomes_adicionados = set()
         
@@ -529,20 +1073,35 @@ Sua resposta:"""
         
         return insumos_encontrados
     
-    def criar_prompt_recomendacao(self, sintomas: str, contexto_insumos: List[Dict]) -> str:
-        """Cria o prompt rigoroso para o LLM."""
-        # Montar contexto com NOME QUÍMICO em destaque
-        contexto_formatado = "\n\n".join([
-            f"""===== INSUMO {i+1} =====
-🔬 NOME QUÍMICO OBRIGATÓRIO: {insumo['metadata'].get('nome', 'NÃO ESPECIFICADO').upper()}
-
-CONTEÚDO DA MONOGRAFIA:
-{insumo['conteudo']}
-
-(Relevância: {insumo['relevancia_score']})
-{'='*50}"""
-            for i, insumo in enumerate(contexto_insumos)
-        ])
+    @staticmethod
+    def _combinar_resultados(*listas: List) -> List:
+        """Une listas de (Document, distância): cada chunk fica com a menor distância."""
+        melhores = {}
+        for resultados in listas:
+            for doc, score in resultados:
+                chave = getattr(doc, "id", None) or doc.page_content
+                if chave not in melhores or score < melhores[chave][1]:
+                    melhores[chave] = (doc, score)
+        return sorted(melhores.values(), key=lambda item: item[1])
+    
+    def criar_prompt_recomendacao(self, sintomas: str, contexto_insumos: List[Dict],
+                                  consulta: Optional[str] = None) -> str:
+        """
+        Cria o prompt rigoroso para o LLM. `consulta` é a query já montada na busca
+        (sintomas + expansões); sem ela, é refeita com o mapeamento manual.
+        """
+        if consulta is None:
+            consulta = self._montar_query(sintomas, self.expandir_query(sintomas))
+        # Montar contexto com NOME QUÍMICO em destaque; linhas mais relevantes primeiro até o orçamento
+        contexto_formatado, tokens = self.montador_contexto.montar(consulta, contexto_insumos)
+        with self._lock_tokens:
+            self.tokens_contexto['prompts'] += 1
+            self.tokens_contexto['tokens_originais'] += tokens['tokens_originais']
+            self.tokens_contexto['tokens_usados'] += tokens['tokens_usados']
+        print(
+            f"✂️ Contexto: {tokens['tokens_usados']} tokens de {tokens['tokens_originais']} "
+            f"({tokens['tokens_economizados']} economizados)"
+        )
         
         prompt = f"""Você é um Assistente Farmacêutico Magistral especializado em formulações baseadas na Farmacopeia Brasileira.
 
@@ -670,50 +1229,495 @@ Responda APENAS com o JSON, sem texto adicional."""
         return True
     
     def gerar_recomendacao(self, sintomas: str) -> Dict:
-        """Pipeline completo: busca + geração de recomendação."""
+        """
+        Pipeline completo: busca + geração de recomendação.
+        Usa os caches de recomendações (texto igual ou sintomas parecidos); o resultado
+        informa a origem em "do_cache". A validação de segurança sempre roda de novo.
+        Pedidos simultâneos com a mesma chave do cache exato esperam a execução que já
+        está em andamento e recebem uma cópia do resultado dela.
+        """
+        top_k = int(os.getenv("TOP_K_RESULTS", 5))
+        resultado, consulta = self._consultar_caches(sintomas, top_k)
+        if resultado is None:
+            chave, _, versao, _ = consulta
+            
+            def gerar() -> Dict:
+                novo = self._gerar_recomendacao(sintomas, top_k)
+                self._guardar_nos_caches(consulta, sintomas, novo)
+                return novo
+            
+            resultado = self.chamadas_compartilhadas.executar(('recomendacao', chave, versao), gerar)
+            # Quem pegou carona pode ter escrito os sintomas de outro jeito
+            if "metadados" in resultado:
+                resultado["metadados"]["sintomas_originais"] = sintomas
+        
+        return self._aplicar_validacao_seguranca(resultado, sintomas)
+    
+    async def agerar_recomendacao(self, sintomas: str) -> Dict:
+        """
+        Versão assíncrona de gerar_recomendacao, com o mesmo resultado.
+        As chamadas ao LLM usam ainvoke; carga dos componentes, embeddings, buscas e
+        montagem do prompt rodam no executor do loop. Divide as execuções em andamento
+        com o caminho síncrono (mesma chave).
+        """
+        loop = asyncio.get_running_loop()
+        await self._apreparar()
+        top_k = int(os.getenv("TOP_K_RESULTS", 5))
+        resultado, consulta = await loop.run_in_executor(None, self._consultar_caches, sintomas, top_k)
+        if resultado is None:
+            chave, _, versao, _ = consulta
+            
+            async def gerar() -> Dict:
+                novo = await self._agerar_recomendacao(sintomas, top_k)
+                self._guardar_nos_caches(consulta, sintomas, novo)
+                return novo
+            
+            resultado = await self.chamadas_compartilhadas.aexecutar(('recomendacao', chave, versao), gerar)
+            if "metadados" in resultado:
+                resultado["metadados"]["sintomas_originais"] = sintomas
+        
+        return self._aplicar_validacao_seguranca(resultado, sintomas)
+    
+    # Campos simples do JSON da recomendação -> tipo do evento no streaming
+    EVENTOS_STREAMING = {
+        ('formula', 'nome_sugerido'): 'nome_formula',
+        ('formula', 'forma_farmaceutica'): 'forma_farmaceutica',
+        ('formula', 'quantidade_total'): 'quantidade_total',
+        ('posologia',): 'posologia',
+        ('justificativa_tecnica',): 'justificativa_tecnica',
+    }
+    
+    def gerar_recomendacao_stream(self, sintomas: str) -> Iterator[Dict]:
+        """
+        Versão em streaming de gerar_recomendacao: lê o LLM com stream() e interpreta o
+        JSON aos pedaços, entregando eventos {"tipo", "tempo_s", ...} assim que cada parte
+        fica completa: insumos_consultados, nome_formula, insumo, forma_farmaceutica,
+        quantidade_total, posologia, justificativa_tecnica e alerta.
+        O último evento é sempre {"tipo": "resultado", "resultado": ...}, igual ao retorno
+        de gerar_recomendacao (nomes validados, caches e validação de segurança).
+        """
+        inicio = time.perf_counter()
+        
+        def evento(tipo: str, **dados) -> Dict:
+            return {"tipo": tipo, "tempo_s": round(time.perf_counter() - inicio, 3), **dados}
+        
+        top_k = int(os.getenv("TOP_K_RESULTS", 5))
+        resultado, consulta = self._consultar_caches(sintomas, top_k)
+        if resultado is None:
+            print(f"🔎 Buscando insumos para: {sintomas}")
+            insumos, consulta_busca = self._buscar_insumos(sintomas, top_k)
+            if not insumos:
+                resultado = self._resultado_sem_insumos(sintomas)
+            else:
+                yield evento("insumos_consultados", nomes=[i['metadata'].get('nome', 'N/A') for i in insumos])
+                messages = self._mensagens_recomendacao(sintomas, insumos, consulta_busca)
+                parser = ParserJSONIncremental()
+                try:
+                    for pedaco in self.llm.stream(messages):
+                        for caminho, valor in parser.alimentar(self._texto_pedaco(pedaco)):
+                            parcial = self._evento_streaming(caminho, valor)
+                            if parcial is not None:
+                                yield evento(parcial[0], **parcial[1])
+                    resultado = self._processar_resposta_recomendacao(parser.texto, sintomas, insumos)
+                except Exception as e:
+                    resultado = {
+                        "erro": "Erro ao gerar recomendação",
+                        "detalhes": str(e)
+                    }
+            self._guardar_nos_caches(consulta, sintomas, resultado)
+        
+        yield evento("resultado", resultado=self._aplicar_validacao_seguranca(resultado, sintomas))
+    
+    @staticmethod
+    def _texto_pedaco(pedaco) -> str:
+        """Texto de um AIMessageChunk (string ou lista de partes, conforme o provider)."""
+        conteudo = pedaco.content
+        if isinstance(conteudo, str):
+            return conteudo
+        return "".join(
+            parte if isinstance(parte, str) else parte.get("text", "")
+            for parte in conteudo
+        )
+    
+    def _evento_streaming(self, caminho: Tuple, valor) -> Optional[Tuple[str, Dict]]:
+        """Evento de um valor completo do JSON parcial, ou None se não interessa à interface."""
+        if caminho in self.EVENTOS_STREAMING and isinstance(valor, str):
+            return self.EVENTOS_STREAMING[caminho], {"valor": valor}
+        if len(caminho) == 3 and caminho[:2] == ('formula', 'insumos') and isinstance(valor, dict):
+            # Prévia: a correção de nomes inválidos só acontece no resultado final
+            return "insumo", {
+                "indice": caminho[2],
+                "insumo": valor,
+                "nome_valido": self.validar_nome_quimico(valor.get("nome", "")),
+            }
+        if len(caminho) == 2 and caminho[0] == 'alertas_seguranca' and isinstance(valor, str):
+            return "alerta", {"indice": caminho[1], "valor": valor}
+        return None
+    
+    def gerar_recomendacoes(self, lista_sintomas: List[str], concurrency: int = 4,
+                            tamanho_lote: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Gera recomendações para muitos sintomas (auditorias, pré-cálculo de respostas comuns).
+        Os sintomas são processados em lotes (BATCH_RECOMMENDATION_SIZE): embeddings em uma
+        chamada ao modelo, buscas em uma chamada ao índice e chamadas ao LLM pelo batch do
+        provider, com no máximo `concurrency` simultâneas. Os resultados saem na ordem da
+        entrada, à medida que ficam prontos; a falha de um item vira um dict com "erro"
+        e não interrompe os demais.
+        """
+        lista_sintomas = list(lista_sintomas)
+        tamanho_lote = tamanho_lote or int(os.getenv("BATCH_RECOMMENDATION_SIZE", 32))
+        for inicio in range(0, len(lista_sintomas), tamanho_lote):
+            yield from self._gerar_lote(lista_sintomas[inicio:inicio + tamanho_lote], concurrency)
+    
+    def _gerar_lote(self, lote: List[str], concurrency: int) -> Iterator[Dict]:
+        top_k = int(os.getenv("TOP_K_RESULTS", 5))
+        config = {"max_concurrency": max(1, concurrency)}
+        total = len(lote)
+        saida: List[Optional[Dict]] = [None] * total
+        consultas: List[Optional[tuple]] = [None] * total
+        mensagens: Dict[int, List] = {}
+        insumos: Dict[int, List[Dict]] = {}
+        # Single-flight por item: voos que este lote executa, voos de outros chamadores
+        # e itens repetidos no lote (seguem o primeiro com a mesma chave)
+        proprios: Dict[int, tuple] = {}
+        alheios: Dict[int, Any] = {}
+        copias: Dict[int, List[int]] = {}
+        
+        def repetir(i: int) -> None:
+            for j in copias.get(i, ()):
+                saida[j] = copy.deepcopy(saida[i])
+                if "metadados" in saida[j]:
+                    saida[j]["metadados"]["sintomas_originais"] = lote[j]
+        
+        def concluir(i: int, resultado: Dict) -> None:
+            saida[i] = resultado
+            self._guardar_nos_caches(consultas[i], lote[i], resultado)
+            chave_voo, voo = proprios.pop(i)
+            self.chamadas_compartilhadas.concluir(chave_voo, voo, resultado)
+            repetir(i)
+        
+        print(f"\n📦 Lote de {total} sintomas")
+        try:
+            try:
+                # 1. Um único lote no modelo: queries base (sintomas + mapeamento) e sintomas crus (cache semântico)
+                termos_manual = [self.expandir_query(s) for s in lote]
+                textos = [self._montar_query(s, t) for s, t in zip(lote, termos_manual)]
+                if self.cache_semantico.ativo:
+                    textos += lote
+                vetores = self.embeddings.embed_queries(textos)
+                vetores_base = vetores[:total]
+                vetores_sintomas = vetores[total:] or [None] * total
+                
+                # 2. Caches
+                versao = self.versao_base()
+                for i, sintomas in enumerate(lote):
+                    saida[i], consultas[i] = self._consultar_caches(sintomas, top_k, vetores_sintomas[i], versao)
+                
+                # 3. Mesma chave de gerar_recomendacao: o lote executa só os voos que abriu
+                representantes = {}
+                for i in range(total):
+                    if saida[i] is not None:
+                        continue
+                    chave_voo = ('recomendacao', consultas[i][0], versao)
+                    if chave_voo in representantes:
+                        copias[representantes[chave_voo]].append(i)
+                        continue
+                    representantes[chave_voo] = i
+                    copias[i] = []
+                    voo, dono = self.chamadas_compartilhadas.iniciar(chave_voo)
+                    if dono:
+                        proprios[i] = (chave_voo, voo)
+                    else:
+                        alheios[i] = voo
+                pendentes = list(proprios)
+                
+                if pendentes:
+                    # 4. Expansões via LLM (batch do provider) enquanto roda a busca base
+                    futuro_llm = None
+                    if self.prazo_expansao_llm > 0:
+                        futuro_llm = self.executor_expansao.submit(
+                            self._expandir_lote, [lote[i] for i in pendentes], config
+                        )
+                    buscas = dict(zip(pendentes, self._buscar_lote([vetores_base[i] for i in pendentes], top_k * 4)))
+                    queries = {i: textos[i] for i in pendentes}
+                    
+                    if futuro_llm is not None:
+                        expandidas = {}
+                        for i, termos_llm in zip(pendentes, futuro_llm.result()):
+                            if termos_llm:
+                                expandidas[i] = queries[i] = self._montar_query(lote[i], termos_manual[i], termos_llm)
+                        if expandidas:
+                            extras = self._buscar_lote(self.embeddings.embed_queries(list(expandidas.values())), top_k * 4)
+                            for i, extra in zip(expandidas, extras):
+                                buscas[i] = self._combinar_resultados(buscas[i], extra)
+                    
+                    for i in pendentes:
+                        insumos[i] = self._selecionar_insumos(self._fundir_bm25(lote[i], queries[i], buscas[i], top_k), top_k)
+                        if insumos[i]:
+                            mensagens[i] = self._mensagens_recomendacao(lote[i], insumos[i], queries[i])
+                        else:
+                            concluir(i, self._resultado_sem_insumos(lote[i]))
+            except Exception as e:
+                print(f"❌ Erro no lote: {e}")
+                for i in list(proprios):
+                    if i not in mensagens:
+                        concluir(i, {"erro": "Erro ao gerar recomendação", "detalhes": str(e)})
+                # Repetidos recebem a cópia do primeiro igual
+                repetidos = {j for lista in copias.values() for j in lista}
+                for i in range(total):
+                    if saida[i] is None and i not in mensagens and i not in alheios and i not in repetidos:
+                        saida[i] = {"erro": "Erro ao gerar recomendação", "detalhes": str(e)}
+            
+            # 5. Recomendações: cache em disco por item, batch do provider só com as que faltam;
+            # entrega na ordem da entrada
+            ordem = []
+            for i in mensagens:
+                resposta = self._obter_resposta_llm(mensagens[i])
+                if resposta is None:
+                    ordem.append(i)
+                else:
+                    concluir(i, self._processar_resposta_recomendacao(resposta.content, lote[i], insumos[i]))
+            proximo = 0
+            respostas = self.llm.batch_as_completed(
+                [mensagens[i] for i in ordem], config, return_exceptions=True
+            ) if ordem else []
+            for posicao, resposta in respostas:
+                i = ordem[posicao]
+                if isinstance(resposta, Exception):
+                    resultado = {"erro": "Erro ao gerar recomendação", "detalhes": str(resposta)}
+                else:
+                    resultado = self._processar_resposta_recomendacao(resposta.content, lote[i], insumos[i])
+                    if "erro" not in resultado:
+                        self._guardar_resposta_llm(mensagens[i], resposta)
+                concluir(i, resultado)
+                while proximo < total and saida[proximo] is not None:
+                    yield self._aplicar_validacao_seguranca(saida[proximo], lote[proximo])
+                    proximo += 1
+            
+            # 6. Itens em andamento em outro chamador: só depois de concluir os voos do lote
+            # (dois lotes esperando um pelo outro nunca terminariam)
+            for i, voo in alheios.items():
+                try:
+                    saida[i] = self.chamadas_compartilhadas.aguardar(voo)
+                except Exception as e:
+                    saida[i] = {"erro": "Erro ao gerar recomendação", "detalhes": str(e)}
+                if "metadados" in saida[i]:
+                    saida[i]["metadados"]["sintomas_originais"] = lote[i]
+                repetir(i)
+            
+            while proximo < total:
+                yield self._aplicar_validacao_seguranca(saida[proximo], lote[proximo])
+                proximo += 1
+        finally:
+            # Lote interrompido (erro ou gerador abandonado): quem espera por ele não fica preso
+            for i, (chave_voo, voo) in list(proprios.items()):
+                self.chamadas_compartilhadas.concluir(
+                    chave_voo, voo, {"erro": "Erro ao gerar recomendação", "detalhes": "lote interrompido"}
+                )
+    
+    def _expandir_lote(self, lista_sintomas: List[str], config: Dict) -> List[str]:
+        """Termos do LLM para cada sintoma: cache em disco por item, batch do provider com o resto."""
+        mensagens = [[HumanMessage(content=self._prompt_expansao(s))] for s in lista_sintomas]
+        termos = [""] * len(mensagens)
+        faltando = []
+        for i, messages in enumerate(mensagens):
+            resposta = self._obter_resposta_llm(messages)
+            if resposta is None:
+                faltando.append(i)
+            else:
+                termos[i] = self._limpar_termos_llm(resposta.content)
+        if faltando:
+            respostas = self.llm.batch([mensagens[i] for i in faltando], config, return_exceptions=True)
+            for i, resposta in zip(faltando, respostas):
+                if isinstance(resposta, Exception):
+                    print(f"⚠️ Erro na expansão inteligente: {resposta}")
+                    continue
+                termos[i] = self._limpar_termos_llm(resposta.content)
+                if termos[i]:
+                    self._guardar_resposta_llm(mensagens[i], resposta)
+        return termos
+    
+    def _buscar_lote(self, vetores: List[List[float]], k: int) -> List[List]:
+        """Busca de várias consultas já vetorizadas em uma chamada ao índice: [(Document, distância)] por consulta."""
+        if not vetores:
+            return []
+        if isinstance(self.busca_vetorial, IndiceQuantizado):
+            return self.busca_vetorial.similarity_search_by_vectors_with_score(vetores, k, self.filtro_secoes)
+        
+        r = self.vectorstore._collection.query(
+            query_embeddings=vetores,
+            n_results=k,
+            where=self.filtro_secoes,
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            [
+                (Document(page_content=doc, metadata=meta or {}, id=id_), distancia)
+                for id_, doc, meta, distancia in zip(ids, docs, metas, distancias)
+            ]
+            for ids, docs, metas, distancias in zip(r["ids"], r["documents"], r["metadatas"], r["distances"])
+        ]
+    
+    def _consultar_caches(self, sintomas: str, top_k: int, vetor=None, versao=None):
+        """
+        Procura a recomendação no cache exato e depois no semântico.
+        Retorna (resultado ou None, consulta), onde consulta guarda o que é preciso
+        para gravar o resultado novo nos caches. O vetor dos sintomas e a versão do
+        banco podem vir prontos (lotes).
+        """
+        chave = CacheRecomendacoes.chave(sintomas, self.provider, self.modelo, top_k)
+        contexto = chave[1:]
+        if versao is None:
+            versao = self.versao_base()
+        resultado = None
+        
+        em_cache = self.cache_recomendacoes.obter(chave, versao)
+        if em_cache is not None:
+            resultado, idade = em_cache
+            resultado["tipo_cache"] = "exato"
+        elif self.cache_semantico.ativo:
+            if vetor is None:
+                vetor = self.embeddings.embed_query(sintomas)
+            parecido = self.cache_semantico.buscar(vetor, contexto, versao)
+            if parecido is not None:
+                resultado, idade, similaridade, sintomas_cache = parecido
+                resultado["tipo_cache"] = "semantico"
+                resultado["similaridade_cache"] = round(similaridade, 3)
+                resultado["sintomas_cache"] = sintomas_cache
+                if "metadados" in resultado:
+                    resultado["metadados"]["sintomas_originais"] = sintomas
+        
+        if resultado is not None:
+            print(f"⚡ Recomendação do cache {resultado['tipo_cache']} ({idade:.0f}s) para: {sintomas}")
+            resultado["do_cache"] = True
+            resultado["idade_cache_s"] = round(idade)
+        
+        return resultado, (chave, contexto, versao, vetor)
+    
+    def _guardar_nos_caches(self, consulta: Optional[tuple], sintomas: str, resultado: Dict) -> None:
+        resultado["do_cache"] = False
+        if consulta is None:
+            return
+        chave, contexto, versao, vetor = consulta
+        self.cache_recomendacoes.guardar(chave, resultado, versao)
+        if vetor is not None and "erro" not in resultado:
+            self.cache_semantico.guardar(vetor, contexto, sintomas, resultado, versao)
+    
+    def _aplicar_validacao_seguranca(self, resultado: Dict, sintomas: str) -> Dict:
+        """Valida a fórmula para os sintomas atuais (também em respostas vindas do cache)."""
+        # === VALIDAÇÃO DE SEGURANÇA (Medicamentos Controlados) ===
+        if "formula" in resultado:
+            validacao = self.validar_seguranca(resultado["formula"], sintomas)
+
+            if validacao["requer_atencao_especial"]:
+                resultado["alertas_criticos"] = validacao["alertas_criticos"]
+                resultado["medicamentos_controlados"] = validacao["medicamentos_controlados"]
+                print("🚨 ATENÇÃO: Medicamento controlado detectado!")
+                for med in validacao["medicamentos_controlados"]:
+                    print(f"   - {med['nome']} (Tarja {med['tarja']})")
+
+            # Adicionar alertas de validação aos alertas de segurança existentes
+            if validacao["alertas_validacao"]:
+                alertas_existentes = resultado.get("alertas_seguranca", [])
+                resultado["alertas_seguranca"] = alertas_existentes + validacao["alertas_validacao"]
+        
+        return resultado
+    
+    def _gerar_recomendacao(self, sintomas: str, top_k: int) -> Dict:
+        """Busca + LLM + validação dos nomes, sem cache e sem a validação de segurança."""
         print(f"🔎 Buscando insumos para: {sintomas}")
         
         # 1. Buscar insumos relevantes
-        top_k = int(os.getenv("TOP_K_RESULTS", 5))
-        insumos = self.buscar_insumos_relevantes(sintomas, top_k=top_k)
+        insumos, consulta = self._buscar_insumos(sintomas, top_k)
         
         if not insumos:
+            return self._resultado_sem_insumos(sintomas)
+        
+        # 2. Criar prompt (com a query já expandida na busca)
+        messages = self._mensagens_recomendacao(sintomas, insumos, consulta)
+        
+        # 3. Chamar LLM
+        try:
+            response = self._invocar_llm(messages)
+        except Exception as e:
+            return {
+                "erro": "Erro ao gerar recomendação",
+                "detalhes": str(e)
+            }
+        
+        resultado = self._processar_resposta_recomendacao(response.content, sintomas, insumos)
+        # Resposta que não virou recomendação válida não vai para o cache em disco
+        if "erro" not in resultado:
+            self._guardar_resposta_llm(messages, response)
+        return resultado
+    
+    async def _agerar_recomendacao(self, sintomas: str, top_k: int) -> Dict:
+        """Versão assíncrona de _gerar_recomendacao."""
+        print(f"🔎 Buscando insumos para: {sintomas}")
+        
+        loop = asyncio.get_running_loop()
+        insumos, consulta = await self._abuscar_insumos(sintomas, top_k)
+        
+        if not insumos:
+            return self._resultado_sem_insumos(sintomas)
+        
+        # Montagem do contexto (tokenização e ranking das linhas) é CPU: fora do loop
+        messages = await loop.run_in_executor(None, self._mensagens_recomendacao, sintomas, insumos, consulta)
+        
+        try:
+            response = await self._ainvocar_llm(messages)
+        except Exception as e:
             return {
-                "erro": "Não foi possível encontrar medicamentos adequados",
-                "tipo_erro": "LIMITACAO_FARMACOPEIA",
-                "explicacao": """A Farmacopeia Brasileira 6ª Edição é um documento oficial que contém 
+                "erro": "Erro ao gerar recomendação",
+                "detalhes": str(e)
+            }
+        
+        resultado = await loop.run_in_executor(
+            None, self._processar_resposta_recomendacao, response.content, sintomas, insumos
+        )
+        if "erro" not in resultado:
+            await loop.run_in_executor(None, self._guardar_resposta_llm, messages, response)
+        return resultado
+    
+    def _resultado_sem_insumos(self, sintomas: str) -> Dict:
+        """Resposta quando a busca não encontra nenhum insumo aproveitável."""
+        return {
+            "erro": "Não foi possível encontrar medicamentos adequados",
+            "tipo_erro": "LIMITACAO_FARMACOPEIA",
+            "explicacao": """A Farmacopeia Brasileira 6ª Edição é um documento oficial que contém 
 monografias de medicamentos específicos. Nem todos os medicamentos ou classes terapêuticas 
 estão disponíveis neste documento.
 
 Para os sintomas informados, não foram encontrados medicamentos adequados na base de dados 
 extraída da Farmacopeia Brasileira.""",
-                "sugestoes": [
-                    "Tente descrever os sintomas de forma diferente",
-                    "Consulte um profissional de saúde para orientação adequada",
-                    "Verifique se existe outro medicamento similar disponível"
-                ],
-                "sintomas_informados": sintomas
-            }
-        
+            "sugestoes": [
+                "Tente descrever os sintomas de forma diferente",
+                "Consulte um profissional de saúde para orientação adequada",
+                "Verifique se existe outro medicamento similar disponível"
+            ],
+            "sintomas_informados": sintomas
+        }
+    
+    def _mensagens_recomendacao(self, sintomas: str, insumos: List[Dict], consulta: Optional[str] = None) -> List:
+        """Mensagens da chamada de recomendação (mesmas no caminho síncrono e no assíncrono)."""
         print(f"✅ {len(insumos)} insumos encontrados")
         print("\n📋 Nomes disponíveis para o LLM:")
         for i, ins in enumerate(insumos, 1):
             print(f"  {i}. {ins['metadata'].get('nome', 'N/A')}")
         
-        # 2. Criar prompt
-        prompt = self.criar_prompt_recomendacao(sintomas, insumos)
-        
-        # 3. Chamar LLM
+        prompt = self.criar_prompt_recomendacao(sintomas, insumos, consulta)
         print(f"\n🤖 Gerando recomendação com {self.provider.upper()}...")
         
+        messages = [
+            SystemMessage(content="Você é um assistente farmacêutico preciso. SEMPRE use nomes químicos EXATOS, NUNCA classes terapêuticas genéricas."),
+            HumanMessage(content=prompt)
+        ]
+        return messages
+    
+    def _processar_resposta_recomendacao(self, conteudo: str, sintomas: str, insumos: List[Dict]) -> Dict:
+        """Interpreta o JSON do LLM e valida os nomes químicos contra os insumos consultados."""
         try:
-            messages = [
-                SystemMessage(content="Você é um assistente farmacêutico preciso. SEMPRE use nomes químicos EXATOS, NUNCA classes terapêuticas genéricas."),
-                HumanMessage(content=prompt)
-            ]
-            
-            response = self.llm.invoke(messages)
-            resposta_texto = response.content
+            resposta_texto = conteudo
             
             # Limpar markdown se presente
             if "```json" in resposta_texto:
@@ -788,22 +1792,6 @@ o medicamento adequado não está catalogado neste documento oficial."""
                 "sintomas_originais": sintomas
             }
             
-            # === VALIDAÇÃO DE SEGURANÇA (Medicamentos Controlados) ===
-            if "formula" in resultado:
-                validacao = self.validar_seguranca(resultado["formula"], sintomas)
-                
-                if validacao["requer_atencao_especial"]:
-                    resultado["alertas_criticos"] = validacao["alertas_criticos"]
-                    resultado["medicamentos_controlados"] = validacao["medicamentos_controlados"]
-                    print("🚨 ATENÇÃO: Medicamento controlado detectado!")
-                    for med in validacao["medicamentos_controlados"]:
-                        print(f"   - {med['nome']} (Tarja {med['tarja']})")
-                
-                # Adicionar alertas de validação aos alertas de segurança existentes
-                if validacao["alertas_validacao"]:
-                    alertas_existentes = resultado.get("alertas_seguranca", [])
-                    resultado["alertas_seguranca"] = alertas_existentes + validacao["alertas_validacao"]
-            
             print("✅ Recomendação gerada com sucesso!")
             return resultado
             
@@ -811,7 +1799,7 @@ o medicamento adequado não está catalogado neste documento oficial."""
             return {
                 "erro": "Falha ao parsear resposta do modelo",
                 "detalhes": str(e),
-                "resposta_bruta": response.content if 'response' in locals() else None
+                "resposta_bruta": conteudo
             }
         
         except Exception as e:
@@ -0,0 +1,27 @@
+"""
+Hashes SHA-256 de arquivos, textos e objetos.
+Usados pela ingestao (manifesto, cache de paginas e de embeddings) e pelos caches
+do servidor, sem que um dependa do outro.
+"""
+
+import json
+import hashlib
+
+
+def hash_arquivo(caminho: str) -> str:
+    """Calcula o SHA-256 de um arquivo em blocos."""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def hash_texto(texto: str) -> str:
+    """Calcula o SHA-256 de um texto."""
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def hash_objeto(obj) -> str:
+    """Calcula o SHA-256 da serializacao JSON canonica de um objeto."""
+    return hash_texto(json.dumps(obj, ensure_ascii=False, sort_keys=True))
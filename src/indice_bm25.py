@@ -0,0 +1,97 @@
+"""
+Índice BM25 em memória sobre as monografias (nome, classe terapêutica, indicações e
+categorias). Complementa a busca vetorial: nomes exatos de princípios ativos
+("ACICLOVIR", "CAPTOPRIL") casam por termo, mesmo quando o MiniLM os aproxima de
+monografias sem relação.
+"""
+
+import re
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+from indice_termos import normalizar_texto
+
+# Termos sem valor de busca
+STOPWORDS = frozenset(
+    "a as o os e de da das do dos em no na nos nas com sem por para pra um uma uns umas "
+    "ao aos que se mais muito muita meu minha tenho estou to ta".split()
+)
+
+# O nome pesa mais que classe e indicações (aproximação simples do BM25F)
+PESO_NOME = 3
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Palavras sem acento e em minúsculas, sem stopwords."""
+    return [
+        t for t in re.findall(r"\w+", normalizar_texto(texto))
+        if len(t) > 1 and t not in STOPWORDS
+    ]
+
+
+class IndiceBM25:
+    """Índice invertido BM25 (Okapi) com uma entrada por monografia."""
+
+    def __init__(self, documentos: Iterable[Tuple[str, str, List[str]]], k1: float = 1.2, b: float = 0.75):
+        """documentos: (codigo, nome, termos) na ordem do backup."""
+        self.k1 = k1
+        self.b = b
+        self.codigos: List[str] = []
+        self.nomes: List[str] = []
+        self._comprimentos: List[int] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+
+        for posicao, (codigo, nome, termos) in enumerate(documentos):
+            self.codigos.append(codigo)
+            self.nomes.append(nome)
+            self._comprimentos.append(len(termos))
+            for termo, frequencia in Counter(termos).items():
+                self._postings.setdefault(termo, []).append((posicao, frequencia))
+
+        total = len(self.codigos)
+        self._media_comprimento = (sum(self._comprimentos) / total) if total else 0.0
+        self._idf = {
+            termo: math.log(1 + (total - len(lista) + 0.5) / (len(lista) + 0.5))
+            for termo, lista in self._postings.items()
+        }
+
+    @classmethod
+    def de_monografias(cls, monografias: Iterable[Mapping]) -> "IndiceBM25":
+        """Indexa nome, classe terapêutica, indicações e categorias (sem o conteúdo)."""
+        def documentos():
+            for mono in monografias:
+                nome = mono.get('nome', '')
+                termos = tokenizar(nome) * PESO_NOME
+                termos += tokenizar(mono.get('classe_terapeutica', '') or '')
+                termos += tokenizar(' '.join(mono.get('indicacoes', []) or []))
+                termos += tokenizar(' '.join(mono.get('categorias', []) or []))
+                yield mono.get('codigo', ''), nome, termos
+        return cls(documentos())
+
+    def __len__(self) -> int:
+        return len(self.codigos)
+
+    def buscar(self, consulta: str, k: int = 10, minimo_relativo: float = 0.0) -> List[Tuple[str, str, float]]:
+        """
+        [(codigo, nome, score)] das k monografias com maior score BM25. Resultados abaixo
+        de minimo_relativo * melhor score são descartados (casamentos só por termos comuns).
+        """
+        if not self.codigos:
+            return []
+        scores: Dict[int, float] = {}
+        for termo in set(tokenizar(consulta)):
+            postings = self._postings.get(termo)
+            if not postings:
+                continue
+            idf = self._idf[termo]
+            for posicao, frequencia in postings:
+                normalizacao = 1 - self.b + self.b * self._comprimentos[posicao] / self._media_comprimento
+                scores[posicao] = scores.get(posicao, 0.0) + idf * (
+                    frequencia * (self.k1 + 1) / (frequencia + self.k1 * normalizacao)
+                )
+        melhores = sorted(scores.items(), key=lambda item: -item[1])[:k]
+        if melhores and minimo_relativo > 0:
+            corte = melhores[0][1] * minimo_relativo
+            melhores = [(p, s) for p, s in melhores if s >= corte]
+        return [(self.codigos[p], self.nomes[p], s) for p, s in melhores]
@@ -0,0 +1,242 @@
+"""
+Índice vetorial em NumPy, alternativa ao Chroma para instâncias com pouca memória.
+Guarda os vetores dos chunks em uma matriz .npy: float32 normalizado (busca exata com
+um único produto matriz-vetor) ou quantizados (int8 com escala por dimensão, ou float16),
+opcionalmente depois de uma projeção PCA ajustada no próprio corpus.
+Os vetores são abertos com mmap (somente leitura: vários workers compartilham as
+mesmas páginas); textos e metadados ficam em um SQLite e só são lidos para os resultados.
+"""
+
+import os
+import json
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+CAMINHO_PADRAO = "data/vectorstore_q"
+CAMINHO_NUMPY_PADRAO = "data/vectorstore_np"
+TIPOS = ('int8', 'float16', 'float32')
+
+# Linhas convertidas para float32 por vez durante a busca (limita a memória temporária)
+LINHAS_POR_BLOCO = 8192
+
+
+def _normalizar(vetores: np.ndarray) -> np.ndarray:
+    normas = np.linalg.norm(vetores, axis=-1, keepdims=True)
+    return vetores / np.maximum(normas, 1e-12)
+
+
+class IndiceQuantizado:
+    """Busca sobre a matriz de vetores (float32 ou quantizada), com a mesma interface de busca usada do Chroma."""
+
+    def __init__(self, diretorio: str, embeddings: Optional[Embeddings] = None):
+        self.diretorio = Path(diretorio)
+        self.embeddings = embeddings
+
+        with open(self.diretorio / "config.json", 'r', encoding='utf-8') as f:
+            self.config = json.load(f)
+        self.tipo = self.config['tipo']
+
+        self.vetores = np.load(self.diretorio / "vetores.npy", mmap_mode='r')
+        self.escala = np.load(self.diretorio / "escala.npy") if self.tipo == 'int8' else None
+        self.media = self.componentes = None
+        if self.config['dimensoes_pca']:
+            self.media = np.load(self.diretorio / "media.npy")
+            self.componentes = np.load(self.diretorio / "componentes.npy")
+
+        self._conn = sqlite3.connect(str(self.diretorio / "documentos.sqlite"), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            linhas = self._conn.execute("SELECT secao, metadados FROM documentos ORDER BY posicao").fetchall()
+        # Campos aceitos nos filtros (formato do Chroma)
+        self._campos = {
+            'secao': np.array([secao for secao, _ in linhas], dtype=object),
+            'codigo': np.array([json.loads(meta).get('codigo') for _, meta in linhas], dtype=object),
+        }
+        self._mascaras: Dict[Tuple[str, ...], np.ndarray] = {}
+
+    @classmethod
+    def construir(cls, diretorio: str, ids: Sequence[str], vetores, documentos: Sequence[str],
+                  metadados: Sequence[Dict], tipo: str = 'int8',
+                  dimensoes_pca: Optional[int] = None) -> Dict:
+        """
+        Gera o índice a partir dos vetores float32 do corpus e retorna a config gravada.
+        O diretório é montado ao lado e só substitui o anterior no final.
+        """
+        if tipo not in TIPOS:
+            raise ValueError(f"Tipo de quantização inválido: {tipo} (use {', '.join(TIPOS)})")
+
+        x = _normalizar(np.asarray(vetores, dtype=np.float32))
+        dimensoes_originais = x.shape[1] if x.ndim == 2 else 0
+
+        tmp = Path(str(diretorio) + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        # PCA ajustada no corpus (SVD dos vetores centralizados)
+        if dimensoes_pca and len(x) and dimensoes_pca < dimensoes_originais:
+            media = x.mean(axis=0)
+            _, _, vt = np.linalg.svd(x - media, full_matrices=False)
+            componentes = vt[:dimensoes_pca].astype(np.float32)
+            x = _normalizar((x - media) @ componentes.T)
+            np.save(tmp / "media.npy", media.astype(np.float32))
+            np.save(tmp / "componentes.npy", componentes)
+        else:
+            dimensoes_pca = None
+
+        if tipo == 'int8':
+            # Escala por dimensão: o maior valor absoluto de cada coluna vira 127
+            escala = (np.abs(x).max(axis=0) / 127.0) if len(x) else np.ones(x.shape[1:], np.float32)
+            escala = np.where(escala > 0, escala, 1.0).astype(np.float32)
+            comprimidos = np.clip(np.rint(x / escala), -127, 127).astype(np.int8)
+            np.save(tmp / "escala.npy", escala)
+        elif tipo == 'float16':
+            comprimidos = x.astype(np.float16)
+        else:
+            comprimidos = np.ascontiguousarray(x, dtype=np.float32)
+        np.save(tmp / "vetores.npy", comprimidos)
+
+        conn = sqlite3.connect(str(tmp / "documentos.sqlite"))
+        conn.execute(
+            "CREATE TABLE documentos (posicao INTEGER PRIMARY KEY, id TEXT NOT NULL,"
+            " secao TEXT, documento TEXT, metadados TEXT)"
+        )
+        conn.executemany(
+            "INSERT INTO documentos (posicao, id, secao, documento, metadados) VALUES (?, ?, ?, ?, ?)",
+            [
+                (i, id_, (meta or {}).get('secao'), doc, json.dumps(meta or {}, ensure_ascii=False))
+                for i, (id_, doc, meta) in enumerate(zip(ids, documentos, metadados))
+            ]
+        )
+        conn.commit()
+        conn.close()
+
+        config = {
+            'versao': 1,
+            'tipo': tipo,
+            'total': len(ids),
+            'dimensoes_originais': dimensoes_originais,
+            'dimensoes_pca': dimensoes_pca,
+            'bytes_vetores': int(comprimidos.nbytes),
+        }
+        with open(tmp / "config.json", 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=2)
+
+        shutil.rmtree(diretorio, ignore_errors=True)
+        os.replace(tmp, diretorio)
+        return config
+
+    @property
+    def possui_secoes(self) -> bool:
+        """Se os chunks têm a seção gravada (índices gerados depois da divisão por seções)."""
+        return any(s is not None for s in self._campos['secao'])
+
+    def _consulta(self, vetor: Sequence[float]) -> np.ndarray:
+        """Leva o vetor da consulta ao espaço do índice (PCA + escala do int8)."""
+        q = _normalizar(np.asarray(vetor, dtype=np.float32))
+        if self.componentes is not None:
+            q = _normalizar((q - self.media) @ self.componentes.T)
+        if self.escala is not None:
+            q = q * self.escala
+        return q.astype(np.float32)
+
+    def _mascara(self, filtro: Optional[Dict]) -> Optional[np.ndarray]:
+        """
+        Aceita filtros no formato do Chroma: {"secao": {"$in": [...]}}, o mesmo com
+        "codigo", ou um {"$and": [...]} dessas condições.
+        """
+        if not filtro:
+            return None
+        condicoes = filtro['$and'] if set(filtro) == {'$and'} else [filtro]
+        mascara = None
+        for condicao in condicoes:
+            if len(condicao) != 1:
+                raise ValueError(f"Filtro não suportado pelo índice quantizado: {filtro}")
+            campo, valor = next(iter(condicao.items()))
+            if campo not in self._campos or not isinstance(valor, dict) or set(valor) != {'$in'}:
+                raise ValueError(f"Filtro não suportado pelo índice quantizado: {filtro}")
+            if campo == 'secao':
+                # Poucas combinações de seções: máscara guardada
+                chave = tuple(sorted(valor['$in']))
+                if chave not in self._mascaras:
+                    self._mascaras[chave] = np.isin(self._campos['secao'], chave)
+                parcial = self._mascaras[chave]
+            else:
+                parcial = np.isin(self._campos[campo], list(valor['$in']))
+            mascara = parcial if mascara is None else (mascara & parcial)
+        return mascara
+
+    def buscar_por_vetor(self, vetor: Sequence[float], k: int,
+                         filtro: Optional[Dict] = None) -> List[Tuple[int, float]]:
+        """Retorna [(posicao, distancia_cosseno)] dos k vetores mais próximos."""
+        return self.buscar_por_vetores([vetor], k, filtro)[0]
+
+    def buscar_por_vetores(self, vetores: Sequence[Sequence[float]], k: int,
+                           filtro: Optional[Dict] = None) -> List[List[Tuple[int, float]]]:
+        """Várias consultas em uma passada pelos vetores (uma multiplicação de matriz por bloco)."""
+        total = len(self.vetores)
+        if not total or k <= 0 or not len(vetores):
+            return [[] for _ in vetores]
+        q = self._consulta(np.atleast_2d(np.asarray(vetores, dtype=np.float32)))
+
+        if self.vetores.dtype == np.float32:
+            # Sem conversão: um único produto direto sobre as páginas do mmap
+            similaridades = q @ np.asarray(self.vetores).T
+        else:
+            similaridades = np.empty((len(q), total), dtype=np.float32)
+            for ini in range(0, total, LINHAS_POR_BLOCO):
+                bloco = np.asarray(self.vetores[ini:ini + LINHAS_POR_BLOCO], dtype=np.float32)
+                similaridades[:, ini:ini + len(bloco)] = q @ bloco.T
+
+        mascara = self._mascara(filtro)
+        if mascara is not None:
+            similaridades[:, ~mascara] = -np.inf
+            k = min(k, int(mascara.sum()))
+        k = min(k, total)
+        if k <= 0:
+            return [[] for _ in vetores]
+
+        resultados = []
+        for linha in similaridades:
+            melhores = np.argpartition(-linha, k - 1)[:k]
+            melhores = melhores[np.argsort(-linha[melhores])]
+            resultados.append([(int(i), float(1.0 - linha[i])) for i in melhores])
+        return resultados
+
+    def documentos(self, posicoes: Sequence[int]) -> List[Tuple[str, str, Dict]]:
+        """(id, texto, metadados) das posições pedidas, na mesma ordem."""
+        if not posicoes:
+            return []
+        marcadores = ','.join('?' * len(posicoes))
+        with self._lock:
+            linhas = self._conn.execute(
+                f"SELECT posicao, id, documento, metadados FROM documentos WHERE posicao IN ({marcadores})",
+                list(posicoes)
+            ).fetchall()
+        por_posicao = {p: (id_, doc, json.loads(meta)) for p, id_, doc, meta in linhas}
+        return [por_posicao[p] for p in posicoes]
+
+    def similarity_search_with_score(self, query: str, k: int = 4,
+                                     filter: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        """Mesmo contrato do Chroma: (Document, distancia), menor distância primeiro."""
+        if self.embeddings is None:
+            raise ValueError("IndiceQuantizado sem embeddings: use buscar_por_vetor()")
+        return self.similarity_search_by_vectors_with_score([self.embeddings.embed_query(query)], k, filter)[0]
+
+    def similarity_search_by_vectors_with_score(self, vetores: Sequence[Sequence[float]], k: int = 4,
+                                                filter: Optional[Dict] = None) -> List[List[Tuple[Document, float]]]:
+        """Uma lista de (Document, distancia) por consulta já vetorizada."""
+        saida = []
+        for resultados in self.buscar_por_vetores(vetores, k, filter):
+            docs = self.documentos([p for p, _ in resultados])
+            saida.append([
+                (Document(page_content=texto, metadata=meta, id=id_), distancia)
+                for (id_, texto, meta), (_, distancia) in zip(docs, resultados)
+            ])
+        return saida
@@ -0,0 +1,118 @@
+"""
+Casamento de muitos termos em uma única passada pelo texto (autômato Aho-Corasick).
+Usado para os mapas de classes terapêuticas -> indicações (ingestão) e
+de sintomas -> classes (expansão de query), que crescem a cada versão.
+O custo por consulta depende do tamanho do texto, não do número de termos.
+Acentos e maiúsculas são ignorados ("dor de cabeca" casa com "cabeça") e os termos
+casam como substring ("dor" em "dores"), exceto os curtos que só ficam ambíguos sem
+o acento ("pé" vira "pe", que está em "peito" e "pele"): esses casam como palavra inteira.
+"""
+
+import re
+import unicodedata
+from typing import Dict, Generic, List, TypeVar
+
+V = TypeVar("V")
+
+# Termo acentuado que sem acento fica com até este tamanho só casa como palavra inteira
+TAMANHO_PALAVRA_INTEIRA = 3
+
+
+def normalizar_texto(texto: str) -> str:
+    """Minúsculas e sem acentos ("Cabeça" -> "cabeca")."""
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).lower()
+
+
+def normalizar_consulta(texto: str) -> str:
+    """Chave de cache para textos digitados: normalizar_texto() com espaços colapsados."""
+    return re.sub(r"\s+", " ", normalizar_texto(texto)).strip()
+
+
+class IndiceTermos(Generic[V]):
+    """
+    Compila um dicionário termo -> valor em um autômato Aho-Corasick.
+    A busca ignora acentos e maiúsculas e devolve os valores de todos os termos
+    contidos no texto (inclusive sobrepostos), na ordem do dicionário original.
+    """
+
+    def __init__(self, mapa: Dict[str, V]):
+        # Termos que ficam iguais sem acento ("estômago"/"estomago") viram um único grupo
+        self.termos: List[str] = []
+        self.valores: List[List[V]] = []
+        self.palavra_inteira: List[bool] = []
+        grupo_por_termo: Dict[str, int] = {}
+        for termo, valor in mapa.items():
+            normalizado = normalizar_texto(termo).strip()
+            if not normalizado:
+                continue
+            grupo = grupo_por_termo.setdefault(normalizado, len(self.termos))
+            if grupo == len(self.termos):
+                self.termos.append(normalizado)
+                self.valores.append([])
+                self.palavra_inteira.append(True)
+            # Basta uma grafia sem acento no mapa para o termo já casar como substring
+            sem_acento = normalizado == termo.lower().strip()
+            if sem_acento or len(normalizado) > TAMANHO_PALAVRA_INTEIRA:
+                self.palavra_inteira[grupo] = False
+            if valor not in self.valores[grupo]:
+                self.valores[grupo].append(valor)
+
+        self._construir()
+
+    def _construir(self) -> None:
+        # Trie: transicoes[estado] = {caractere: proximo_estado}
+        self._transicoes: List[Dict[str, int]] = [{}]
+        self._saidas: List[List[int]] = [[]]
+        for grupo, termo in enumerate(self.termos):
+            estado = 0
+            for c in termo:
+                proximo = self._transicoes[estado].get(c)
+                if proximo is None:
+                    proximo = len(self._transicoes)
+                    self._transicoes[estado][c] = proximo
+                    self._transicoes.append({})
+                    self._saidas.append([])
+                estado = proximo
+            self._saidas[estado].append(grupo)
+
+        # Links de falha em largura; cada estado herda as saidas do seu link
+        self._falha = [0] * len(self._transicoes)
+        fila = list(self._transicoes[0].values())
+        for estado in fila:
+            for c, proximo in self._transicoes[estado].items():
+                fila.append(proximo)
+                f = self._falha[estado]
+                while f and c not in self._transicoes[f]:
+                    f = self._falha[f]
+                destino = self._transicoes[f].get(c, 0)
+                self._falha[proximo] = destino if destino != proximo else 0
+                self._saidas[proximo] = self._saidas[proximo] + self._saidas[self._falha[proximo]]
+
+    def grupos(self, texto: str) -> List[int]:
+        """Índices (na ordem do dicionário) dos termos encontrados no texto."""
+        texto = normalizar_texto(texto)
+        transicoes, falha, saidas = self._transicoes, self._falha, self._saidas
+        encontrados = set()
+        estado = 0
+        for fim, c in enumerate(texto):
+            while estado and c not in transicoes[estado]:
+                estado = falha[estado]
+            estado = transicoes[estado].get(c, 0)
+            for grupo in saidas[estado]:
+                if self.palavra_inteira[grupo]:
+                    inicio = fim - len(self.termos[grupo]) + 1
+                    if (inicio > 0 and texto[inicio - 1].isalnum()) or \
+                            (fim + 1 < len(texto) and texto[fim + 1].isalnum()):
+                        continue
+                encontrados.add(grupo)
+        return sorted(encontrados)
+
+    def buscar(self, texto: str) -> List[V]:
+        """Valores dos termos encontrados no texto, sem repetição, na ordem do dicionário."""
+        resultado: List[V] = []
+        for grupo in self.grupos(texto):
+            for valor in self.valores[grupo]:
+                if valor not in resultado:
+                    resultado.append(valor)
+        return resultado
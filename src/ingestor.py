@@ -7,29 +7,167 @@ VERSÃO 2.0 - Extração correta de monografias do Volume 2
 import os
 import re
 import json
+import time
+import queue
+import hashlib
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
 from dotenv import load_dotenv
 
 import pdfplumber
+from pdfminer.pdftypes import resolve1
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 from tqdm import tqdm
 
+from base_monografias import CAMINHO_PADRAO as BASE_MONOGRAFIAS_PADRAO, gravar_monografias
+from cache_embeddings import CacheEmbeddings
+from cache_paginas import CachePaginas, ler_paginas
+from codificador import BACKENDS as BACKENDS_CODIFICADOR, criar_codificador, identificador_modelo
+from hashes import hash_arquivo, hash_objeto
+from indice_quantizado import (
+    CAMINHO_NUMPY_PADRAO as INDICE_NUMPY_PADRAO, CAMINHO_PADRAO as INDICE_QUANTIZADO_PADRAO,
+    IndiceQuantizado
+)
+from indice_termos import IndiceTermos
+from manifesto import ManifestoIngestao
+from perfil_ingestao import PerfilIngestao
+
 load_dotenv()
 
+# Tipos aceitos por --quantizar (float32 sem compressao e o --indice-numpy)
+TIPOS_QUANTIZACAO = ('int8', 'float16')
+
+# Tamanho maximo de cada intervalo de paginas enviado a um processo do pool
+PAGINAS_POR_INTERVALO = 25
+
+# Marcador de fim de fluxo entre estagios do pipeline
+_FIM = object()
+
+# Etapas medidas no relatorio de desempenho (ver PerfilIngestao)
+ETAPAS_INGESTAO = [
+    'extracao_paginas', 'parsing_monografias', 'enriquecimento', 'backup_json',
+    'base_monografias', 'chunking', 'embeddings', 'escrita_chroma', 'indice_numpy', 'quantizacao',
+]
+
+# Cabecalhos de secao das monografias -> tag gravada nos metadados dos chunks.
+# O texto antes do primeiro cabecalho (nome, formula, teor) fica na secao 'resumo'.
+SECOES_MONOGRAFIA = {
+    'DESCRIÇÃO': 'descricao',
+    'DESCRIÇÃO MICROSCÓPICA': 'descricao',
+    'CARACTERÍSTICAS': 'caracteristicas',
+    'IDENTIFICAÇÃO': 'identificacao',
+    'ENSAIOS DE PUREZA': 'ensaios_pureza',
+    'ENSAIO DE PUREZA': 'ensaios_pureza',
+    'TESTES DE SEGURANÇA BIOLÓGICA': 'seguranca_biologica',
+    'TESTE DE SEGURANÇA BIOLÓGICA': 'seguranca_biologica',
+    'DOSEAMENTO': 'doseamento',
+    'EMBALAGEM E ARMAZENAMENTO': 'armazenamento',
+    'ARMAZENAMENTO': 'armazenamento',
+    'ROTULAGEM': 'rotulagem',
+    'CATEGORIA': 'categoria',
+    'CLASSE TERAPÊUTICA': 'classe_terapeutica',
+}
+
+
+def _extrair_intervalo_paginas(args) -> List[Optional[str]]:
+    """Extrai o texto de um intervalo de paginas em um processo separado."""
+    pdf_path, indices = args
+    with pdfplumber.open(pdf_path) as pdf:
+        return [pdf.pages[i].extract_text() for i in indices]
+
+
+def _hash_pagina(page) -> str:
+    """Hash do conteudo bruto da pagina (streams de conteudo + dimensoes), sem extrair texto."""
+    h = hashlib.sha256()
+    for stream in page.page_obj.contents:
+        h.update(resolve1(stream).get_data())
+    h.update(repr(page.page_obj.mediabox).encode())
+    return h.hexdigest()
+
+
+class EstagioAssincrono:
+    """
+    Executa um iteravel em uma thread propria e entrega seus itens por uma fila
+    limitada: o produtor bloqueia quando o consumidor fica para tras.
+    Erros do produtor sao relancados no consumidor.
+    """
+    
+    def __init__(self, iteravel: Iterable, tamanho_fila: int, nome: str):
+        self.fila = queue.Queue(maxsize=max(1, tamanho_fila))
+        self._parar = threading.Event()
+        self._erro = None
+        self._thread = threading.Thread(target=self._executar, args=(iteravel,), name=nome, daemon=True)
+        self._thread.start()
+    
+    def _executar(self, iteravel: Iterable) -> None:
+        try:
+            for item in iteravel:
+                if not self._colocar(item):
+                    return
+        except BaseException as e:
+            self._erro = e
+        finally:
+            self._colocar(_FIM)
+    
+    def _colocar(self, item) -> bool:
+        while not self._parar.is_set():
+            try:
+                self.fila.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def __iter__(self):
+        try:
+            while True:
+                item = self.fila.get()
+                if item is _FIM:
+                    if self._erro is not None:
+                        raise self._erro
+                    return
+                yield item
+        finally:
+            # Consumidor terminou (ou falhou): liberar o produtor
+            self._parar.set()
+
 
 class FarmacopeiaIngestor:
     """Extrai e indexa monografias da Farmacopeia Brasileira."""
     
-    def __init__(self, pdf_paths: List[str], vectorstore_path: str):
+    def __init__(self, pdf_paths: List[str], vectorstore_path: str, workers: int = 1,
+                 quantizacao: Optional[str] = None, dimensoes_pca: Optional[int] = None,
+                 indice_numpy: bool = False, codificador: Optional[str] = None):
         self.pdf_paths = pdf_paths if isinstance(pdf_paths, list) else [pdf_paths]
         self.vectorstore_path = vectorstore_path
         
-        # Embeddings locais
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+        # Numero de processos para extracao de paginas (1 = serial)
+        self.workers = max(1, workers)
+        
+        # Indice compacto opcional (int8/float16, com PCA) gerado a partir do Chroma
+        if quantizacao and quantizacao not in TIPOS_QUANTIZACAO:
+            raise ValueError(f"Quantizacao invalida: {quantizacao} (use {', '.join(TIPOS_QUANTIZACAO)})")
+        self.quantizacao = quantizacao
+        self.dimensoes_pca = dimensoes_pca
+        self.indice_quantizado_path = os.getenv("QUANTIZED_INDEX_PATH", INDICE_QUANTIZADO_PADRAO)
+        
+        # Matriz float32 em mmap para a busca exata sem Chroma (BUSCA_VETORIAL=numpy)
+        self.indice_numpy = indice_numpy
+        self.indice_numpy_path = os.getenv("NUMPY_INDEX_PATH", INDICE_NUMPY_PADRAO)
+        
+        # Embeddings locais (torch, int8 ou onnx), com cache em disco para chunks que nao mudaram
+        self.codificador = codificador or os.getenv("ENCODER_BACKEND", "torch")
+        self.embeddings = CacheEmbeddings(
+            criar_codificador(self.codificador),
+            modelo=identificador_modelo(self.codificador),
+            caminho=os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite"),
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", 64)),
         )
         
         # Configuracoes de chunking
@@ -39,83 +177,242 @@ class FarmacopeiaIngestor:
             length_function=len,
         )
         
+        # Textos de paginas ja extraidas (evita rodar o pdfplumber de novo)
+        self.cache_paginas = CachePaginas()
+        self._hashes_pdf = {}
+        
+        # Mapa classe -> indicacoes compilado uma unica vez (Aho-Corasick)
+        self.indice_classes = IndiceTermos(self.CLASSE_PARA_INDICACOES)
+        
+        # Estado da ingestao incremental e tamanho dos lotes de escrita no Chroma
+        self.state_path = os.getenv("INGEST_STATE_PATH", "data/ingest_state")
+        self.batch_size = int(os.getenv("INGEST_BATCH_SIZE", 256))
+        
+        # Medicoes por etapa (substituido a cada run())
+        self.perfil = PerfilIngestao()
+        
         # Padrao para identificar codigo de monografia (IF###-## ou EF###-##)
         self.codigo_pattern = re.compile(r'(IF|EF)\d{3}-\d{2}')
+        
+        # Cabecalho repetido no topo de cada pagina (descartado nos chunks)
+        self.cabecalho_pagina_pattern = re.compile(r'^Farmacopeia Brasileira, \d+ª edição')
     
     def is_volume_monografias(self, pdf_path: str) -> bool:
         """Verifica se o PDF e o volume de monografias (Volume 2)."""
-        with pdfplumber.open(pdf_path) as pdf:
-            # Verificar primeiras paginas
-            for i in range(min(5, len(pdf.pages))):
-                text = pdf.pages[i].extract_text()
-                if text and "Monografias" in text:
-                    return True
-                if text and "Insumos Farmacêuticos" in text:
-                    return True
+        # Verificar primeiras paginas (lidas do cache de paginas)
+        hash_pdf = self._hash_pdf(pdf_path)
+        total = self.cache_paginas.total_paginas(hash_pdf)
+        if total is None:
+            with pdfplumber.open(pdf_path) as pdf:
+                total = len(pdf.pages)
+        for text in ler_paginas(pdf_path, range(min(5, total)), self.cache_paginas, pdf_hash=hash_pdf):
+            if text and "Monografias" in text:
+                return True
+            if text and "Insumos Farmacêuticos" in text:
+                return True
         return False
     
-    def extrair_monografias_volume2(self, pdf_path: str) -> List[Dict]:
+    def _hash_pdf(self, pdf_path: str) -> str:
+        """Hash do arquivo PDF, memorizado enquanto tamanho e data de modificacao nao mudam."""
+        info = os.stat(pdf_path)
+        chave = (os.path.abspath(pdf_path), info.st_size, info.st_mtime_ns)
+        if chave not in self._hashes_pdf:
+            self._hashes_pdf[chave] = hash_arquivo(pdf_path)
+        return self._hashes_pdf[chave]
+    
+    def _is_volume_monografias_incremental(self, pdf_path: str, manifesto: ManifestoIngestao) -> bool:
+        """Classifica o PDF, reaproveitando a classificacao do manifesto se o arquivo nao mudou."""
+        nome = os.path.basename(pdf_path)
+        hash_pdf = self._hash_pdf(pdf_path)
+        registro = manifesto.pdf(nome)
+        if registro and registro['hash'] == hash_pdf:
+            return registro['monografias']
+        
+        eh_monografias = self.is_volume_monografias(pdf_path)
+        manifesto.registrar_pdf(nome, hash_pdf, eh_monografias)
+        manifesto.salvar()
+        return eh_monografias
+    
+    def extrair_monografias_volume2(self, pdf_path: str, workers: Optional[int] = None) -> List[Dict]:
         """Extrai monografias do Volume 2 da Farmacopeia."""
-        monografias = []
+        print(f"Lendo PDF: {pdf_path}")
+        
+        textos = self._iter_paginas(pdf_path, workers=workers)
+        return list(self._iter_monografias(textos, pdf_path))
+    
+    def _iter_textos_paginas(self, pdf_path: str, workers: int = 1,
+                             paginas: Optional[List[int]] = None) -> Iterator[Optional[str]]:
+        """
+        Gera o texto das paginas do PDF (todas, ou apenas os indices em `paginas`), na ordem.
+        Com workers > 1 os intervalos de paginas sao distribuidos em um pool de processos,
+        com no maximo 2 intervalos por processo em voo (memoria limitada).
+        """
+        if paginas is None:
+            with pdfplumber.open(pdf_path) as pdf:
+                paginas = list(range(len(pdf.pages)))
+        
+        total_pages = len(paginas)
+        if not total_pages:
+            return
+        
+        inicio = time.perf_counter()
+        desc = f"Extraindo {os.path.basename(pdf_path)}"
+        
+        with tqdm(total=total_pages, desc=desc, unit="pag") as barra:
+            if workers <= 1:
+                with pdfplumber.open(pdf_path) as pdf:
+                    for i in paginas:
+                        texto = pdf.pages[i].extract_text()
+                        barra.update(1)
+                        yield texto
+            else:
+                # Intervalos menores que total/workers para balancear paginas mais pesadas
+                tamanho = max(1, min(PAGINAS_POR_INTERVALO, total_pages // (workers * 4) or 1))
+                intervalos = iter([
+                    (pdf_path, paginas[ini:ini + tamanho])
+                    for ini in range(0, total_pages, tamanho)
+                ])
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    # Janela FIFO de futures: o merge segue a ordem das paginas (deterministico)
+                    em_voo = deque(
+                        executor.submit(_extrair_intervalo_paginas, intervalo)
+                        for intervalo in islice(intervalos, workers * 2)
+                    )
+                    while em_voo:
+                        parte = em_voo.popleft().result()
+                        proximo = next(intervalos, None)
+                        if proximo is not None:
+                            em_voo.append(executor.submit(_extrair_intervalo_paginas, proximo))
+                        barra.update(len(parte))
+                        yield from parte
+        
+        duracao = time.perf_counter() - inicio
+        print(f"{total_pages} paginas em {duracao:.1f}s "
+              f"({total_pages / max(duracao, 1e-9):.1f} paginas/s, workers={workers})")
+    
+    def _iter_paginas(self, pdf_path: str, manifesto: Optional[ManifestoIngestao] = None,
+                      workers: Optional[int] = None) -> Iterator[Optional[str]]:
+        """
+        Gera o texto de todas as paginas, na ordem, lendo do cache de paginas
+        (hash do PDF + numero da pagina) e extraindo apenas as que faltam.
+        Se o PDF mudou, paginas com o mesmo conteudo bruto (hash da pagina) de uma
+        versao anterior tambem sao reaproveitadas. Com manifesto, registra os hashes.
+        """
+        nome = os.path.basename(pdf_path)
+        hash_pdf = self._hash_pdf(pdf_path)
+        cache = self.cache_paginas
+        
+        total = cache.total_paginas(hash_pdf)
+        if total is None:
+            with pdfplumber.open(pdf_path) as pdf:
+                total = len(pdf.pages)
+            cache.registrar_total_paginas(hash_pdf, total)
+        
+        presentes = cache.paginas_presentes(hash_pdf)
+        pendentes = [i for i in range(total) if i not in presentes]
+        
+        # Hashes das paginas: do manifesto se o PDF nao mudou, senao calculados (sem extrair texto)
+        hashes = None
+        registro = manifesto.pdf(nome) if manifesto is not None else None
+        if registro and registro['hash'] == hash_pdf and len(registro['paginas']) == total:
+            hashes = registro['paginas']
+        elif pendentes or manifesto is not None:
+            with pdfplumber.open(pdf_path) as pdf:
+                hashes = [_hash_pagina(page) for page in pdf.pages]
+        
+        if pendentes and hashes:
+            restantes = []
+            for i in pendentes:
+                encontrado, texto = cache.texto_por_hash_pagina(hashes[i])
+                if encontrado:
+                    cache.gravar(hash_pdf, i, texto, hashes[i])
+                else:
+                    restantes.append(i)
+            pendentes = restantes
+        
+        print(f"{total - len(pendentes)} paginas em cache, {len(pendentes)} a extrair")
+        self.perfil.contar('paginas', total)
+        self.perfil.contar('paginas_extraidas', len(pendentes))
+        
+        a_extrair = set(pendentes)
+        extraidos = self._iter_textos_paginas(pdf_path, workers or self.workers, pendentes)
+        for i in range(total):
+            if i in a_extrair:
+                texto = next(extraidos)
+                cache.gravar(hash_pdf, i, texto, hashes[i] if hashes else None)
+                if i % 50 == 0:
+                    cache.salvar()
+            else:
+                texto = cache.texto(hash_pdf, i)[1]
+            yield texto
+        cache.salvar()
+        
+        if manifesto is not None:
+            manifesto.registrar_pdf(nome, hash_pdf, True, hashes)
+            manifesto.salvar()
+    
+    def _iter_monografias(self, textos: Iterable[Optional[str]], pdf_path: str) -> Iterator[Dict]:
+        """
+        Gera as monografias a partir dos textos das paginas, na ordem.
+        Cada monografia e emitida assim que a proxima comeca.
+        """
         monografia_atual = None
+        partes = []  # paginas da monografia atual (juntadas uma unica vez ao final)
         
-        print(f"Lendo PDF: {pdf_path}")
+        def finalizar(mono):
+            mono['conteudo'] = '\n\n'.join(partes)
+            return mono
         
-        with pdfplumber.open(pdf_path) as pdf:
-            total_pages = len(pdf.pages)
+        for text in textos:
+            if not text:
+                continue
             
-            for i in tqdm(range(total_pages), desc=f"Extraindo {os.path.basename(pdf_path)}"):
-                text = pdf.pages[i].extract_text()
-                if not text:
-                    continue
-                
-                lines = text.split('\n')
-                if len(lines) < 2:
-                    continue
-                
-                primeira_linha = lines[0].strip()
-                segunda_linha = lines[1].strip() if len(lines) > 1 else ""
-                
-                # Verificar se e inicio de nova monografia
-                # Padrao: "Farmacopeia Brasileira, 6a edicao IF###-##" ou "EF###-##"
-                codigo_match = self.codigo_pattern.search(primeira_linha)
+            lines = text.split('\n')
+            if len(lines) < 2:
+                continue
+            
+            primeira_linha = lines[0].strip()
+            segunda_linha = lines[1].strip() if len(lines) > 1 else ""
+            
+            # Verificar se e inicio de nova monografia
+            # Padrao: "Farmacopeia Brasileira, 6a edicao IF###-##" ou "EF###-##"
+            codigo_match = self.codigo_pattern.search(primeira_linha)
+            
+            if codigo_match:
+                codigo = codigo_match.group(0)
                 
-                if codigo_match:
-                    codigo = codigo_match.group(0)
+                # Verificar se a segunda linha e um nome de medicamento (maiusculas)
+                if self._is_nome_medicamento(segunda_linha):
+                    # Emitir monografia anterior se existir
+                    if monografia_atual and monografia_atual.get('nome'):
+                        yield finalizar(monografia_atual)
                     
-                    # Verificar se a segunda linha e um nome de medicamento (maiusculas)
-                    if self._is_nome_medicamento(segunda_linha):
-                        # Salvar monografia anterior se existir
-                        if monografia_atual and monografia_atual.get('nome'):
-                            monografias.append(monografia_atual)
-                        
-                        # Iniciar nova monografia
-                        monografia_atual = {
-                            'codigo': codigo,
-                            'nome': segunda_linha,
-                            'conteudo': text,
-                            'classe_terapeutica': '',
-                            'tipo': 'Insumo Farmaceutico' if codigo.startswith('IF') else 'Especialidade Farmaceutica',
-                            'fonte': os.path.basename(pdf_path)
-                        }
-                    elif monografia_atual:
-                        # Continuar acumulando conteudo da monografia atual
-                        monografia_atual['conteudo'] += '\n\n' + text
-                else:
-                    if monografia_atual:
-                        monografia_atual['conteudo'] += '\n\n' + text
-                
-                # Extrair classe terapeutica se presente
+                    # Iniciar nova monografia
+                    monografia_atual = {
+                        'codigo': codigo,
+                        'nome': segunda_linha,
+                        'conteudo': '',
+                        'classe_terapeutica': '',
+                        'tipo': 'Insumo Farmaceutico' if codigo.startswith('IF') else 'Especialidade Farmaceutica',
+                        'fonte': os.path.basename(pdf_path)
+                    }
+                    partes = [text]
+                elif monografia_atual:
+                    # Continuar acumulando conteudo da monografia atual
+                    partes.append(text)
+            else:
                 if monografia_atual:
-                    classe = self._extrair_classe_terapeutica(text)
-                    if classe and not monografia_atual['classe_terapeutica']:
-                        monografia_atual['classe_terapeutica'] = classe
+                    partes.append(text)
             
-            # Adicionar ultima monografia
-            if monografia_atual and monografia_atual.get('nome'):
-                monografias.append(monografia_atual)
+            # Extrair classe terapeutica se presente
+            if monografia_atual:
+                classe = self._extrair_classe_terapeutica(text)
+                if classe and not monografia_atual['classe_terapeutica']:
+                    monografia_atual['classe_terapeutica'] = classe
         
-        return monografias
+        # Emitir ultima monografia
+        if monografia_atual and monografia_atual.get('nome'):
+            yield finalizar(monografia_atual)
     
     def _is_nome_medicamento(self, texto: str) -> bool:
         """Verifica se o texto e um nome de medicamento valido."""
@@ -181,10 +478,15 @@ class FarmacopeiaIngestor:
         
         return None
     
-    def process_all_pdfs(self) -> List[Dict]:
-        """Processa cada PDF individualmente."""
-        todas_monografias = []
-        
+    def process_all_pdfs(self, manifesto: Optional[ManifestoIngestao] = None) -> List[Dict]:
+        """
+        Processa cada PDF individualmente.
+        Com um manifesto, reaproveita os textos de paginas ja extraidas.
+        """
+        return list(self.iter_monografias(manifesto))
+    
+    def iter_monografias(self, manifesto: Optional[ManifestoIngestao] = None) -> Iterator[Dict]:
+        """Gera as monografias de todos os PDFs, uma a uma."""
         for pdf_path in self.pdf_paths:
             nome_arquivo = os.path.basename(pdf_path)
             print(f"\n{'='*60}")
@@ -192,221 +494,295 @@ class FarmacopeiaIngestor:
             print(f"{'='*60}")
             
             # Verificar se e volume de monografias
-            if self.is_volume_monografias(pdf_path):
-                print("Identificado como Volume de Monografias")
-                monografias = self.extrair_monografias_volume2(pdf_path)
+            if manifesto is not None:
+                eh_monografias = self._is_volume_monografias_incremental(pdf_path, manifesto)
             else:
+                eh_monografias = self.is_volume_monografias(pdf_path)
+            
+            if not eh_monografias:
                 print("Volume de metodos gerais - ignorando para extracao de monografias")
                 continue
             
-            print(f"{len(monografias)} monografias identificadas")
+            print("Identificado como Volume de Monografias")
+            print(f"Lendo PDF: {pdf_path}")
+            textos = self.perfil.medir('extracao_paginas', self._iter_paginas(pdf_path, manifesto))
+            
+            total = 0
+            exemplos = []
+            for mono in self.perfil.medir('parsing_monografias', self._iter_monografias(textos, pdf_path)):
+                if len(exemplos) < 10:
+                    exemplos.append(mono)
+                total += 1
+                yield mono
+            
+            print(f"{total} monografias identificadas")
             
-            if monografias:
+            if exemplos:
                 print(f"\nExemplos de nomes extraidos:")
-                for m in monografias[:10]:
+                for m in exemplos:
                     classe = m.get('classe_terapeutica', '')[:50]
                     print(f"  - {m['nome']}")
                     if classe:
                         print(f"    Classe: {classe}...")
-            
-            todas_monografias.extend(monografias)
+    
+    # Mapeamento de classes para sintomas/indicacoes (EXPANDIDO)
+    CLASSE_PARA_INDICACOES = {
+        # Analgésicos
+        'analgésico': ['dor', 'dor de cabeca', 'cefaleia', 'enxaqueca', 'dor muscular'],
+        'antipirético': ['febre', 'temperatura alta'],
+        'opioide': ['dor intensa', 'dor cronica'],
+        'agonista': ['dor', 'dor intensa'],
         
-        return todas_monografias
+        # Anti-inflamatórios
+        'anti-inflamatório': ['inflamacao', 'inchaco', 'artrite', 'dor muscular', 'reumatismo'],
+        'antirreumático': ['reumatismo', 'artrite', 'dor articular'],
+        'corticosteroide': ['inflamacao', 'alergia', 'dermatite', 'eczema'],
+        
+        # Antibióticos/Antimicrobianos
+        'antibacteriano': ['infeccao', 'bacteria', 'infeccao bacteriana'],
+        'antibiótico': ['infeccao', 'bacteria', 'infeccao bacteriana'],
+        'antimicrobiano': ['infeccao', 'bacteria'],
+        'tuberculostático': ['tuberculose'],
+        
+        # Antifúngicos
+        'antifúngico': ['fungo', 'micose', 'candidiase', 'frieira'],
+        
+        # Antivirais
+        'antiviral': ['virus', 'herpes', 'gripe', 'infeccao viral'],
+        'antirretroviral': ['hiv', 'aids'],
+        
+        # Anti-helmínticos/Antiparasitários
+        'anti-helmíntico': ['verme', 'parasita', 'lombriga', 'oxiurose'],
+        'antiparasitário': ['verme', 'parasita', 'sarna'],
+        'escabicida': ['sarna', 'escabiose'],
+        
+        # Respiratório
+        'broncodilatador': ['asma', 'bronquite', 'falta de ar', 'dispneia', 'chiado no peito'],
+        'antiasmático': ['asma', 'bronquite', 'falta de ar', 'dispneia'],
+        'adrenérgico': ['asma', 'bronquite', 'congestao nasal'],
+        'mucolítico': ['tosse', 'catarro', 'secrecao', 'expectoracao'],
+        'expectorante': ['tosse', 'catarro', 'secrecao'],
+        'descongestionante': ['congestao nasal', 'nariz entupido', 'sinusite'],
+        
+        # Cardiovascular
+        'anti-hipertensivo': ['pressao alta', 'hipertensao'],
+        'antiarrítmico': ['arritmia', 'palpitacao', 'taquicardia'],
+        'antianginoso': ['angina', 'dor no peito'],
+        'vasodilatador': ['pressao alta', 'hipertensao', 'circulacao'],
+        'diurético': ['inchaco', 'retencao de liquido', 'hipertensao', 'edema'],
+        'cardiotônico': ['insuficiencia cardiaca'],
+        
+        # Sistema Nervoso
+        'ansiolítico': ['ansiedade', 'insonia', 'nervosismo'],
+        'benzodiazepínico': ['ansiedade', 'insonia', 'nervosismo', 'convulsao'],
+        'sedativo': ['insonia', 'ansiedade', 'agitacao'],
+        'hipnótico': ['insonia', 'dificuldade para dormir'],
+        'anticonvulsivante': ['convulsao', 'epilepsia'],
+        'antidepressivo': ['depressao', 'ansiedade', 'tristeza'],
+        'antipsicótico': ['psicose', 'esquizofrenia'],
+        'neuroléptico': ['psicose', 'agitacao'],
+        'antiparkinsoniano': ['parkinson', 'tremor'],
+        'relaxante muscular': ['contratura', 'espasmo muscular', 'tensao muscular'],
+        
+        # Gastrointestinal
+        'antiácido': ['azia', 'gastrite', 'refluxo', 'queimacao'],
+        'antissecretor': ['ulcera', 'gastrite', 'refluxo'],
+        'antiemético': ['nausea', 'vomito', 'enjoo'],
+        'laxante': ['constipacao', 'intestino preso', 'prisao de ventre'],
+        'antiespasmódico': ['colica', 'espasmo abdominal', 'dor abdominal'],
+        'colagogo': ['digestao', 'bile'],
+        
+        # Diabetes
+        'hipoglicemiante': ['diabetes', 'glicose alta', 'acucar no sangue'],
+        'antidiabético': ['diabetes', 'glicose alta'],
+        
+        # Alergias
+        'anti-histamínico': ['alergia', 'coriza', 'espirro', 'urticaria', 'coceira'],
+        'antialérgico': ['alergia', 'rinite', 'urticaria'],
+        'antipruriginoso': ['coceira', 'prurido'],
+        
+        # Vitaminas e Suplementos
+        'vitamina': ['deficiencia vitaminica', 'suplementacao', 'fraqueza'],
+        'suplemento': ['deficiencia', 'fraqueza'],
+        'hematopoiético': ['anemia'],
+        'antianêmico': ['anemia', 'fraqueza'],
+        
+        # Dermatológico
+        'protetor': ['pele ressecada', 'protecao da pele'],
+        'ceratolítico': ['calosidade', 'verruga'],
+        'queratolítico': ['caspa', 'psoríase'],
+        'despigmentante': ['manchas na pele'],
+        'adstringente': ['poros dilatados', 'oleosidade'],
+        'antisséptico': ['desinfeccao', 'feridas', 'infeccao de pele'],
+        
+        # Outros medicamentos
+        'anestésico': ['anestesia', 'dor local'],
+        'anticoagulante': ['trombose', 'coagulo'],
+        'hormônio': ['reposicao hormonal'],
+        'contraceptivo': ['anticoncepcional', 'prevencao de gravidez'],
+        'imunossupressor': ['transplante', 'doenca autoimune'],
+        
+        # Classes faltantes - Cobertura 100%
+        'acidificante': ['acidez urinaria'],
+        'adjuvante': ['dialise', 'excipiente'],
+        'adoçante': ['adocante', 'edulcorante'],
+        'antigotoso': ['gota', 'acido urico'],
+        'antitireoidiano': ['hipertireoidismo', 'tireoide'],
+        'diagnóstico': ['exame', 'diagnostico'],
+        'dopaminérgico': ['parkinson'],
+        'alcalinizante': ['acidez', 'alcalinizar'],
+        'aminoácido': ['aminoacido', 'proteina'],
+        'anti-hemorrágico': ['sangramento', 'hemorragia'],
+        'antiandrogênico': ['alopecia', 'queda de cabelo'],
+        'antichagásico': ['chagas', 'doenca de chagas'],
+        'anticolinérgico': ['espasmo', 'secrecao'],
+        'antiglaucomatoso': ['glaucoma', 'pressao ocular'],
+        'antilipêmico': ['colesterol', 'triglicerides'],
+        'hipolipemiante': ['colesterol alto', 'triglicerides alto'],
+        'antimalárico': ['malaria'],
+        'antineoplásico': ['cancer', 'tumor'],
+        'quimioterápico': ['cancer', 'quimioterapia'],
+        'antitranspirante': ['suor', 'transpiracao'],
+        'catártico': ['constipacao', 'purgante'],
+        'colinérgico': ['bexiga', 'retencao urinaria'],
+        'estimulante': ['fadiga', 'cansaco', 'sonolencia'],
+        'estrogênio': ['menopausa', 'reposicao hormonal feminina'],
+        'progestágeno': ['ciclo menstrual', 'hormonio feminino'],
+        'progestagênio': ['ciclo menstrual', 'hormonio feminino'],
+        'hansenostático': ['hanseniase', 'lepra'],
+        'inibidor': ['inibidor enzimatico'],
+        'lipotrópico': ['figado', 'gordura hepatica'],
+        'profilático': ['prevencao', 'carie'],
+        'repositor': ['reposicao eletrolitica', 'desidratacao'],
+        'simpatomimético': ['hipotensao', 'choque'],
+        'vasoconstritor': ['sangramento nasal', 'hemorragia'],
+        'vitamínico': ['deficiencia vitaminica', 'suplementacao'],
+    }
     
     def enriquecer_metadados(self, monografias: List[Dict]) -> List[Dict]:
         """Adiciona metadados extras baseados na classe terapeutica."""
-        # Mapeamento de classes para sintomas/indicacoes (EXPANDIDO)
-        classe_para_indicacoes = {
-            # Analgésicos
-            'analgésico': ['dor', 'dor de cabeca', 'cefaleia', 'enxaqueca', 'dor muscular'],
-            'antipirético': ['febre', 'temperatura alta'],
-            'opioide': ['dor intensa', 'dor cronica'],
-            'agonista': ['dor', 'dor intensa'],
-            
-            # Anti-inflamatórios
-            'anti-inflamatório': ['inflamacao', 'inchaco', 'artrite', 'dor muscular', 'reumatismo'],
-            'antirreumático': ['reumatismo', 'artrite', 'dor articular'],
-            'corticosteroide': ['inflamacao', 'alergia', 'dermatite', 'eczema'],
-            
-            # Antibióticos/Antimicrobianos
-            'antibacteriano': ['infeccao', 'bacteria', 'infeccao bacteriana'],
-            'antibiótico': ['infeccao', 'bacteria', 'infeccao bacteriana'],
-            'antimicrobiano': ['infeccao', 'bacteria'],
-            'tuberculostático': ['tuberculose'],
-            
-            # Antifúngicos
-            'antifúngico': ['fungo', 'micose', 'candidiase', 'frieira'],
-            
-            # Antivirais
-            'antiviral': ['virus', 'herpes', 'gripe', 'infeccao viral'],
-            'antirretroviral': ['hiv', 'aids'],
-            
-            # Anti-helmínticos/Antiparasitários
-            'anti-helmíntico': ['verme', 'parasita', 'lombriga', 'oxiurose'],
-            'antiparasitário': ['verme', 'parasita', 'sarna'],
-            'escabicida': ['sarna', 'escabiose'],
-            
-            # Respiratório
-            'broncodilatador': ['asma', 'bronquite', 'falta de ar', 'dispneia', 'chiado no peito'],
-            'antiasmático': ['asma', 'bronquite', 'falta de ar', 'dispneia'],
-            'adrenérgico': ['asma', 'bronquite', 'congestao nasal'],
-            'mucolítico': ['tosse', 'catarro', 'secrecao', 'expectoracao'],
-            'expectorante': ['tosse', 'catarro', 'secrecao'],
-            'descongestionante': ['congestao nasal', 'nariz entupido', 'sinusite'],
-            
-            # Cardiovascular
-            'anti-hipertensivo': ['pressao alta', 'hipertensao'],
-            'antiarrítmico': ['arritmia', 'palpitacao', 'taquicardia'],
-            'antianginoso': ['angina', 'dor no peito'],
-            'vasodilatador': ['pressao alta', 'hipertensao', 'circulacao'],
-            'diurético': ['inchaco', 'retencao de liquido', 'hipertensao', 'edema'],
-            'cardiotônico': ['insuficiencia cardiaca'],
-            
-            # Sistema Nervoso
-            'ansiolítico': ['ansiedade', 'insonia', 'nervosismo'],
-            'benzodiazepínico': ['ansiedade', 'insonia', 'nervosismo', 'convulsao'],
-            'sedativo': ['insonia', 'ansiedade', 'agitacao'],
-            'hipnótico': ['insonia', 'dificuldade para dormir'],
-            'anticonvulsivante': ['convulsao', 'epilepsia'],
-            'antidepressivo': ['depressao', 'ansiedade', 'tristeza'],
-            'antipsicótico': ['psicose', 'esquizofrenia'],
-            'neuroléptico': ['psicose', 'agitacao'],
-            'antiparkinsoniano': ['parkinson', 'tremor'],
-            'relaxante muscular': ['contratura', 'espasmo muscular', 'tensao muscular'],
-            
-            # Gastrointestinal
-            'antiácido': ['azia', 'gastrite', 'refluxo', 'queimacao'],
-            'antissecretor': ['ulcera', 'gastrite', 'refluxo'],
-            'antiemético': ['nausea', 'vomito', 'enjoo'],
-            'laxante': ['constipacao', 'intestino preso', 'prisao de ventre'],
-            'antiespasmódico': ['colica', 'espasmo abdominal', 'dor abdominal'],
-            'colagogo': ['digestao', 'bile'],
-            
-            # Diabetes
-            'hipoglicemiante': ['diabetes', 'glicose alta', 'acucar no sangue'],
-            'antidiabético': ['diabetes', 'glicose alta'],
-            
-            # Alergias
-            'anti-histamínico': ['alergia', 'coriza', 'espirro', 'urticaria', 'coceira'],
-            'antialérgico': ['alergia', 'rinite', 'urticaria'],
-            'antipruriginoso': ['coceira', 'prurido'],
-            
-            # Vitaminas e Suplementos
-            'vitamina': ['deficiencia vitaminica', 'suplementacao', 'fraqueza'],
-            'suplemento': ['deficiencia', 'fraqueza'],
-            'hematopoiético': ['anemia'],
-            'antianêmico': ['anemia', 'fraqueza'],
-            
-            # Dermatológico
-            'protetor': ['pele ressecada', 'protecao da pele'],
-            'ceratolítico': ['calosidade', 'verruga'],
-            'queratolítico': ['caspa', 'psoríase'],
-            'despigmentante': ['manchas na pele'],
-            'adstringente': ['poros dilatados', 'oleosidade'],
-            'antisséptico': ['desinfeccao', 'feridas', 'infeccao de pele'],
-            
-            # Outros medicamentos
-            'anestésico': ['anestesia', 'dor local'],
-            'anticoagulante': ['trombose', 'coagulo'],
-            'hormônio': ['reposicao hormonal'],
-            'contraceptivo': ['anticoncepcional', 'prevencao de gravidez'],
-            'imunossupressor': ['transplante', 'doenca autoimune'],
-            
-            # Classes faltantes - Cobertura 100%
-            'acidificante': ['acidez urinaria'],
-            'adjuvante': ['dialise', 'excipiente'],
-            'adoçante': ['adocante', 'edulcorante'],
-            'antigotoso': ['gota', 'acido urico'],
-            'antitireoidiano': ['hipertireoidismo', 'tireoide'],
-            'diagnóstico': ['exame', 'diagnostico'],
-            'dopaminérgico': ['parkinson'],
-            'alcalinizante': ['acidez', 'alcalinizar'],
-            'aminoácido': ['aminoacido', 'proteina'],
-            'anti-hemorrágico': ['sangramento', 'hemorragia'],
-            'antiandrogênico': ['alopecia', 'queda de cabelo'],
-            'antichagásico': ['chagas', 'doenca de chagas'],
-            'anticolinérgico': ['espasmo', 'secrecao'],
-            'antiglaucomatoso': ['glaucoma', 'pressao ocular'],
-            'antilipêmico': ['colesterol', 'triglicerides'],
-            'hipolipemiante': ['colesterol alto', 'triglicerides alto'],
-            'antimalárico': ['malaria'],
-            'antineoplásico': ['cancer', 'tumor'],
-            'quimioterápico': ['cancer', 'quimioterapia'],
-            'antitranspirante': ['suor', 'transpiracao'],
-            'catártico': ['constipacao', 'purgante'],
-            'colinérgico': ['bexiga', 'retencao urinaria'],
-            'estimulante': ['fadiga', 'cansaco', 'sonolencia'],
-            'estrogênio': ['menopausa', 'reposicao hormonal feminina'],
-            'progestágeno': ['ciclo menstrual', 'hormonio feminino'],
-            'progestagênio': ['ciclo menstrual', 'hormonio feminino'],
-            'hansenostático': ['hanseniase', 'lepra'],
-            'inibidor': ['inibidor enzimatico'],
-            'lipotrópico': ['figado', 'gordura hepatica'],
-            'profilático': ['prevencao', 'carie'],
-            'repositor': ['reposicao eletrolitica', 'desidratacao'],
-            'simpatomimético': ['hipotensao', 'choque'],
-            'vasoconstritor': ['sangramento nasal', 'hemorragia'],
-            'vitamínico': ['deficiencia vitaminica', 'suplementacao'],
-        }
-        
         for mono in tqdm(monografias, desc="Processando"):
-            classe = mono.get('classe_terapeutica', '').lower()
-            indicacoes = []
-            
-            for classe_key, sintomas in classe_para_indicacoes.items():
-                if classe_key in classe:
-                    indicacoes.extend(sintomas)
-            
-            mono['indicacoes'] = list(set(indicacoes))
-            
-            # Categorias baseadas no tipo
-            categorias = []
-            if mono.get('tipo') == 'Especialidade Farmaceutica':
-                nome_lower = mono['nome'].lower()
-                if 'comprimido' in nome_lower:
-                    categorias.append('comprimido')
-                elif 'capsula' in nome_lower:
-                    categorias.append('capsula')
-                elif 'solucao' in nome_lower:
-                    categorias.append('solucao')
-                elif 'suspensao' in nome_lower:
-                    categorias.append('suspensao')
-                elif 'creme' in nome_lower:
-                    categorias.append('uso topico')
-            
-            mono['categorias'] = categorias
+            self._enriquecer_monografia(mono)
         
         return monografias
     
-    def criar_chunks(self, monografias: List[Dict]) -> List[Dict]:
-        """Divide monografias em chunks para indexacao."""
-        all_chunks = []
+    def _enriquecer_monografia(self, mono: Dict) -> Dict:
+        """Adiciona indicacoes e categorias a uma monografia."""
+        classe = mono.get('classe_terapeutica', '')
+        indicacoes = []
+        
+        for sintomas in self.indice_classes.buscar(classe):
+            indicacoes.extend(sintomas)
+        
+        # Ordem deterministica (o hash da monografia depende dela)
+        mono['indicacoes'] = list(dict.fromkeys(indicacoes))
         
+        # Categorias baseadas no tipo
+        categorias = []
+        if mono.get('tipo') == 'Especialidade Farmaceutica':
+            nome_lower = mono['nome'].lower()
+            if 'comprimido' in nome_lower:
+                categorias.append('comprimido')
+            elif 'capsula' in nome_lower:
+                categorias.append('capsula')
+            elif 'solucao' in nome_lower:
+                categorias.append('solucao')
+            elif 'suspensao' in nome_lower:
+                categorias.append('suspensao')
+            elif 'creme' in nome_lower:
+                categorias.append('uso topico')
+        
+        mono['categorias'] = categorias
+        
+        return mono
+    
+    def _ids_monografias(self, monografias: List[Dict]) -> List[str]:
+        """
+        IDs estaveis das monografias: o codigo, com sufixo para codigos repetidos
+        (ex: IF041-00 e IF041-00.2), atribuido na ordem de extracao.
+        """
+        ocorrencias = {}
+        ids = []
         for mono in monografias:
-            texto = f"""
+            n = ocorrencias.get(mono['codigo'], 0) + 1
+            ocorrencias[mono['codigo']] = n
+            ids.append(mono['codigo'] if n == 1 else f"{mono['codigo']}.{n}")
+        return ids
+    
+    def _dividir_secoes(self, conteudo: str) -> List[Tuple[str, str, str]]:
+        """Divide o conteudo nos cabecalhos de secao: lista de (tag, titulo, texto)."""
+        secoes = []
+        secao, titulo, linhas = 'resumo', '', []
+        
+        def fechar():
+            texto = '\n'.join(linhas).strip()
+            if texto:
+                secoes.append((secao, titulo, texto))
+        
+        for linha in conteudo.split('\n'):
+            limpa = linha.strip()
+            if self.cabecalho_pagina_pattern.match(limpa):
+                continue
+            tag = SECOES_MONOGRAFIA.get(limpa.rstrip('.'))
+            if tag:
+                fechar()
+                secao, titulo, linhas = tag, limpa.rstrip('.'), []
+            else:
+                linhas.append(linha)
+        fechar()
+        
+        return secoes
+    
+    def _chunks_da_monografia(self, mono: Dict, id_mono: str) -> List[Dict]:
+        """
+        Divide uma monografia em chunks por secao (DESCRICAO, DOSEAMENTO...), com IDs
+        estaveis (id da monografia + indice). Secoes longas sao subdivididas pelo
+        text_splitter e cada chunk leva o nome do medicamento e o titulo da secao.
+        """
+        resumo = f"""
 MEDICAMENTO: {mono['nome']}
 CODIGO: {mono['codigo']}
 TIPO: {mono['tipo']}
 CLASSE TERAPEUTICA: {mono.get('classe_terapeutica', 'Nao especificada')}
 INDICACOES: {', '.join(mono.get('indicacoes', []))}
-
-{mono['conteudo']}
 """
-            chunks = self.text_splitter.split_text(texto)
-            
-            for chunk in chunks:
-                all_chunks.append({
-                    'content': chunk,
-                    'metadata': {
-                        'nome': mono['nome'],
-                        'codigo': mono['codigo'],
-                        'tipo': mono['tipo'],
-                        'classe_terapeutica': mono.get('classe_terapeutica', ''),
-                        'indicacoes': mono.get('indicacoes', []),
-                        'categorias': mono.get('categorias', []),
-                        'fonte': mono['fonte']
-                    }
-                })
+        secoes = self._dividir_secoes(mono['conteudo'])
+        if not secoes or secoes[0][0] != 'resumo':
+            secoes.insert(0, ('resumo', '', ''))
+        
+        pedacos = []
+        for secao, titulo, texto in secoes:
+            if secao == 'resumo':
+                for parte in self.text_splitter.split_text(f"{resumo}\n{texto}"):
+                    pedacos.append((secao, parte))
+            else:
+                for parte in self.text_splitter.split_text(texto):
+                    pedacos.append((secao, f"{mono['nome']} - {titulo}\n{parte}"))
+        
+        return [
+            {
+                'id': f"{id_mono}:{i}",
+                'content': chunk,
+                'metadata': {
+                    'nome': mono['nome'],
+                    'codigo': mono['codigo'],
+                    'tipo': mono['tipo'],
+                    'classe_terapeutica': mono.get('classe_terapeutica', ''),
+                    'indicacoes': mono.get('indicacoes', []),
+                    'categorias': mono.get('categorias', []),
+                    'fonte': mono['fonte'],
+                    'secao': secao,
+                }
+            }
+            for i, (secao, chunk) in enumerate(pedacos)
+        ]
+    
+    def criar_chunks(self, monografias: List[Dict]) -> List[Dict]:
+        """Divide monografias em chunks para indexacao."""
+        all_chunks = []
+        
+        for mono, id_mono in zip(monografias, self._ids_monografias(monografias)):
+            all_chunks.extend(self._chunks_da_monografia(mono, id_mono))
         
         return all_chunks
     
@@ -415,62 +791,333 @@ INDICACOES: {', '.join(mono.get('indicacoes', []))}
         print("\nCriando banco vetorial...")
         
         texts = [c['content'] for c in chunks]
-        metadatas = [c['metadata'] for c in chunks]
-        
-        # Converter listas para strings nos metadados (Chroma nao suporta listas)
-        for m in metadatas:
-            m['indicacoes'] = ', '.join(m.get('indicacoes', []))
-            m['categorias'] = ', '.join(m.get('categorias', []))
+        metadatas = [self._metadados_chroma(c['metadata']) for c in chunks]
         
         vectorstore = Chroma.from_texts(
             texts=texts,
             embedding=self.embeddings,
             metadatas=metadatas,
+            ids=[c['id'] for c in chunks],
             persist_directory=self.vectorstore_path
         )
         
         print(f"Vectorstore criado com {len(texts)} chunks")
+        print(self.embeddings.resumo())
         print(f"Salvo em: {self.vectorstore_path}")
         
         return vectorstore
     
-    def run(self):
-        """Executa o pipeline completo de ingestao."""
-        # 1. Extrair monografias
-        monografias = self.process_all_pdfs()
+    def _metadados_chroma(self, metadata: Dict) -> Dict:
+        """Converte listas para strings nos metadados (Chroma nao suporta listas)."""
+        m = dict(metadata)
+        m['indicacoes'] = ', '.join(m.get('indicacoes', []))
+        m['categorias'] = ', '.join(m.get('categorias', []))
+        return m
+    
+    def atualizar_vectorstore(self, monografias: Iterable[Dict], manifesto: ManifestoIngestao):
+        """
+        Atualiza o banco vetorial de forma incremental e em fluxo:
+        monografias -> chunks (thread de parsing) -> lotes de embeddings (thread de
+        embeddings) -> escrita em lotes no Chroma (thread principal), com filas limitadas
+        entre os estagios. Faz upsert apenas dos chunks novos ou alterados e remove os
+        que deixaram de existir. O manifesto e salvo a cada lote, permitindo retomar apos uma falha.
+        """
+        print("\nAtualizando banco vetorial (incremental)...")
         
-        if not monografias:
-            print("Nenhuma monografia encontrada!")
-            return None
+        vectorstore = Chroma(
+            persist_directory=self.vectorstore_path,
+            embedding_function=self.embeddings
+        )
         
-        # 2. Enriquecer com metadados
-        print("\nEnriquecendo metadados...")
-        monografias = self.enriquecer_metadados(monografias)
+        estado = {
+            'ids_atuais': set(), 'ids_monos': set(),
+            'inalteradas': 0, 'alteradas': 0, 'upserts': 0, 'removidos': 0,
+        }
+        
+        # Etapas medidas no perfil; "espera_*" e o tempo parado aguardando a fila anterior
+        perfil = self.perfil
+        chunks = EstagioAssincrono(
+            perfil.medir('chunking', self._iter_chunks_pendentes(monografias, manifesto, estado),
+                         contar=lambda item: 0 if 'monografia' in item else 1),
+            tamanho_fila=self.batch_size * 2, nome="ingestao-parsing"
+        )
+        lotes = EstagioAssincrono(
+            perfil.medir('embeddings', self._iter_lotes_embeddings(
+                perfil.medir('espera_chunks', chunks, contar=lambda item: 0)
+            ), contar=lambda lote: len(lote['chunks'])),
+            tamanho_fila=2, nome="ingestao-embeddings"
+        )
+        
+        for lote in perfil.medir('espera_lotes', lotes, contar=lambda lote: 0):
+            with perfil.etapa('escrita_chroma', itens=len(lote['chunks'])):
+                if lote['chunks']:
+                    vectorstore._collection.upsert(
+                        ids=[c['id'] for c in lote['chunks']],
+                        embeddings=lote['vetores'],
+                        metadatas=[self._metadados_chroma(c['metadata']) for c in lote['chunks']],
+                        documents=[c['content'] for c in lote['chunks']],
+                    )
+                    manifesto.registrar_chunks({c['id']: c['hash'] for c in lote['chunks']})
+                    estado['upserts'] += len(lote['chunks'])
+                # So registra a monografia depois que todos os seus chunks foram gravados
+                for id_mono, hash_mono, chunk_ids in lote['monografias']:
+                    manifesto.registrar_monografia(id_mono, hash_mono, chunk_ids)
+                manifesto.salvar()
         
-        # 3. Salvar backup JSON
-        backup_path = "data/monografias_backup.json"
+        # Remover chunks que nao existem mais (monografias removidas ou encurtadas).
+        # Sem nenhuma monografia a extracao falhou: nao apagar o indice inteiro.
+        ids_atuais = estado['ids_atuais']
+        removidos = [c for c in manifesto.todos_chunks() if c not in ids_atuais] if estado['ids_monos'] else []
+        if removidos:
+            with perfil.etapa('escrita_chroma'):
+                vectorstore.delete(ids=removidos)
+            manifesto.remover_chunks(removidos)
+            estado['removidos'] = len(removidos)
+        if estado['ids_monos']:
+            for id_mono in set(manifesto.dados['monografias']) - estado['ids_monos']:
+                manifesto.remover_monografia(id_mono)
+        manifesto.salvar()
+        
+        for chave in ('inalteradas', 'alteradas'):
+            perfil.contar(f'monografias_{chave}', estado[chave])
+        perfil.contar('chunks_total', len(ids_atuais))
+        perfil.contar('chunks_gravados', estado['upserts'])
+        perfil.contar('chunks_removidos', estado['removidos'])
+        
+        print(f"Monografias inalteradas: {estado['inalteradas']} | alteradas: {estado['alteradas']}")
+        print(f"Chunks gravados: {estado['upserts']} | removidos: {estado['removidos']}")
+        print(f"Salvo em: {self.vectorstore_path}")
+        
+        return vectorstore, len(ids_atuais)
+    
+    def _dados_vectorstore(self, vectorstore) -> Dict:
+        return vectorstore._collection.get(include=["embeddings", "documents", "metadatas"])
+    
+    def gerar_indice_numpy(self, vectorstore, dados: Optional[Dict] = None) -> Dict:
+        """Gera a matriz float32 normalizada + metadados (ver IndiceQuantizado) com todos os vetores do Chroma."""
+        dados = dados or self._dados_vectorstore(vectorstore)
+        with self.perfil.etapa('indice_numpy', itens=len(dados['ids'])):
+            config = IndiceQuantizado.construir(
+                self.indice_numpy_path, dados['ids'], dados['embeddings'],
+                dados['documents'], dados['metadatas'], tipo='float32',
+            )
+        print(f"Indice NumPy (float32): {config['bytes_vetores'] / (1024 * 1024):.2f} MB de vetores "
+              f"em {self.indice_numpy_path}")
+        return config
+    
+    def gerar_indice_quantizado(self, vectorstore, dados: Optional[Dict] = None) -> Dict:
+        """Gera o indice quantizado (ver IndiceQuantizado) com todos os vetores do Chroma."""
+        dados = dados or self._dados_vectorstore(vectorstore)
+        with self.perfil.etapa('quantizacao', itens=len(dados['ids'])):
+            config = IndiceQuantizado.construir(
+                self.indice_quantizado_path, dados['ids'], dados['embeddings'],
+                dados['documents'], dados['metadatas'],
+                tipo=self.quantizacao, dimensoes_pca=self.dimensoes_pca,
+            )
+        
+        float32_mb = config['total'] * config['dimensoes_originais'] * 4 / (1024 * 1024)
+        print(f"Indice quantizado ({config['tipo']}, PCA={config['dimensoes_pca'] or 'nao'}): "
+              f"{config['bytes_vetores'] / (1024 * 1024):.2f} MB de vetores "
+              f"(float32: {float32_mb:.2f} MB) em {self.indice_quantizado_path}")
+        return config
+    
+    def _iter_chunks_pendentes(self, monografias: Iterable[Dict], manifesto: ManifestoIngestao,
+                               estado: Dict) -> Iterator[Dict]:
+        """
+        Gera os chunks novos ou alterados de cada monografia, seguidos de um marcador
+        {'monografia': (id, hash, chunk_ids)} indicando que a monografia terminou.
+        """
+        ocorrencias = {}
+        for mono in monografias:
+            # ID estavel (mesma regra de _ids_monografias, calculada em fluxo)
+            n = ocorrencias.get(mono['codigo'], 0) + 1
+            ocorrencias[mono['codigo']] = n
+            id_mono = mono['codigo'] if n == 1 else f"{mono['codigo']}.{n}"
+            estado['ids_monos'].add(id_mono)
+            
+            hash_mono = hash_objeto(mono)
+            if manifesto.monografia_inalterada(id_mono, hash_mono):
+                estado['ids_atuais'].update(manifesto.chunks_da_monografia(id_mono))
+                estado['inalteradas'] += 1
+                continue
+            
+            estado['alteradas'] += 1
+            chunk_ids = []
+            for chunk in self._chunks_da_monografia(mono, id_mono):
+                chunk['hash'] = hash_objeto([chunk['content'], chunk['metadata']])
+                chunk_ids.append(chunk['id'])
+                estado['ids_atuais'].add(chunk['id'])
+                if manifesto.hash_chunk(chunk['id']) != chunk['hash']:
+                    yield chunk
+            yield {'monografia': (id_mono, hash_mono, chunk_ids)}
+    
+    def _iter_lotes_embeddings(self, itens: Iterable[Dict]) -> Iterator[Dict]:
+        """Agrupa os chunks em lotes de batch_size e calcula os embeddings de cada lote."""
+        lote, monografias = [], []
+        
+        def fechar():
+            vetores = self.embeddings.embed_documents([c['content'] for c in lote]) if lote else []
+            return {'chunks': list(lote), 'vetores': vetores, 'monografias': list(monografias)}
+        
+        for item in itens:
+            if 'monografia' in item:
+                monografias.append(item['monografia'])
+                continue
+            lote.append(item)
+            if len(lote) >= self.batch_size:
+                yield fechar()
+                lote.clear()
+                monografias.clear()
+        
+        if lote or monografias:
+            yield fechar()
+    
+    def _iter_backup(self, monografias: Iterable[Dict], backup_path: str) -> Iterator[Dict]:
+        """
+        Grava o backup JSON em fluxo (mesmo formato de json.dump com indent=2)
+        e repassa cada monografia adiante. O arquivo so substitui o anterior ao final.
+        """
         Path(backup_path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = backup_path + '.tmp'
+        total = 0
+        
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('[')
+            for mono in monografias:
+                f.write(',\n  ' if total else '\n  ')
+                f.write(json.dumps(mono, ensure_ascii=False, indent=2).replace('\n', '\n  '))
+                total += 1
+                yield mono
+            f.write('\n]' if total else ']')
+        
+        os.replace(tmp_path, backup_path)
+        print(f"\nBackup salvo: {backup_path} ({total} monografias)")
+    
+    def run(self, completo: bool = False, relatorio_path: Optional[str] = None,
+            perfil_etapa: Optional[str] = None):
+        """
+        Executa o pipeline de ingestao em fluxo:
+        paginas -> monografias -> chunks -> lotes de embeddings -> escrita no vectorstore.
+        Por padrao e incremental (ver ManifestoIngestao); com completo=True descarta
+        o estado anterior e reconstroi tudo.
+        Ao final grava o relatorio de desempenho por etapa (JSON) em relatorio_path;
+        com perfil_etapa, salva tambem um dump do cProfile daquela etapa.
+        """
+        self.perfil = PerfilIngestao(etapa_cprofile=perfil_etapa)
+        relatorio_path = relatorio_path or os.getenv("INGEST_REPORT_PATH", "data/ingest_report.json")
+        acertos_antes, falhas_antes = self.embeddings.acertos, self.embeddings.falhas
+        
+        manifesto = ManifestoIngestao(self.state_path)
+        
+        if completo or not manifesto.existe:
+            # Sem manifesto nao ha como saber quais chunks ja existem: reconstruir do zero
+            print("Reconstrucao completa do banco vetorial")
+            manifesto.limpar()
+            if os.path.exists(self.vectorstore_path):
+                Chroma(
+                    persist_directory=self.vectorstore_path,
+                    embedding_function=self.embeddings
+                ).delete_collection()
+        elif not manifesto.dados['concluido']:
+            print("Retomando ingestao interrompida")
+        
+        manifesto.marcar_concluido(False)
+        
+        # 1. Extrair monografias (gerador: nada e acumulado em memoria)
+        monografias = self.iter_monografias(manifesto)
+        
+        # 2. Enriquecer com metadados
+        monografias = self.perfil.medir(
+            'enriquecimento', (self._enriquecer_monografia(mono) for mono in monografias)
+        )
+        
+        # 3. Salvar backup JSON (em fluxo)
+        contagem = {'monografias': 0}
+        
+        def contar(monos):
+            for mono in monos:
+                contagem['monografias'] += 1
+                yield mono
+        
+        monografias = self.perfil.medir(
+            'backup_json', self._iter_backup(monografias, "data/monografias_backup.json")
+        )
+        
+        # 3b. Base SQLite usada pelos scripts de verificacao (conteudo sob demanda)
+        monografias = contar(self.perfil.medir('base_monografias', gravar_monografias(
+            monografias, os.getenv("MONOGRAFIAS_DB_PATH", BASE_MONOGRAFIAS_PADRAO)
+        )))
         
-        with open(backup_path, 'w', encoding='utf-8') as f:
-            json.dump(monografias, f, ensure_ascii=False, indent=2)
-        print(f"\nBackup salvo: {backup_path}")
+        # 4. Criar chunks e atualizar vectorstore (apenas o que mudou)
+        vectorstore, total_chunks = self.atualizar_vectorstore(monografias, manifesto)
         
-        # 4. Criar chunks
-        chunks = self.criar_chunks(monografias)
+        # 5. Indices em NumPy para a busca sem Chroma / com pouca memoria (opcionais)
+        if (self.indice_numpy or self.quantizacao) and total_chunks:
+            dados = self._dados_vectorstore(vectorstore)
+            if self.indice_numpy:
+                self.gerar_indice_numpy(vectorstore, dados)
+            if self.quantizacao:
+                self.gerar_indice_quantizado(vectorstore, dados)
         
-        # 5. Criar vectorstore
-        vectorstore = self.criar_vectorstore(chunks)
+        self.perfil.contar('monografias', contagem['monografias'])
+        self.perfil.contar('embeddings_cache', self.embeddings.acertos - acertos_antes)
+        self.perfil.contar('embeddings_calculados', self.embeddings.falhas - falhas_antes)
+        self.perfil.salvar(relatorio_path)
+        print(f"Relatorio de desempenho: {relatorio_path}")
+        
+        if not contagem['monografias']:
+            print("Nenhuma monografia encontrada!")
+            return None
+        
+        manifesto.marcar_concluido()
         
         print(f"\n{'='*60}")
         print("INGESTAO CONCLUIDA COM SUCESSO!")
-        print(f"Total de monografias: {len(monografias)}")
-        print(f"Total de chunks: {len(chunks)}")
+        print(f"Total de monografias: {contagem['monografias']}")
+        print(f"Total de chunks: {total_chunks}")
+        print(self.embeddings.resumo())
         print(f"{'='*60}")
         
         return vectorstore
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Ingestao da Farmacopeia Brasileira")
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("INGEST_WORKERS", 1)),
+        help="Processos para extracao paralela de paginas (padrao: 1, serial)"
+    )
+    parser.add_argument(
+        "--completo", action="store_true",
+        help="Ignora o manifesto e reconstroi o banco vetorial do zero"
+    )
+    parser.add_argument(
+        "--relatorio", default=os.getenv("INGEST_REPORT_PATH", "data/ingest_report.json"),
+        help="Arquivo JSON do relatorio de desempenho por etapa"
+    )
+    parser.add_argument(
+        "--perfil-etapa", choices=ETAPAS_INGESTAO,
+        help="Salva um dump do cProfile desta etapa ao lado do relatorio"
+    )
+    parser.add_argument(
+        "--quantizar", choices=TIPOS_QUANTIZACAO, default=os.getenv("INGEST_QUANTIZACAO") or None,
+        help="Gera tambem um indice com vetores int8 ou float16 (ver BUSCA_VETORIAL)"
+    )
+    parser.add_argument(
+        "--pca", type=int, default=int(os.getenv("INGEST_PCA_DIM", 0)) or None,
+        help="Dimensoes da projecao PCA aplicada antes de quantizar (padrao: sem PCA)"
+    )
+    parser.add_argument(
+        "--indice-numpy", action="store_true",
+        default=os.getenv("INGEST_INDICE_NUMPY", "").lower() in ("1", "true", "sim"),
+        help="Gera tambem a matriz float32 em mmap para BUSCA_VETORIAL=numpy"
+    )
+    parser.add_argument(
+        "--codificador", choices=BACKENDS_CODIFICADOR, default=os.getenv("ENCODER_BACKEND", "torch"),
+        help="Backend do modelo de embeddings: torch, int8 ou onnx (ver src/codificador.py)"
+    )
+    args = parser.parse_args()
+    
     pdf_paths_str = os.getenv("PDF_PATHS") or os.getenv("PDF_PATH", "")
     
     if not pdf_paths_str:
@@ -485,8 +1132,12 @@ def main():
     
     Path(vectorstore_path).parent.mkdir(parents=True, exist_ok=True)
     
-    ingestor = FarmacopeiaIngestor(pdf_paths, vectorstore_path)
-    ingestor.run()
+    ingestor = FarmacopeiaIngestor(
+        pdf_paths, vectorstore_path, workers=args.workers,
+        quantizacao=args.quantizar, dimensoes_pca=args.pca, indice_numpy=args.indice_numpy,
+        codificador=args.codificador
+    )
+    ingestor.run(completo=args.completo, relatorio_path=args.relatorio, perfil_etapa=args.perfil_etapa)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,41 @@
+"""
+Inicialização preguiçosa dos componentes pesados do assistente (modelo de embeddings,
+índice vetorial, cliente do LLM...). Cada componente é criado no primeiro acesso,
+uma única vez mesmo com várias threads, e o tempo de criação fica registrado.
+"""
+
+import time
+from typing import Any, Callable
+
+
+class ComponentePreguicoso:
+    """
+    Atributo de classe criado no primeiro acesso por um método fábrica da instância.
+    Depois de criado, o valor fica no __dict__ da instância e o acesso é direto
+    (atribuir ao atributo também substitui o componente, como em testes).
+    A instância precisa de `_lock_inicializacao` (RLock) e `tempos_inicializacao` (dict).
+    """
+
+    def __init__(self, fabrica: Callable[[Any], Any]):
+        self.fabrica = fabrica
+        self.nome = fabrica.__name__
+
+    def __set_name__(self, dono, nome: str):
+        self.nome = nome
+
+    def __get__(self, obj, tipo=None):
+        if obj is None:
+            return self
+        with obj._lock_inicializacao:
+            if self.nome not in obj.__dict__:
+                inicio = time.perf_counter()
+                antes = sum(obj.tempos_inicializacao.values())
+                valor = self.fabrica(obj)
+                # Tempo exclusivo: componentes criados dentro desta fábrica contam à parte
+                aninhados = sum(obj.tempos_inicializacao.values()) - antes
+                obj.tempos_inicializacao[self.nome] = time.perf_counter() - inicio - aninhados
+                obj.__dict__[self.nome] = valor
+        return obj.__dict__[self.nome]
+
+    def carregado(self, obj) -> bool:
+        return self.nome in obj.__dict__
@@ -0,0 +1,112 @@
+"""
+Leitura incremental do JSON gerado pelo LLM em streaming.
+O texto chega em pedaços; cada valor (string, número, objeto ou lista) é entregue
+assim que termina, com o caminho até ele: ('formula', 'nome_sugerido'),
+('formula', 'insumos', 0), ('alertas_seguranca', 1)... Cercas de markdown e texto
+antes do primeiro '{' são ignorados, assim como o que vier depois do objeto raiz.
+"""
+
+import json
+from typing import Any, List, Tuple, Union
+
+Caminho = Tuple[Union[str, int], ...]
+
+
+class _Nivel:
+    """Objeto ou lista aberto: chave/posição atual e onde o valor começou no texto."""
+
+    __slots__ = ('tipo', 'inicio', 'caminho', 'chave', 'indice', 'esperando_chave')
+
+    def __init__(self, tipo: str, inicio: int, caminho: Caminho):
+        self.tipo = tipo
+        self.inicio = inicio
+        self.caminho = caminho
+        self.chave = None
+        self.indice = 0
+        self.esperando_chave = tipo == 'objeto'
+
+    def posicao(self):
+        return self.chave if self.tipo == 'objeto' else self.indice
+
+
+class ParserJSONIncremental:
+    """Alimente com alimentar(pedaço); cada chamada retorna os valores completados nele."""
+
+    def __init__(self):
+        self.texto = ""
+        self._pos = 0
+        self._pilha: List[_Nivel] = []
+        self._inicio_string = None
+        self._string_e_chave = False
+        self._escape = False
+        self._inicio_escalar = None
+        self.terminado = False
+
+    def _caminho_valor(self) -> Caminho:
+        topo = self._pilha[-1]
+        return topo.caminho + (topo.posicao(),)
+
+    def _valor(self, inicio: int, fim: int, caminho: Caminho, completos: List) -> None:
+        try:
+            completos.append((caminho, json.loads(self.texto[inicio:fim])))
+        except json.JSONDecodeError:
+            # Valor malformado: o JSON completo será reinterpretado no final
+            pass
+
+    def alimentar(self, pedaco: str) -> List[Tuple[Caminho, Any]]:
+        completos: List[Tuple[Caminho, Any]] = []
+        self.texto += pedaco
+        texto = self.texto
+        while self._pos < len(texto) and not self.terminado:
+            p = self._pos
+            c = texto[p]
+            self._pos += 1
+
+            if self._inicio_string is not None:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    inicio, self._inicio_string = self._inicio_string, None
+                    topo = self._pilha[-1]
+                    if self._string_e_chave:
+                        topo.chave = json.loads(texto[inicio:p + 1])
+                        topo.esperando_chave = False
+                    else:
+                        self._valor(inicio, p + 1, self._caminho_valor(), completos)
+                continue
+
+            if self._inicio_escalar is not None:
+                if c not in ',]} \t\r\n':
+                    continue
+                inicio, self._inicio_escalar = self._inicio_escalar, None
+                self._valor(inicio, p, self._caminho_valor(), completos)
+
+            if not self._pilha:
+                # Antes do objeto raiz (```json, texto solto)
+                if c == '{':
+                    self._pilha.append(_Nivel('objeto', p, ()))
+                continue
+
+            if c in '{[':
+                self._pilha.append(_Nivel('objeto' if c == '{' else 'lista', p, self._caminho_valor()))
+            elif c in '}]':
+                nivel = self._pilha.pop()
+                self._valor(nivel.inicio, p + 1, nivel.caminho, completos)
+                if not self._pilha:
+                    self.terminado = True
+            elif c == '"':
+                self._inicio_string = p
+                topo = self._pilha[-1]
+                self._string_e_chave = topo.tipo == 'objeto' and topo.esperando_chave
+            elif c == ',':
+                topo = self._pilha[-1]
+                if topo.tipo == 'objeto':
+                    topo.chave = None
+                    topo.esperando_chave = True
+                else:
+                    topo.indice += 1
+            elif c in '-0123456789tfn':
+                self._inicio_escalar = p
+        return completos
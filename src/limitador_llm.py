@@ -0,0 +1,158 @@
+"""
+Limite de taxa das chamadas ao LLM, compartilhado pelo processo inteiro.
+Dois baldes de fichas por provider: chamadas por segundo e tokens por minuto.
+Quem passa do limite não recebe erro, entra na fila: cada chamada reserva as suas
+fichas na hora (o saldo pode ficar negativo) e espera até o balde repor a dívida.
+Assim a ordem de chegada é respeitada sem condição nem thread extra, e o mesmo
+balde serve às chamadas síncronas e às assíncronas.
+"""
+
+import time
+import asyncio
+import threading
+from typing import Dict, Optional
+
+
+class BaldeFichas:
+    """Balde com `capacidade` fichas, repostas a `taxa` fichas por segundo."""
+
+    def __init__(self, taxa: float, capacidade: float):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.saldo = capacidade
+        self._atualizado = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _repor(self) -> None:
+        agora = time.monotonic()
+        self.saldo = min(self.capacidade, self.saldo + (agora - self._atualizado) * self.taxa)
+        self._atualizado = agora
+
+    def reservar(self, fichas: float) -> float:
+        """Debita as fichas e retorna quantos segundos esperar até elas existirem."""
+        # Pedido maior que o balde nunca caberia: limitado à capacidade
+        fichas = min(fichas, self.capacidade)
+        with self._lock:
+            self._repor()
+            self.saldo -= fichas
+            return max(0.0, -self.saldo / self.taxa)
+
+    def ajustar(self, fichas: float) -> None:
+        """Corrige uma reserva (positivo debita mais, negativo devolve)."""
+        with self._lock:
+            self._repor()
+            self.saldo = min(self.capacidade, self.saldo - fichas)
+
+
+class LimitadorLLM:
+    """
+    Chamadas por segundo e tokens por minuto de um provider (0 = sem aquele limite).
+    Os tokens de cada chamada são estimados antes (entrada + resposta esperada) e
+    corrigidos com o uso real informado pelo provider.
+    """
+
+    def __init__(self, chamadas_por_s: float = 0, tokens_por_min: float = 0):
+        self.chamadas_por_s = chamadas_por_s
+        self.tokens_por_min = tokens_por_min
+        self.balde_chamadas = (
+            BaldeFichas(chamadas_por_s, max(1.0, chamadas_por_s)) if chamadas_por_s > 0 else None
+        )
+        self.balde_tokens = BaldeFichas(tokens_por_min / 60, tokens_por_min) if tokens_por_min > 0 else None
+        self.chamadas = 0
+        self.enfileiradas = 0
+        self.em_espera = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self.tokens = 0
+        self.devolvidas = 0
+        self._lock = threading.Lock()
+
+    @property
+    def ativo(self) -> bool:
+        return self.balde_chamadas is not None or self.balde_tokens is not None
+
+    def _reservar(self, tokens: int) -> float:
+        espera = 0.0
+        if self.balde_chamadas is not None:
+            espera = self.balde_chamadas.reservar(1)
+        if self.balde_tokens is not None:
+            espera = max(espera, self.balde_tokens.reservar(tokens))
+        with self._lock:
+            self.chamadas += 1
+            self.tokens += tokens
+            if espera > 0:
+                self.enfileiradas += 1
+                self.em_espera += 1
+                self.espera_total += espera
+                self.espera_max = max(self.espera_max, espera)
+        return espera
+
+    def _liberar(self) -> None:
+        with self._lock:
+            self.em_espera -= 1
+
+    def adquirir(self, tokens: int) -> float:
+        """Bloqueia até a chamada caber nos limites; retorna a espera em segundos."""
+        espera = self._reservar(tokens)
+        if espera > 0:
+            try:
+                time.sleep(espera)
+            finally:
+                self._liberar()
+        return espera
+
+    async def aadquirir(self, tokens: int) -> float:
+        espera = self._reservar(tokens)
+        if espera > 0:
+            try:
+                await asyncio.sleep(espera)
+            finally:
+                self._liberar()
+        return espera
+
+    def devolver(self, tokens: int) -> None:
+        """Desfaz a reserva de uma chamada que não chegou a ser feita (perdeu o hedge na fila)."""
+        if self.balde_chamadas is not None:
+            self.balde_chamadas.ajustar(-1)
+        if self.balde_tokens is not None:
+            self.balde_tokens.ajustar(-tokens)
+        with self._lock:
+            self.chamadas -= 1
+            self.tokens -= tokens
+            self.devolvidas += 1
+
+    def corrigir(self, estimados: int, reais: Optional[int]) -> None:
+        """Acerta o balde de tokens com o uso real da chamada (quando o provider informa)."""
+        if reais is None or reais == estimados:
+            return
+        if self.balde_tokens is not None:
+            self.balde_tokens.ajustar(reais - estimados)
+        with self._lock:
+            self.tokens += reais - estimados
+
+    def estatisticas(self) -> Dict:
+        with self._lock:
+            return {
+                'chamadas_por_s': self.chamadas_por_s,
+                'tokens_por_min': self.tokens_por_min,
+                'chamadas': self.chamadas,
+                'enfileiradas': self.enfileiradas,
+                'em_espera': self.em_espera,
+                'espera_total_s': round(self.espera_total, 3),
+                'espera_max_s': round(self.espera_max, 3),
+                'tokens': self.tokens,
+                'devolvidas': self.devolvidas,
+            }
+
+
+# Um limitador por provider para o processo todo (todas as instâncias e threads)
+_limitadores: Dict[str, LimitadorLLM] = {}
+_lock_limitadores = threading.Lock()
+
+
+def limitador_do_provider(nome: str, chamadas_por_s: float = 0, tokens_por_min: float = 0) -> LimitadorLLM:
+    """Limitador compartilhado do provider; os limites valem na primeira criação."""
+    with _lock_limitadores:
+        if nome not in _limitadores:
+            _limitadores[nome] = LimitadorLLM(chamadas_por_s, tokens_por_min)
+        return _limitadores[nome]
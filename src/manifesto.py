@@ -0,0 +1,120 @@
+"""
+Manifesto da ingestao incremental.
+Guarda os hashes de PDFs, paginas, monografias e chunks da ultima execucao
+para que uma nova ingestao reprocesse apenas o que mudou.
+"""
+
+import os
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+def _salvar_json_atomico(caminho: Path, dados) -> None:
+    """Grava o JSON em arquivo temporario e troca de uma vez (seguro contra crash)."""
+    tmp = caminho.with_suffix(caminho.suffix + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False)
+    os.replace(tmp, caminho)
+
+
+class ManifestoIngestao:
+    """Estado persistido da ingestao: hashes de PDFs, paginas, monografias e chunks."""
+
+    VERSAO = 1
+
+    def __init__(self, diretorio: str):
+        self.diretorio = Path(diretorio)
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self.caminho = self.diretorio / "manifesto.json"
+
+        self.dados = self._vazio()
+        if self.caminho.exists():
+            with open(self.caminho, 'r', encoding='utf-8') as f:
+                dados = json.load(f)
+            if dados.get('versao') == self.VERSAO:
+                self.dados = dados
+
+        # O pipeline em fluxo registra paginas e chunks a partir de threads diferentes
+        self._lock = threading.RLock()
+
+    def _vazio(self) -> Dict:
+        return {
+            'versao': self.VERSAO,
+            'pdfs': {},          # nome -> {hash, monografias, paginas: [hash_pagina]}
+            'monografias': {},   # id -> {hash, chunks: [chunk_id]}
+            'chunks': {},        # chunk_id -> hash
+            'concluido': False,
+        }
+
+    @property
+    def existe(self) -> bool:
+        return self.caminho.exists()
+
+    def limpar(self) -> None:
+        """Descarta todo o estado (forca reconstrucao completa)."""
+        with self._lock:
+            self.dados = self._vazio()
+            self.salvar()
+
+    # === PDFs e paginas ===
+
+    def pdf(self, nome: str) -> Optional[Dict]:
+        return self.dados['pdfs'].get(nome)
+
+    def registrar_pdf(self, nome: str, hash_pdf: str, monografias: bool,
+                      paginas: Optional[List[str]] = None) -> None:
+        with self._lock:
+            self.dados['pdfs'][nome] = {
+                'hash': hash_pdf,
+                'monografias': monografias,
+                'paginas': paginas or [],
+            }
+
+    # === Monografias e chunks ===
+
+    def monografia_inalterada(self, id_mono: str, hash_mono: str) -> bool:
+        """A monografia tem o mesmo hash e todos os seus chunks foram gravados."""
+        registro = self.dados['monografias'].get(id_mono)
+        if not registro or registro['hash'] != hash_mono:
+            return False
+        return all(c in self.dados['chunks'] for c in registro['chunks'])
+
+    def chunks_da_monografia(self, id_mono: str) -> List[str]:
+        registro = self.dados['monografias'].get(id_mono)
+        return list(registro['chunks']) if registro else []
+
+    def registrar_monografia(self, id_mono: str, hash_mono: str, chunk_ids: List[str]) -> None:
+        with self._lock:
+            self.dados['monografias'][id_mono] = {'hash': hash_mono, 'chunks': chunk_ids}
+
+    def remover_monografia(self, id_mono: str) -> None:
+        with self._lock:
+            self.dados['monografias'].pop(id_mono, None)
+
+    def hash_chunk(self, chunk_id: str) -> Optional[str]:
+        return self.dados['chunks'].get(chunk_id)
+
+    def registrar_chunks(self, hashes: Dict[str, str]) -> None:
+        with self._lock:
+            self.dados['chunks'].update(hashes)
+
+    def remover_chunks(self, chunk_ids: List[str]) -> None:
+        with self._lock:
+            for chunk_id in chunk_ids:
+                self.dados['chunks'].pop(chunk_id, None)
+
+    def todos_chunks(self) -> List[str]:
+        return list(self.dados['chunks'])
+
+    # === Persistencia ===
+
+    def marcar_concluido(self, concluido: bool = True) -> None:
+        with self._lock:
+            self.dados['concluido'] = concluido
+            self.salvar()
+
+    def salvar(self) -> None:
+        with self._lock:
+            _salvar_json_atomico(self.caminho, self.dados)
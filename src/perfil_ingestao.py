@@ -0,0 +1,185 @@
+"""
+Perfil de desempenho da ingestao.
+Mede, por etapa do pipeline (extracao de paginas, parsing, enriquecimento, chunking,
+embeddings, escrita no Chroma), o tempo de parede, o tempo de CPU, itens/s e o pico
+de RSS, e grava um relatorio JSON. Opcionalmente salva um dump do cProfile de uma etapa.
+"""
+
+import os
+import sys
+import json
+import time
+import cProfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def rss_atual_mb() -> Optional[float]:
+    """RSS atual do processo em MB (Linux via /proc; senao o pico do getrusage)."""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return pico_rss_mb()
+
+
+def pico_rss_mb() -> Optional[float]:
+    """Pico de RSS do processo em MB (None se indisponivel na plataforma)."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss e em KB no Linux e em bytes no macOS
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+
+class PerfilIngestao:
+    """
+    Acumula as medicoes das etapas. O tempo e exclusivo: quando uma etapa puxa
+    itens de outra etapa medida na mesma thread, esse tempo conta para a de cima.
+    Cada thread (etapa assincrona) tem sua propria pilha de etapas.
+    """
+
+    def __init__(self, etapa_cprofile: Optional[str] = None):
+        self.etapas: Dict[str, Dict[str, Any]] = {}
+        self.contadores: Dict[str, int] = {}
+        self.etapa_cprofile = etapa_cprofile
+        self.cprofile = cProfile.Profile() if etapa_cprofile else None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._inicio = time.perf_counter()
+        self._inicio_cpu = time.process_time()
+
+    def _pilha(self) -> List[list]:
+        if not hasattr(self._local, 'pilha'):
+            self._local.pilha = []
+        return self._local.pilha
+
+    def _etapa(self, nome: str) -> Dict[str, Any]:
+        if nome not in self.etapas:
+            self.etapas[nome] = {'itens': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'pico_rss_mb': None}
+        return self.etapas[nome]
+
+    def _acumular(self, quadro: list, agora: float, cpu: float) -> None:
+        nome, inicio, inicio_cpu = quadro
+        with self._lock:
+            etapa = self._etapa(nome)
+            etapa['wall_s'] += agora - inicio
+            etapa['cpu_s'] += cpu - inicio_cpu
+
+    def _atualizar_cprofile(self, pilha: List[list]) -> None:
+        # O cProfile so fica ligado enquanto a etapa escolhida esta no topo da pilha
+        if self.cprofile is None:
+            return
+        # (liga/desliga sempre na thread que executa a etapa)
+        ativo = bool(pilha) and pilha[-1][0] == self.etapa_cprofile
+        if ativo != getattr(self._local, 'cprofile_ativo', False):
+            if ativo:
+                self.cprofile.enable()
+            else:
+                self.cprofile.disable()
+            self._local.cprofile_ativo = ativo
+
+    def _entrar(self, nome: str) -> None:
+        agora, cpu = time.perf_counter(), time.thread_time()
+        pilha = self._pilha()
+        if pilha:
+            self._acumular(pilha[-1], agora, cpu)
+        pilha.append([nome, agora, cpu])
+        self._atualizar_cprofile(pilha)
+
+    def _sair(self, itens: int = 0) -> None:
+        agora, cpu = time.perf_counter(), time.thread_time()
+        pilha = self._pilha()
+        quadro = pilha.pop()
+        self._acumular(quadro, agora, cpu)
+        rss = rss_atual_mb()
+        with self._lock:
+            etapa = self._etapa(quadro[0])
+            etapa['itens'] += itens
+            if rss is not None and (etapa['pico_rss_mb'] is None or rss > etapa['pico_rss_mb']):
+                etapa['pico_rss_mb'] = rss
+        if pilha:
+            pilha[-1][1], pilha[-1][2] = agora, cpu
+        self._atualizar_cprofile(pilha)
+
+    def medir(self, nome: str, iteravel: Iterable,
+              contar: Optional[Callable[[Any], int]] = None) -> Iterator:
+        """Repassa os itens do iteravel, medindo o tempo gasto para produzir cada um."""
+        iterador = iter(iteravel)
+        while True:
+            self._entrar(nome)
+            try:
+                item = next(iterador)
+            except StopIteration:
+                self._sair()
+                return
+            except BaseException:
+                self._sair()
+                raise
+            self._sair(contar(item) if contar else 1)
+            yield item
+
+    @contextmanager
+    def etapa(self, nome: str, itens: int = 0):
+        """Mede um bloco de codigo como parte da etapa."""
+        self._entrar(nome)
+        try:
+            yield
+        finally:
+            self._sair(itens)
+
+    def contar(self, chave: str, quantidade: int = 1) -> None:
+        with self._lock:
+            self.contadores[chave] = self.contadores.get(chave, 0) + quantidade
+
+    def relatorio(self) -> Dict[str, Any]:
+        etapas = {}
+        for nome, etapa in self.etapas.items():
+            etapas[nome] = {
+                'itens': etapa['itens'],
+                'wall_s': round(etapa['wall_s'], 3),
+                'cpu_s': round(etapa['cpu_s'], 3),
+                'itens_por_s': round(etapa['itens'] / etapa['wall_s'], 1) if etapa['wall_s'] > 0 else None,
+                'pico_rss_mb': round(etapa['pico_rss_mb'], 1) if etapa['pico_rss_mb'] is not None else None,
+            }
+
+        filhos_cpu = None
+        if resource is not None:
+            filhos = resource.getrusage(resource.RUSAGE_CHILDREN)
+            filhos_cpu = round(filhos.ru_utime + filhos.ru_stime, 3)
+
+        pico = pico_rss_mb()
+        return {
+            'gerado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'wall_total_s': round(time.perf_counter() - self._inicio, 3),
+            'cpu_total_s': round(time.process_time() - self._inicio_cpu, 3),
+            # Extracao paralela: a CPU dos processos do pool aparece aqui, nao na etapa
+            'cpu_processos_filhos_s': filhos_cpu,
+            'pico_rss_processo_mb': round(pico, 1) if pico is not None else None,
+            'contadores': dict(self.contadores),
+            'etapas': etapas,
+        }
+
+    def salvar(self, caminho: str) -> Dict[str, Any]:
+        """Grava o relatorio JSON (e o dump do cProfile, se pedido) e o retorna."""
+        relatorio = self.relatorio()
+        Path(caminho).parent.mkdir(parents=True, exist_ok=True)
+
+        if self.cprofile is not None:
+            if getattr(self._local, 'cprofile_ativo', False):
+                self.cprofile.disable()
+                self._local.cprofile_ativo = False
+            dump = str(Path(caminho).with_name(f"ingest_{self.etapa_cprofile}.prof"))
+            self.cprofile.dump_stats(dump)
+            relatorio['cprofile'] = {'etapa': self.etapa_cprofile, 'arquivo': dump}
+
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+        return relatorio
@@ -0,0 +1,386 @@
+"""
+Pool de providers de LLM (Gemini e Groq) atrás de uma única interface Runnable.
+- Hedge: se o provider principal passa do seu p95 de latência, a mesma requisição
+  vai também para o próximo; vale a primeira resposta e a outra é cancelada
+  (no caminho assíncrono a task é cancelada; no síncrono a chamada já em curso
+  termina sozinha e o resultado é descartado, e a que ainda esperava na fila do
+  limitador desiste e devolve a reserva). No caminho síncrono, no máximo
+  `max_hedges` hedges ocupam threads ao mesmo tempo; sem vaga, espera-se o principal.
+- Failover: erro em um provider passa a requisição ao próximo na hora; erros
+  transitórios (429, 5xx, timeout) deixam o provider de lado por um tempo e, se
+  todos falharem, a rodada se repete após um backoff exponencial com jitter.
+- Limite de taxa: cada provider pode ter um LimitadorLLM (chamadas/s e tokens/min,
+  compartilhado pelo processo); acima do limite a chamada espera na fila em vez de falhar.
+- Estatísticas por provider: latência (p50/p95), chamadas, erros, vitórias e hedges.
+"""
+
+import re
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.runnables import Runnable
+
+from limitador_llm import LimitadorLLM
+
+# Mensagens de erros que valem nova tentativa (limite de taxa, sobrecarga, rede)
+_TRANSITORIO = re.compile(
+    r"\b(429|500|502|503|504)\b|rate.?limit|quota|resource.?exhausted|overloaded|"
+    r"unavailable|timed? ?out|timeout|connection", re.IGNORECASE
+)
+
+
+def codigo_http(erro: Exception) -> Optional[int]:
+    """Status HTTP do erro do SDK (Groq: status_code; Google: code), se houver."""
+    for origem in (erro, getattr(erro, 'response', None), getattr(erro, '__cause__', None)):
+        for atributo in ('status_code', 'code'):
+            valor = getattr(origem, atributo, None)
+            if isinstance(valor, int):
+                return valor
+    return None
+
+
+def erro_transitorio(erro: Exception) -> bool:
+    """429, 5xx, timeouts e falhas de conexão: vale tentar de novo (ou em outro provider)."""
+    if isinstance(erro, (TimeoutError, ConnectionError)):
+        return True
+    codigo = codigo_http(erro)
+    if codigo is not None:
+        return codigo == 429 or 500 <= codigo < 600
+    return bool(_TRANSITORIO.search(str(erro)))
+
+
+class ProvedorLLM:
+    """Um cliente de LLM com as suas estatísticas de uso."""
+
+    # Latências guardadas para o p95 e mínimo de amostras para confiar nele
+    JANELA = 200
+    MINIMO_AMOSTRAS = 10
+
+    def __init__(self, nome: str, modelo: str, cliente: Runnable, limitador: Optional[LimitadorLLM] = None):
+        self.nome = nome
+        self.modelo = modelo
+        self.cliente = cliente
+        self.limitador = limitador
+        self.latencias = deque(maxlen=self.JANELA)
+        self.chamadas = 0
+        self.erros = 0
+        self.erros_transitorios = 0
+        self.vitorias = 0
+        self.hedges = 0
+        self.canceladas = 0
+        self.indisponivel_ate = 0.0
+        self._lock = threading.Lock()
+
+    def percentil(self, p: float) -> Optional[float]:
+        with self._lock:
+            if len(self.latencias) < self.MINIMO_AMOSTRAS:
+                return None
+            return float(np.percentile(self.latencias, p))
+
+    def registrar(self, latencia: Optional[float] = None, erro: Optional[Exception] = None,
+                  pausa: float = 0.0) -> None:
+        with self._lock:
+            self.chamadas += 1
+            if erro is None:
+                self.latencias.append(latencia)
+                self.indisponivel_ate = 0.0
+            else:
+                self.erros += 1
+                if erro_transitorio(erro):
+                    self.erros_transitorios += 1
+                    self.indisponivel_ate = time.monotonic() + pausa
+
+    def contar(self, campo: str) -> None:
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def estatisticas(self) -> Dict:
+        p50, p95 = self.percentil(50), self.percentil(95)
+        limite = self.limitador.estatisticas() if self.limitador is not None and self.limitador.ativo else None
+        with self._lock:
+            return {
+                'modelo': self.modelo,
+                'chamadas': self.chamadas,
+                'erros': self.erros,
+                'erros_transitorios': self.erros_transitorios,
+                'vitorias': self.vitorias,
+                'hedges': self.hedges,
+                'canceladas': self.canceladas,
+                'latencia_p50_s': round(p50, 3) if p50 is not None else None,
+                'latencia_p95_s': round(p95, 3) if p95 is not None else None,
+                'disponivel': self.indisponivel_ate <= time.monotonic(),
+                'limite': limite,
+            }
+
+
+class PoolProvedores(Runnable):
+    """
+    Runnable com a mesma interface dos clientes (invoke, ainvoke, stream, batch...).
+    A ordem da lista é a preferência: o primeiro é o principal. contar_tokens estima
+    os tokens da entrada para o limite de tokens/min (sem ele, 4 caracteres por token).
+    """
+
+    # Tokens de resposta reservados antes da chamada (corrigidos pelo uso real depois)
+    TOKENS_RESPOSTA = 500
+
+    def __init__(self, provedores: List[ProvedorLLM], hedge: bool = True, atraso_hedge: float = 4.0,
+                 atraso_minimo: float = 1.0, tentativas: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 8.0, workers: int = 16, max_hedges: Optional[int] = None,
+                 contar_tokens: Optional[Callable[[str], int]] = None):
+        if not provedores:
+            raise ValueError("PoolProvedores precisa de pelo menos um provider")
+        self.provedores = provedores
+        self.hedge = hedge
+        self.atraso_hedge = atraso_hedge
+        self.atraso_minimo = atraso_minimo
+        self.tentativas = max(1, tentativas)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.contar_tokens = contar_tokens or (lambda texto: len(texto) // 4)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pool_llm")
+        # Hedges perdedores seguram a thread até o provider responder: metade das threads no máximo
+        self._vagas_hedge = threading.BoundedSemaphore(max_hedges or max(1, workers // 2))
+
+    @property
+    def principal(self) -> ProvedorLLM:
+        return self.provedores[0]
+
+    def _ordem(self) -> List[ProvedorLLM]:
+        """Providers disponíveis primeiro (na ordem de preferência), os em pausa por último."""
+        agora = time.monotonic()
+        return sorted(self.provedores, key=lambda p: p.indisponivel_ate > agora)
+
+    def _atraso(self, provedor: ProvedorLLM) -> Optional[float]:
+        """Quanto esperar o provider antes de disparar o hedge (p95 dele, ou o padrão)."""
+        if not self.hedge:
+            return None
+        p95 = provedor.percentil(95)
+        return max(self.atraso_minimo, p95 if p95 is not None else self.atraso_hedge)
+
+    def _espera(self, tentativa: int) -> float:
+        """Backoff exponencial com jitter completo."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** tentativa))
+
+    def _pausa(self) -> float:
+        """Tempo que um provider fica de lado após um erro transitório."""
+        return random.uniform(self.backoff_max / 2, self.backoff_max)
+
+    def _estimar_tokens(self, input: Any) -> int:
+        """Tokens da entrada (texto, PromptValue ou lista de mensagens) mais a resposta esperada."""
+        if hasattr(input, 'to_messages'):
+            input = input.to_messages()
+        if isinstance(input, str):
+            texto = input
+        else:
+            texto = "\n".join(str(getattr(m, 'content', m)) for m in input)
+        return self.contar_tokens(texto) + self.TOKENS_RESPOSTA
+
+    @staticmethod
+    def _tokens_usados(resposta: Any) -> Optional[int]:
+        uso = getattr(resposta, 'usage_metadata', None)
+        return uso.get('total_tokens') if uso else None
+
+    def _limitar(self, provedor: ProvedorLLM, input: Any) -> Optional[int]:
+        """Espera a vez no limitador do provider; retorna os tokens reservados."""
+        if provedor.limitador is None or not provedor.limitador.ativo:
+            return None
+        tokens = self._estimar_tokens(input)
+        provedor.limitador.adquirir(tokens)
+        return tokens
+
+    async def _alimitar(self, provedor: ProvedorLLM, input: Any) -> Optional[int]:
+        if provedor.limitador is None or not provedor.limitador.ativo:
+            return None
+        tokens = self._estimar_tokens(input)
+        try:
+            await provedor.limitador.aadquirir(tokens)
+        except asyncio.CancelledError:
+            # Hedge perdido ainda na fila: a chamada não acontece
+            provedor.limitador.devolver(tokens)
+            raise
+        return tokens
+
+    @staticmethod
+    def _corrigir(provedor: ProvedorLLM, reservados: Optional[int], usados: Optional[int]) -> None:
+        """Acerta a reserva com o uso real (0 quando a chamada falhou)."""
+        if reservados is not None:
+            provedor.limitador.corrigir(reservados, usados)
+
+    def _chamar(self, provedor: ProvedorLLM, input: Any, config, kwargs,
+                cancelado: Optional[threading.Event] = None) -> Any:
+        reservados = self._limitar(provedor, input)
+        if cancelado is not None and cancelado.is_set():
+            # Outro provider respondeu enquanto esta esperava na fila do limitador
+            if reservados is not None:
+                provedor.limitador.devolver(reservados)
+            raise CancelledError()
+        # A latência não inclui a espera na fila do limitador
+        inicio = time.perf_counter()
+        try:
+            resposta = provedor.cliente.invoke(input, config, **kwargs)
+        except Exception as e:
+            provedor.registrar(erro=e, pausa=self._pausa())
+            self._corrigir(provedor, reservados, 0)
+            raise
+        provedor.registrar(latencia=time.perf_counter() - inicio)
+        self._corrigir(provedor, reservados, self._tokens_usados(resposta))
+        return resposta
+
+    async def _achamar(self, provedor: ProvedorLLM, input: Any, config, kwargs) -> Any:
+        reservados = await self._alimitar(provedor, input)
+        inicio = time.perf_counter()
+        try:
+            resposta = await provedor.cliente.ainvoke(input, config, **kwargs)
+        except Exception as e:
+            provedor.registrar(erro=e, pausa=self._pausa())
+            self._corrigir(provedor, reservados, 0)
+            raise
+        provedor.registrar(latencia=time.perf_counter() - inicio)
+        self._corrigir(provedor, reservados, self._tokens_usados(resposta))
+        return resposta
+
+    def _rodada(self, input: Any, config, kwargs) -> Any:
+        """Uma passada pelos providers: principal, hedge após o p95 e failover em erro."""
+        fila = self._ordem()
+        pendentes = {}
+        erros = []
+        cancelado = threading.Event()
+        sem_vaga = False
+
+        def disparar(hedge: bool = False):
+            provedor = fila.pop(0)
+            if hedge:
+                provedor.contar('hedges')
+            futuro = self._executor.submit(self._chamar, provedor, input, config, kwargs, cancelado)
+            if hedge:
+                futuro.add_done_callback(lambda _: self._vagas_hedge.release())
+            pendentes[futuro] = provedor
+
+        disparar()
+        while pendentes:
+            ultimo = list(pendentes.values())[-1]
+            prazo = self._atraso(ultimo) if fila and not sem_vaga else None
+            prontos, _ = wait(pendentes, timeout=prazo, return_when=FIRST_COMPLETED)
+            if not prontos:
+                if self._vagas_hedge.acquire(blocking=False):
+                    disparar(hedge=True)
+                else:
+                    sem_vaga = True
+                continue
+            for futuro in prontos:
+                provedor = pendentes.pop(futuro)
+                try:
+                    resposta = futuro.result()
+                except Exception as e:
+                    erros.append(e)
+                    if fila and not pendentes:
+                        disparar()
+                    continue
+                provedor.contar('vitorias')
+                cancelado.set()
+                for outro, perdedor in pendentes.items():
+                    outro.cancel()
+                    perdedor.contar('canceladas')
+                return resposta
+        raise erros[-1]
+
+    async def _arodada(self, input: Any, config, kwargs) -> Any:
+        fila = self._ordem()
+        pendentes = {}
+        erros = []
+
+        def disparar(hedge: bool = False):
+            provedor = fila.pop(0)
+            if hedge:
+                provedor.contar('hedges')
+            pendentes[asyncio.ensure_future(self._achamar(provedor, input, config, kwargs))] = provedor
+
+        disparar()
+        while pendentes:
+            ultimo = list(pendentes.values())[-1]
+            prazo = self._atraso(ultimo) if fila else None
+            prontos, _ = await asyncio.wait(pendentes, timeout=prazo, return_when=asyncio.FIRST_COMPLETED)
+            if not prontos:
+                disparar(hedge=True)
+                continue
+            for tarefa in prontos:
+                provedor = pendentes.pop(tarefa)
+                try:
+                    resposta = tarefa.result()
+                except Exception as e:
+                    erros.append(e)
+                    if fila and not pendentes:
+                        disparar()
+                    continue
+                provedor.contar('vitorias')
+                for outra, perdedor in pendentes.items():
+                    outra.cancel()
+                    perdedor.contar('canceladas')
+                return resposta
+        raise erros[-1]
+
+    def invoke(self, input: Any, config=None, **kwargs) -> Any:
+        for tentativa in range(self.tentativas):
+            try:
+                return self._rodada(input, config, kwargs)
+            except Exception as e:
+                if not erro_transitorio(e) or tentativa == self.tentativas - 1:
+                    raise
+                espera = self._espera(tentativa)
+                print(f"⚠️ LLM indisponível ({str(e)[:60]}); nova tentativa em {espera:.1f}s")
+                time.sleep(espera)
+
+    async def ainvoke(self, input: Any, config=None, **kwargs) -> Any:
+        for tentativa in range(self.tentativas):
+            try:
+                return await self._arodada(input, config, kwargs)
+            except Exception as e:
+                if not erro_transitorio(e) or tentativa == self.tentativas - 1:
+                    raise
+                espera = self._espera(tentativa)
+                print(f"⚠️ LLM indisponível ({str(e)[:60]}); nova tentativa em {espera:.1f}s")
+                await asyncio.sleep(espera)
+
+    def stream(self, input: Any, config=None, **kwargs) -> Iterator:
+        """
+        Streaming sem hedge (os pedaços já vão para a interface): failover e backoff só
+        enquanto nada foi entregue; depois do primeiro pedaço, um erro é repassado.
+        """
+        for tentativa in range(self.tentativas):
+            erro = None
+            for provedor in self._ordem():
+                reservados = self._limitar(provedor, input)
+                inicio = time.perf_counter()
+                entregou = False
+                usados = None
+                try:
+                    for pedaco in provedor.cliente.stream(input, config, **kwargs):
+                        entregou = True
+                        # O uso costuma vir só no último pedaço
+                        tokens = self._tokens_usados(pedaco)
+                        if tokens is not None:
+                            usados = (usados or 0) + tokens
+                        yield pedaco
+                except Exception as e:
+                    provedor.registrar(erro=e, pausa=self._pausa())
+                    self._corrigir(provedor, reservados, None if entregou else 0)
+                    if entregou:
+                        raise
+                    erro = e
+                    continue
+                provedor.registrar(latencia=time.perf_counter() - inicio)
+                self._corrigir(provedor, reservados, usados)
+                provedor.contar('vitorias')
+                return
+            if not erro_transitorio(erro) or tentativa == self.tentativas - 1:
+                raise erro
+            time.sleep(self._espera(tentativa))
+
+    def estatisticas(self) -> Dict[str, Dict]:
+        return {p.nome: p.estatisticas() for p in self.provedores}
@@ -24,15 +24,15 @@ sys.path.insert(0, os.path.dirname(__file__))
 from core_ai import AssistenteFarmaceutico
 from precificacao import calcular_preco
 
-# Inicializar assistente (lazy loading)
-assistente = None
+# Inicializar assistente: o construtor é leve (componentes carregados no primeiro uso);
+# com WARMUP_ON_START=1 (padrão aqui) o modelo e o índice carregam logo após o cold start
+assistente = AssistenteFarmaceutico(
+    os.getenv("VECTORSTORE_PATH", "data/vectorstore"),
+    aquecer=os.getenv("WARMUP_ON_START", "1").lower() in ("1", "true", "sim")
+)
 
 def get_assistente():
-    """Inicializa o assistente farmacêutico (lazy loading)."""
-    global assistente
-    if assistente is None:
-        vectorstore_path = os.getenv("VECTORSTORE_PATH", "data/vectorstore")
-        assistente = AssistenteFarmaceutico(vectorstore_path)
+    """Retorna o assistente farmacêutico."""
     return assistente
 
 
@@ -42,7 +42,11 @@ def home():
     return jsonify({
         "status": "online",
         "service": "Farmácia Magistral WhatsApp Bot",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "pronto": assistente.is_ready(),
+        "inicializacao": assistente.status_inicializacao(),
+        "cache": assistente.estatisticas_cache(),
+        "llm": assistente.estatisticas_llm()
     })
 
 
@@ -149,6 +153,8 @@ def formatar_resposta_whatsapp(resultado: dict, sintomas: str) -> str:
     """
     Formata o resultado da IA para mensagem do WhatsApp.
     """
+    origem = "\n_⚡ Resposta recuperada do cache_" if resultado.get("do_cache") else ""
+    
     # Se houver erro
     if "erro" in resultado:
         return f"""⚠️ *Não encontrei um medicamento específico*
@@ -159,7 +165,7 @@ def formatar_resposta_whatsapp(resultado: dict, sintomas: str) -> str:
 • Tente descrever os sintomas de forma diferente
 • Consulte um profissional de saúde
 
-_Baseado na Farmacopeia Brasileira 6ª Edição_"""
+_Baseado na Farmacopeia Brasileira 6ª Edição_{origem}"""
 
     # Formatar fórmula
     formula = resultado.get("formula", {})
@@ -207,7 +213,7 @@ _Baseado na Farmacopeia Brasileira 6ª Edição_"""
 Responda com *SIM* para confirmar.
 
 _⚠️ Este sistema é uma ferramenta de auxílio. Consulte um farmacêutico antes de usar._
-_📚 Baseado na Farmacopeia Brasileira 6ª Ed._"""
+_📚 Baseado na Farmacopeia Brasileira 6ª Ed._{origem}"""
 
 
 def enviar_mensagem(telefone: str, texto: str):
@@ -0,0 +1,53 @@
+"""Busca pelo nome exato de uma monografia: ela tem que vir em primeiro lugar"""
+import os
+import sys
+sys.path.insert(0, "src")
+
+# Só a busca local (vetores + BM25), sem a expansão via LLM
+os.environ["LLM_EXPANSION_DEADLINE"] = "0"
+
+from core_ai import AssistenteFarmaceutico
+
+assistente = AssistenteFarmaceutico("data/vectorstore")
+
+nomes = [
+    "ACICLOVIR",
+    "CAPTOPRIL",
+    "CAPTOPRIL COMPRIMIDOS",
+    "AMINOFILINA",
+    "ACETILCISTEÍNA",
+    "IBUPROFENO",
+    "FLUCONAZOL",
+    "DIPIRONA MONOIDRATADA",
+]
+# O nome no meio de uma frase, em minúsculas e sem acento
+frases = [
+    ("quero saber sobre aciclovir para herpes", "ACICLOVIR"),
+    ("acetilcisteina para tosse com catarro", "ACETILCISTEÍNA"),
+]
+# Nome de monografia comum no meio de um sintoma não é busca pelo nome: não pode vir em primeiro
+sintomas = [
+    ("minha glicose está alta", "GLICOSE"),
+    ("tomo muita água e tenho dor de cabeça", "ÁGUA"),
+]
+
+print("=" * 60)
+print("🧪 BUSCA PELO NOME EXATO")
+print("=" * 60)
+
+falhas = 0
+for consulta, esperado in [(n, n) for n in nomes] + frases:
+    insumos = assistente.buscar_insumos_relevantes(consulta, top_k=5)
+    primeiro = insumos[0]['metadata'].get('nome', '') if insumos else ''
+    ok = primeiro.upper() == esperado
+    falhas += not ok
+    print(f"{'✅' if ok else '❌'} {consulta!r} -> {primeiro!r}")
+
+for consulta, proibido in sintomas:
+    insumos = assistente.buscar_insumos_relevantes(consulta, top_k=5)
+    primeiro = insumos[0]['metadata'].get('nome', '') if insumos else ''
+    ok = bool(primeiro) and not primeiro.upper().startswith(proibido)
+    falhas += not ok
+    print(f"{'✅' if ok else '❌'} {consulta!r} -> {primeiro!r} (não {proibido})")
+
+sys.exit(1 if falhas else 0)
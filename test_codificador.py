@@ -0,0 +1,62 @@
+"""Equivalência dos backends de embeddings (int8, onnx) com o MiniLM original: cosseno >= 0.99"""
+import os
+import sys
+import argparse
+sys.path.insert(0, "src")
+
+import numpy as np
+
+from codificador import MODELO_EMBEDDINGS, ONNX_PATH_PADRAO, criar_codificador
+
+LIMIAR = 0.99
+
+textos = [
+    "dor de cabeça e febre",
+    "to com uma pontada no peito",
+    "coceira entre os dedos do pé",
+    "azia e queimação no estomago depois de comer",
+    "tosse seca há 3 dias\ne garganta irritada",
+    "my chest hurts",
+    "dor d cabesa",
+    "DIPIRONA MONOIDRATADA Analgésico e antitérmico. Indicações: dor, febre.",
+    "CETOCONAZOL Antifúngico imidazólico de uso tópico em micoses superficiais da pele.",
+    "Caracteres físicos: pó cristalino branco, inodoro, solúvel em água e pouco solúvel em etanol. "
+    "Conservar em recipientes bem fechados, ao abrigo da luz e da umidade, em temperatura ambiente.",
+]
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--modelo", default=MODELO_EMBEDDINGS)
+parser.add_argument("--onnx-path", default=os.getenv("ENCODER_ONNX_PATH", ONNX_PATH_PADRAO))
+args = parser.parse_args()
+
+print("=" * 60)
+print("🧪 EQUIVALÊNCIA DOS CODIFICADORES")
+print("=" * 60)
+
+referencia = np.asarray(criar_codificador("torch", modelo=args.modelo).embed_documents(textos))
+referencia /= np.linalg.norm(referencia, axis=1, keepdims=True)
+
+backends = ["int8"]
+if os.path.exists(os.path.join(args.onnx_path, "model.onnx")):
+    backends.append("onnx")
+else:
+    print(f"⚠️ Sem modelo ONNX em {args.onnx_path} (python src/codificador.py --exportar-onnx)")
+
+falhas = 0
+for backend in backends:
+    codificador = criar_codificador(backend, modelo=args.modelo, onnx_path=args.onnx_path)
+    # Em lote (como na ingestão) e uma a uma (como nas consultas)
+    for modo, vetores in [
+        ("lote", codificador.embed_documents(textos)),
+        ("consulta", [codificador.embed_query(t) for t in textos]),
+    ]:
+        vetores = np.asarray(vetores)
+        cossenos = (vetores / np.linalg.norm(vetores, axis=1, keepdims=True) * referencia).sum(axis=1)
+        ok = cossenos.min() >= LIMIAR
+        falhas += not ok
+        print(f"{'✅' if ok else '❌'} {backend:<5} {modo:<9} cosseno mín {cossenos.min():.4f}  médio {cossenos.mean():.4f}")
+        for texto, cosseno in zip(textos, cossenos):
+            if cosseno < LIMIAR:
+                print(f"     {cosseno:.4f}  {texto[:60]!r}")
+
+sys.exit(1 if falhas else 0)
@@ -0,0 +1,106 @@
+"""IndiceTermos (Aho-Corasick) com o mesmo resultado de um loop termo a termo (sem acentos) nos mapas reais"""
+import re
+import sys
+sys.path.insert(0, "src")
+
+from core_ai import AssistenteFarmaceutico
+from ingestor import FarmacopeiaIngestor
+from indice_termos import IndiceTermos, TAMANHO_PALAVRA_INTEIRA, normalizar_texto
+
+consultas = [
+    "dor de cabeça forte e febre",
+    "dor de cabeca forte e febre",
+    "Dor de Cabeça",
+    "dores nas costas e nas pernas",
+    "dormindo mal, muita insônia",
+    "tosse seca há 3 dias",
+    "coceira entre os dedos do pé",
+    "pés com frieira",
+    "pontada no peito",
+    "azia e queimação no estômago depois de comer",
+    "estomago embrulhado",
+    "",
+]
+classes = [
+    "Analgésico e antipirético",
+    "ANTIINFLAMATÓRIO NÃO ESTEROIDE",
+    "antifungico de uso topico",
+    "Anti-hipertensivo; diurético",
+    "agente de contraste",
+]
+
+# Casos fixos: termos curtos continuam casando dentro de palavras; "pé" sem acento só como palavra
+fixos = [
+    ("dores nas costas", "dor", True),
+    ("dormindo mal", "dor", True),
+    ("DOR DE CABEÇA", "cabeça", True),
+    ("dor de cabeca", "cabeça", True),
+    ("pontada no peito", "pé", False),
+    ("pele ressecada", "pé", False),
+    ("dor no pe", "pé", True),
+]
+
+# Quem digita sem acento tem que cair nos mesmos grupos de quem digita com acento
+sem_acento = [
+    ("dor de cabeça", "dor de cabeca"),
+    ("queimação no estômago", "queimacao no estomago"),
+    ("insônia e depressão", "insonia e depressao"),
+    ("coceira no pé", "coceira no pe"),
+    ("pressão alta", "pressao alta"),
+    ("náusea e vômito", "nausea e vomito"),
+]
+
+
+def loop_termos(mapa, texto):
+    """Referência: um teste por chave, sem acentos; curtos que perderam o acento só como palavra."""
+    texto = normalizar_texto(texto)
+    grupos = {}
+    for termo, valor in mapa.items():
+        normalizado = normalizar_texto(termo).strip()
+        if not normalizado:
+            continue
+        grupo = grupos.setdefault(normalizado, {'valores': [], 'palavra': True})
+        if normalizado == termo.lower().strip() or len(normalizado) > TAMANHO_PALAVRA_INTEIRA:
+            grupo['palavra'] = False
+        grupo['valores'].append(valor)
+    resultado = []
+    for normalizado, grupo in grupos.items():
+        if grupo['palavra']:
+            casou = re.search(rf"(?<!\w){re.escape(normalizado)}(?!\w)", texto) is not None
+        else:
+            casou = normalizado in texto
+        if casou:
+            for valor in grupo['valores']:
+                if valor not in resultado:
+                    resultado.append(valor)
+    return resultado
+
+
+print("=" * 60)
+print("🧪 EQUIVALÊNCIA DO ÍNDICE DE TERMOS")
+print("=" * 60)
+
+falhas = 0
+for nome, mapa, textos in [
+    ("Sintomas -> classes", AssistenteFarmaceutico.SINTOMAS_PARA_CLASSES, consultas),
+    ("Classes -> indicações", FarmacopeiaIngestor.CLASSE_PARA_INDICACOES, classes),
+]:
+    indice = IndiceTermos(mapa)
+    for texto in textos:
+        ok = indice.buscar(texto) == loop_termos(mapa, texto)
+        falhas += not ok
+        print(f"{'✅' if ok else '❌'} {nome:<22} {texto!r}")
+
+indice = IndiceTermos(AssistenteFarmaceutico.SINTOMAS_PARA_CLASSES)
+for texto, termo, esperado in fixos:
+    casou = AssistenteFarmaceutico.SINTOMAS_PARA_CLASSES[termo] in indice.buscar(texto)
+    ok = casou == esperado
+    falhas += not ok
+    print(f"{'✅' if ok else '❌'} {texto!r} {'casa' if esperado else 'não casa'} com {termo!r}")
+
+for com, sem in sem_acento:
+    ok = bool(indice.grupos(com)) and indice.grupos(com) == indice.grupos(sem)
+    falhas += not ok
+    print(f"{'✅' if ok else '❌'} {sem!r} casa com os mesmos grupos de {com!r}")
+
+sys.exit(1 if falhas else 0)
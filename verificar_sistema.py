@@ -2,7 +2,6 @@
 TESTE COMPLETO DO SISTEMA - Verificação Final
 """
 import os
-import json
 import sys
 
 print("=" * 70)
@@ -37,8 +36,10 @@ print("\n📊 2. VERIFICANDO MONOGRAFIAS:")
 print("-" * 50)
 
 try:
-    with open("data/monografias_backup.json", "r", encoding="utf-8") as f:
-        monografias = json.load(f)
+    sys.path.insert(0, "src")
+    from base_monografias import carregar_monografias
+    
+    monografias = carregar_monografias()
     
     total = len(monografias)
     com_classe = sum(1 for m in monografias if m.get("classe_terapeutica"))